@@ -91,9 +91,9 @@ function Category({fields, ops, myOps, list, result, setResult, getErrorMsg}) {
 			if (res.status > 299) return console.error(data);
 			data = data["category"];
 			let category = {
-				c_id: data[0],
-				name: data[1],
-				description: data[2]
+				c_id: data.category_id,
+				name: data.name,
+				description: data.description
 			};
 			return category;
 		} catch(error) { console.error(error); }
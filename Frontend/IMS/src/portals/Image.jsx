@@ -91,9 +91,9 @@ function Image({fields, ops, myOps, result, setResult, getErrorMsg}) {
 			if (res.status > 299) return console.error(data);
 			data = data["image"];
 			let image = {
-				i_id: data[0],
-				p_id: data[1],
-				url: data[2]
+				i_id: data.image_id,
+				p_id: data.product_id,
+				url: data.url
 			};
 			return image;
 		} catch(error) { console.error(error); }
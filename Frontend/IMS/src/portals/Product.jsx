@@ -93,11 +93,11 @@ function Product({fields, ops, myOps, result, setResult, getErrorMsg}) {
 			if (res.status > 299) return console.error(data);
 			data = data["product"];
 			let product = {
-				p_id: data[0],
-				name: data[1],
-				description: data[2],
-				quantity: data[3],
-				price: data[4]
+				p_id: data.product_id,
+				name: data.name,
+				description: data.description,
+				quantity: data.quantity,
+				price: data.price
 			};
 			return product;
 		} catch(error) { console.error(error); }
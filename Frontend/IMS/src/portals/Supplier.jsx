@@ -92,9 +92,9 @@ function Supplier({fields, ops, myOps, result, setResult, getErrorMsg}) {
 			if (res.status > 299) return console.error(data);
 			data = data["supplier"];
 			let supplier = {
-				s_id: data[0],
-				name: data[1],
-				contact: data[2]
+				s_id: data.supplier_id,
+				name: data.name,
+				contact: data.contact_email
 			};
 			return supplier;
 		} catch(error) { console.error(error); }
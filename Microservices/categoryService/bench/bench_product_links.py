@@ -0,0 +1,106 @@
+# bench_product_links.py - per-product lookup and delete cost as category_products grows
+#
+# For each --sizes link count, loads a temporary copy of category_products (the
+# real table is not touched) and times the statements behind GET /products/{p_id}
+# and DELETE /products/{p_id}: first with only the (category_id, product_id)
+# primary key, then after adding category_products_product_id_idx. With the
+# index the per-product cost should stay flat while the table grows.
+# Needs the category database, e.g. run it inside the categories_service container:
+#   python bench/bench_product_links.py --sizes 10000 100000 1000000
+
+import argparse
+import os
+import random
+import time
+
+import psycopg2
+
+DB_CONFIG = {
+	"dbname": os.environ.get("DB_NAME", "category_db"),
+	"user": os.environ.get("DB_USER", "postgres"),
+	"password": os.environ.get("DB_PASSWORD", "solid"),
+	"host": os.environ.get("DB_HOST", "category_db"),
+	"port": int(os.environ.get("DB_PORT", 5432)),
+}
+
+LOOKUP = "SELECT category_id FROM bench_links WHERE product_id = %s"
+DELETE = "DELETE FROM bench_links WHERE product_id = %s"
+
+
+# Every product is linked to links_per_product distinct categories, inserted in random order
+def load(cur, links: int, categories: int, links_per_product: int) -> list:
+	products = max(1, links // links_per_product)
+	cur.execute("DROP TABLE IF EXISTS bench_products, bench_categories, bench_links")
+	cur.execute("CREATE TEMP TABLE bench_products (n INT PRIMARY KEY, product_id UUID NOT NULL DEFAULT uuid_generate_v4())")
+	cur.execute("INSERT INTO bench_products (n) SELECT generate_series(0, %s - 1)", (products,))
+	cur.execute("CREATE TEMP TABLE bench_categories (n INT PRIMARY KEY, category_id UUID NOT NULL DEFAULT uuid_generate_v4())")
+	cur.execute("INSERT INTO bench_categories (n) SELECT generate_series(0, %s - 1)", (categories,))
+	# only the primary key, whatever indexes the real table has
+	cur.execute("CREATE TEMP TABLE bench_links (LIKE category_products)")
+	cur.execute("ALTER TABLE bench_links ADD PRIMARY KEY (category_id, product_id)")
+	cur.execute("""
+		INSERT INTO bench_links (category_id, product_id)
+		SELECT c.category_id, p.product_id
+		FROM bench_products p
+		CROSS JOIN generate_series(0, %s - 1) k
+		JOIN bench_categories c ON c.n = (p.n * 7919 + k) %% %s
+		ORDER BY random()
+	""", (links_per_product, categories))
+	cur.execute("ANALYZE bench_links")
+	cur.execute("SELECT product_id::text FROM bench_products")
+	return [row[0] for row in cur.fetchall()]
+
+
+def timed(cur, sql: str, pids: list) -> float:
+	start = time.perf_counter()
+	for pid in pids:
+		cur.execute(sql, (pid,))
+		if cur.description is not None:
+			cur.fetchall()
+	return (time.perf_counter() - start) / len(pids) * 1000
+
+
+def plan(cur, sql: str, pid: str) -> str:
+	cur.execute("EXPLAIN (FORMAT JSON) " + sql, (pid,))
+	node = cur.fetchone()[0][0]["Plan"]
+	# a DELETE's scan sits under the ModifyTable node
+	if node["Node Type"] == "ModifyTable" and node.get("Plans"):
+		node = node["Plans"][0]
+	return node["Node Type"]
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+	parser.add_argument("--categories", type=int, default=1000)
+	parser.add_argument("--links-per-product", type=int, default=3)
+	parser.add_argument("--lookups", type=int, default=200)
+	args = parser.parse_args()
+
+	conn = psycopg2.connect(**DB_CONFIG)
+	conn.autocommit = True
+	cur = conn.cursor()
+
+	print(f"categories={args.categories} links_per_product={args.links_per_product} lookups={args.lookups}")
+	print(f"{'links':>10} {'index':>12} {'lookup ms':>10} {'delete ms':>10}  plan")
+	for size in args.sizes:
+		pids = load(cur, size, args.categories, args.links_per_product)
+		# deleted products are not sampled again
+		random.Random(size).shuffle(pids)
+		for index in (False, True):
+			if index:
+				cur.execute("CREATE INDEX ON bench_links (product_id, category_id)")
+				cur.execute("ANALYZE bench_links")
+			# without the index every statement reads the whole table, so take fewer samples
+			n = args.lookups if index else max(5, args.lookups // 20)
+			sample, pids = pids[:2 * n], pids[2 * n:]
+			lookup_ms = timed(cur, LOOKUP, sample[:n])
+			node = plan(cur, DELETE, sample[n])
+			delete_ms = timed(cur, DELETE, sample[n:])
+			print(f"{size:>10} {'product_id' if index else 'pk only':>12} {lookup_ms:>10.3f} {delete_ms:>10.3f}  {node}")
+
+	conn.close()
+
+
+if __name__ == "__main__":
+	main()
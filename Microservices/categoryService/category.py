@@ -1,28 +1,55 @@
-from typing import Optional
-import psycopg2
-from contextlib import contextmanager
+from typing import Optional, Union
+from contextlib import asynccontextmanager, contextmanager
+import os
 import uuid
 from fastapi import FastAPI, Request, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-import json
+from common.admission import ADMISSION_CONFIG, ADMISSION_RETRY_AFTER, AdmissionControl, admission_gates
+from common.cache import CACHE_CONFIG, TTLCache, cache_key
+from common.db import POOL_CONFIG, ConnectionPool, create_batch, estimate_rows, read_page
+from common.events import MQ_CONFIG, EventBus
+from common.paging import BATCH_MAX_ROWS, PAGE_SIZE, etag_matches, next_link, parse_batch
 
 # database connection =========================================================
 DB_CONFIG = {
-    "dbname": "category_db",
-    "user": "postgres",
-    "password": "solid",
-    "host": "category_db",  # add when docker set up for containers
-    "port": 5432
+    "dbname": os.environ.get("DB_NAME", "category_db"),
+    "user": os.environ.get("DB_USER", "postgres"),
+    "password": os.environ.get("DB_PASSWORD", "solid"),
+    "host": os.environ.get("DB_HOST", "category_db"),  # add when docker set up for containers
+    "port": int(os.environ.get("DB_PORT", 5432))
 }
 
+# created in the app lifespan, one per worker process
+pool: Optional[ConnectionPool] = None
+
 @contextmanager
 def get_conn():
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = pool.getconn()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.putconn(conn)
+
+class NotFoundError(Exception):
+    pass
+
+# events ======================================================================
+# created in the app lifespan, one per worker process
+events: Optional[EventBus] = None
+
+# cache =======================================================================
+# one per worker process; replicas keep each other's copy fresh through the cache exchange
+cache = TTLCache(**CACHE_CONFIG)
+
+# Drop a row from this replica's cache and tell the other replicas to do the same.
+# Call after commit; if the broker is unreachable the others catch up within CACHE_TTL.
+def invalidate(entity_id: str):
+    key = cache_key(entity_id)
+    cache.invalidate(key)
+    cache.broadcast(key, events.broadcast)
 
 # validation functions ========================================================
 def gen_uuid():
@@ -43,6 +70,9 @@ def validate_nonnegative(field_name: str, value):
     if not isinstance(value, int) or value < 0:
         raise Exception(f"{field_name} must be a non-negative integer.")
 
+# batch loading ===============================================================
+BY_PRODUCTS_MAX = int(os.environ.get("BY_PRODUCTS_MAX", 1000))  # product ids accepted by one POST /by-products
+
 # database functions ==========================================================
 def categories_read() -> Optional[list]:
     with get_conn() as conn:
@@ -50,6 +80,9 @@ def categories_read() -> Optional[list]:
             c.execute("""SELECT (category_id) FROM categories""")
             return c.fetchall()
 
+def categories_page(limit: int, after: Optional[str] = None, sort: Optional[str] = None, order: str = "asc"):
+    return read_page(pool, "categories", "category_id", ("category_id", "name"), limit, after, sort, order)
+
 def category_create(name: str, description: Optional[str]) -> str:
     try:
         validate_nonempty("name", name)
@@ -61,36 +94,70 @@ def category_create(name: str, description: Optional[str]) -> str:
                 c.execute("""
                     INSERT INTO categories (category_id, name, description)
                     VALUES (%s, %s, %s)
+                    RETURNING category_id
                 """, (cid, name, description))
+                cid = c.fetchone()[0]
                 conn.commit()
         return cid
     except Exception as e:
         raise Exception(f"Failed to create category: {str(e)}")
 
-def category_read(category_id: str) -> Optional[tuple]:
+# Same checks as category_create, for one row of a batch
+def category_row_values(row: dict) -> tuple:
+    cat = Category.model_validate(row)
+    validate_nonempty("name", cat.name)
+    if cat.description is not None:
+        validate_nonempty("description", cat.description)
+    return (cat.name, cat.description)
+
+def categories_create_batch(rows: list) -> dict:
+    return create_batch(pool, rows, "categories", ("category_id", "name", "description"), category_row_values)
+
+def category_read(category_id: str) -> dict:
+    return category_read_tagged(category_id)[0]
+
+# Columns a category row is returned with, in order
+CATEGORY_COLUMNS = "category_id, name, description"
+
+# A row read with CATEGORY_COLUMNS as the object CategoryRow describes, ready for orjson
+def category_row(row) -> dict:
+    return {"category_id": str(row[0]), "name": row[1], "description": row[2]}
+
+# The row and its ETag, an md5 of the row's text form computed by Postgres,
+# so any change to any column gives a new tag. Served from the cache when fresh.
+def category_read_tagged(category_id: str) -> tuple:
+    return cache.get_or_load(cache_key(category_id), lambda: category_load(category_id))
+
+def category_load(category_id: str) -> tuple:
     with get_conn() as conn:
         with conn.cursor() as c:
-            c.execute("SELECT * FROM categories WHERE category_id = %s", (category_id,))
-            row = c.fetchall()[0]
-            ret = []
-            for data in row:
-                ret.append(str(data))
-            return ret
-
-def category_update(category_id: str, name: str, description: str) -> Optional[tuple]:
+            c.execute(f"""SELECT {CATEGORY_COLUMNS}, md5(ROW({CATEGORY_COLUMNS})::text) FROM categories WHERE category_id = %s""", (category_id,))
+            row = c.fetchone()
+            if row is None:
+                raise NotFoundError(f"Category {category_id} not found.")
+            return category_row(row), f'"{row[-1]}"'
+
+def category_update(category_id: str, name: str, description: str) -> dict:
     try:
         validate_nonempty("name", name)
         if description is not None:
             validate_nonempty("description", description)
         with get_conn() as conn:
             with conn.cursor() as c:
-                c.execute("""
+                c.execute(f"""
                     UPDATE categories
                     SET name = %s, description = %s
                     WHERE category_id = %s
+                    RETURNING {CATEGORY_COLUMNS}
                 """, (name, description, category_id))
+                row = c.fetchone()
+                if row is None:
+                    raise NotFoundError(f"Category {category_id} not found.")
                 conn.commit()
-        return category_read(category_id)
+        invalidate(category_id)
+        return category_row(row)
+    except NotFoundError:
+        raise
     except Exception as e:
         raise Exception(f"Failed to update category: {str(e)}")
 
@@ -100,6 +167,7 @@ def category_delete(category_id: str) -> None:
         with conn.cursor() as c:
             c.execute("DELETE FROM categories WHERE category_id = %s", (category_id,))
             conn.commit()
+    invalidate(category_id)
 
 # association =================================================================
 def categoryProduct_create(category_id: str, product_id: str) -> None:
@@ -126,6 +194,40 @@ def categoryProducts_read(category_id: str) -> Optional[list]:
 				ret.append(data)
 			return ret
 
+# the other direction: every category a product is in, as full rows.
+# Served from category_products_product_id_idx.
+def productCategories_read(product_id: str) -> list:
+	with get_conn() as conn:
+		with conn.cursor() as cur:
+			cur.execute("""
+				SELECT c.category_id, c.name, c.description
+				FROM category_products cp
+				JOIN categories c ON c.category_id = cp.category_id
+				WHERE cp.product_id = %s
+				ORDER BY c.category_id
+			""", (product_id,))
+			return [category_row(row) for row in cur.fetchall()]
+
+# Categories of many products in one query: {product_id: [category rows]}, with an
+# empty list for products in no category. Raises ValueError on an id that is not a UUID.
+def productsCategories_read(product_ids: list) -> dict:
+	ids = [str(uuid.UUID(pid)) for pid in product_ids]
+	ret = {pid: [] for pid in ids}
+	if not ids:
+		return ret
+	with get_conn() as conn:
+		with conn.cursor() as cur:
+			cur.execute("""
+				SELECT cp.product_id, c.category_id, c.name, c.description
+				FROM category_products cp
+				JOIN categories c ON c.category_id = cp.category_id
+				WHERE cp.product_id = ANY(%s::uuid[])
+				ORDER BY cp.product_id, c.category_id
+			""", (ids,))
+			for row in cur.fetchall():
+				ret[str(row[0])].append(category_row(row[1:]))
+	return ret
+
 def categoryProduct_delete(product_id: str, category_id: Optional[str] = None) -> None:
 	with get_conn() as conn:
 		with conn.cursor() as cur:
@@ -133,26 +235,89 @@ def categoryProduct_delete(product_id: str, category_id: Optional[str] = None) -
 				cur.execute("""
 					DELETE FROM category_products 
 					WHERE product_id = %s
+					RETURNING category_id
 				""", (product_id,))
 			else:
 				cur.execute("""
 					DELETE FROM category_products
 					WHERE category_id = %s AND product_id = %s
+					RETURNING category_id
 				""", (category_id, product_id))
+			unlinked = [str(row[0]) for row in cur.fetchall()]
 			conn.commit()
+	# cp_after_del deletes categories left without products, so drop them from the caches
+	for c_id in unlinked:
+		invalidate(c_id)
+
+# events from other services: a deleted product leaves every category
+def handle_event(event: dict):
+    if event["event"] == "product.deleted":
+        categoryProduct_delete(event["product_id"])
+
+# admission control ===========================================================
+# one gate per kind of request, per worker process
+admission = admission_gates(ADMISSION_CONFIG)
 
 # http server config ==========================================================
 class Category(BaseModel):
     name: str
     description: str
 
-app = FastAPI()
+class ProductIds(BaseModel):
+    p_ids: list[str]
+
+# response models: they document the replies, which read paths build as plain
+# dicts (category_row) and hand straight to orjson without another validation pass
+class CategoryRow(BaseModel):
+    category_id: str
+    name: str
+    description: Optional[str]
+
+class CategoryReply(BaseModel):
+    category: CategoryRow
+
+class CategoryIdList(BaseModel):
+    categories: list[list[str]]
+    next: Optional[str] = None
+
+# GET / answers one category with c_id, otherwise their ids; 304 when the If-None-Match tag is still current
+READ_RESPONSES = {200: {"model": Union[CategoryReply, CategoryIdList]}, 304: {"description": "Not Modified"}}
+
+class CategoryList(BaseModel):
+    categories: list[CategoryRow]
+
+class CategoriesByProduct(BaseModel):
+    categories: dict[str, list[CategoryRow]]
+
+# Open the pool and the event bus when a worker starts and close them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global pool, events
+    pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+    events = EventBus("category", **MQ_CONFIG)
+    events.consume(["product.deleted"], handle_event)
+    events.subscribe(cache.handle_broadcast)
+    try:
+        pool.prewarm()
+    except Exception as e:
+        print(f"Database not reachable yet, connections will be opened on demand: {e}")
+    try:
+        yield
+    finally:
+        events.close()
+        pool.close()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# added first, so it runs inside CORS and shed replies still carry the CORS headers
+app.add_middleware(AdmissionControl, gates=admission, retry_after=ADMISSION_RETRY_AFTER)
 
 app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
         allow_methods=["*"],
-        allow_headers=["*"]
+        allow_headers=["*"],
+        expose_headers=["X-Total-Count-Estimate", "ETag", "Retry-After"]
 )
 
 @app.options("/")
@@ -164,22 +329,45 @@ def preflight_handler():
     }
     return Response(status_code=200, headers=headers)
 
-@app.get("/")
-def read_suppliers(c_id: Optional[str] = None):
+# pool occupancy, cache hit rate/staleness and admitted/shed requests for load balancers and dashboards
+@app.get("/health")
+def health():
+    return {"status": "ok", "pool": pool.stats(), "cache": cache.stats(), "admission": {kind: gate.stats() for kind, gate in admission.items()}}
+
+@app.get("/", responses=READ_RESPONSES)
+def read_categories(request: Request, response: Response, c_id: Optional[str] = None, limit: Optional[int] = None,
+		after: Optional[str] = None, sort: Optional[str] = None, order: str = "asc", estimate: bool = False):
 	if (c_id is None or c_id == ""):
-		data = categories_read()
-		return {"categories": data}
-	data = category_read(c_id)
-	return {"category": data}
+		if estimate:
+			response.headers["X-Total-Count-Estimate"] = str(estimate_rows(pool, "categories"))
+		# no paging parameters: every id, as before
+		if limit is None and after is None and sort is None:
+			data = categories_read()
+			return {"categories": data}
+		try:
+			data, cursor = categories_page(limit or PAGE_SIZE, after, sort, order)
+		except ValueError as ex:
+			raise HTTPException(status_code=400, detail=str(ex))
+		return {"categories": data, "next": next_link(request, cursor)}
+	try:
+		data, etag = category_read_tagged(c_id)
+	except NotFoundError as ex:
+		raise HTTPException(status_code=404, detail=str(ex))
+	# the client's copy is current: answer without a body
+	if etag_matches(request.headers.get("if-none-match"), etag):
+		return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+	return ORJSONResponse({"category": data}, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
-@app.put("/{c_id}")
+@app.put("/{c_id}", response_model=CategoryReply)
 def update_category(c_id: str, cat: Category):
     #return {"category": cat}
     try:
         data = category_update(c_id, cat.name, cat.description)
+    except NotFoundError as ex:
+        raise HTTPException(status_code=404, detail=str(ex))
     except Exception as ex:
         raise HTTPException(status_code=400, detail=str(ex))
-    return {"category": data}
+    return ORJSONResponse({"category": data})
 
 @app.post("/")
 def create_category(cat: Category):
@@ -190,6 +378,19 @@ def create_category(cat: Category):
         raise HTTPException(status_code=400, detail=str(ex))
     return {"c_id": data}
 
+# bulk import: a JSON array or NDJSON of the objects POST / takes
+@app.post("/batch")
+async def create_categories_batch(request: Request):
+    try:
+        rows = parse_batch(await request.body())
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=f"Invalid batch: {ex}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Invalid batch: expected a JSON array or NDJSON.")
+    if len(rows) > BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch of {len(rows)} rows exceeds the {BATCH_MAX_ROWS} row limit.")
+    return await run_in_threadpool(categories_create_batch, rows)
+
 @app.delete("/{c_id}")
 def delete_category(c_id: str):
     try:
@@ -214,6 +415,23 @@ def associate_product(c_id: str, p_id: str):
 def delete_association(c_id: str, p_id: str):
 	categoryProduct_delete(p_id, c_id)
 
+# categories of a product
+@app.get("/products/{p_id}", response_model=CategoryList)
+def read_product_categories(p_id: str):
+	data = productCategories_read(p_id)
+	return ORJSONResponse({"categories": data})
+
+# categories of many products at once, e.g. for a product list page
+@app.post("/by-products", response_model=CategoriesByProduct)
+def read_categories_by_products(body: ProductIds):
+	if len(body.p_ids) > BY_PRODUCTS_MAX:
+		raise HTTPException(status_code=413, detail=f"{len(body.p_ids)} products exceed the {BY_PRODUCTS_MAX} product limit.")
+	try:
+		data = productsCategories_read(body.p_ids)
+	except ValueError as ex:
+		raise HTTPException(status_code=400, detail=f"Invalid product id: {ex}")
+	return ORJSONResponse({"categories": data})
+
 # dissasociate product with all categories
 @app.delete("/products/{p_id}")
 def delete_product(p_id: str):
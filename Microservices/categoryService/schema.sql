@@ -6,12 +6,19 @@ CREATE TABLE IF NOT EXISTS categories (
     description TEXT
 );
 
+-- keyset pagination on GET /?sort=name; the id breaks ties
+CREATE INDEX IF NOT EXISTS categories_name_id_idx ON categories (name, category_id);
+
 CREATE TABLE IF NOT EXISTS category_products (
     category_id UUID NOT NULL,
     product_id UUID NOT NULL,
     PRIMARY KEY (category_id, product_id)
 );
 
+-- the primary key only helps lookups by category; this one serves the product side:
+-- GET /products/{p_id}, POST /by-products and DELETE /products/{p_id} on product.deleted
+CREATE INDEX IF NOT EXISTS category_products_product_id_idx ON category_products (product_id, category_id);
+
 /*
 --Old table from layered for debugging
 CREATE TABLE IF NOT EXISTS category_products (
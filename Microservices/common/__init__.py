@@ -0,0 +1,3 @@
+# Code shared by the services. Every service image copies this directory to
+# /app/common and puts /app on PYTHONPATH; locally, run from Microservices/ or
+# add it to PYTHONPATH.
@@ -0,0 +1,108 @@
+import asyncio
+import os
+
+# admission control ===========================================================
+# Per worker process limits, overridable from the environment. Reads (GET/HEAD)
+# and writes are admitted separately so a burst of one cannot starve the other;
+# the defaults add up to the 40 threads sync endpoints run on.
+ADMISSION_CONFIG = {
+	"reads": int(os.environ.get("ADMIT_READS", 32)),    # reads handled at once
+	"writes": int(os.environ.get("ADMIT_WRITES", 8)),   # writes handled at once
+	"queue": int(os.environ.get("ADMIT_QUEUE", 64)),    # requests of each kind allowed to wait for a slot
+	"wait": float(os.environ.get("ADMIT_WAIT", 0.5)),  # seconds a waiting request gets before it is shed
+}
+# seconds clients are told to back off for in Retry-After
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMIT_RETRY_AFTER", 1))
+# paths that are always admitted, so load balancers can still see an overloaded worker
+ADMISSION_EXEMPT = ("/health",)
+
+# At most limit requests in flight, then at most queue waiting up to wait seconds
+# for a slot; anything beyond that is refused at once instead of piling up until
+# it times out. Only touched from the event loop, so it needs no lock.
+class AdmissionGate:
+	def __init__(self, limit: int, queue: int, wait: float):
+		if limit < 1 or queue < 0 or wait < 0:
+			raise ValueError("Admission limits must satisfy limit >= 1, queue >= 0 and wait >= 0.")
+		self.limit = limit
+		self.queue = queue
+		self.wait = wait
+		self._slots = asyncio.Semaphore(limit)
+		self._in_flight = 0
+		self._waiting = 0
+		self._stats = dict.fromkeys(("admitted", "queued", "shed_queue_full", "shed_timeout"), 0)
+
+	# True once the request holds a slot, False if it is to be shed
+	async def acquire(self) -> bool:
+		if self._slots.locked():
+			if self._waiting >= self.queue:
+				self._stats["shed_queue_full"] += 1
+				return False
+			self._waiting += 1
+			try:
+				await asyncio.wait_for(self._slots.acquire(), self.wait)
+			except asyncio.TimeoutError:
+				self._stats["shed_timeout"] += 1
+				return False
+			finally:
+				self._waiting -= 1
+			self._stats["queued"] += 1
+		else:
+			await self._slots.acquire()
+		self._in_flight += 1
+		self._stats["admitted"] += 1
+		return True
+
+	def release(self):
+		self._in_flight -= 1
+		self._slots.release()
+
+	def stats(self) -> dict:
+		ret = dict(self._stats)
+		ret.update({
+			"shed": ret["shed_queue_full"] + ret["shed_timeout"],
+			"in_flight": self._in_flight,
+			"waiting": self._waiting,
+			"limit": self.limit,
+			"queue": self.queue,
+		})
+		return ret
+
+# One gate per kind of request, built from a config shaped like ADMISSION_CONFIG
+def admission_gates(config: dict) -> dict:
+	return {
+		"reads": AdmissionGate(config["reads"], config["queue"], config["wait"]),
+		"writes": AdmissionGate(config["writes"], config["queue"], config["wait"]),
+	}
+
+SHED_BODY = b'{"detail":"Service overloaded, retry later."}'
+
+# ASGI middleware putting every request through its gate; a shed request gets a
+# 503 with Retry-After without reaching the endpoint
+class AdmissionControl:
+	def __init__(self, app, gates: dict, retry_after: int = 1, exempt: tuple = ADMISSION_EXEMPT):
+		self.app = app
+		self.gates = gates
+		self.retry_after = retry_after
+		self.exempt = exempt
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in self.exempt:
+			await self.app(scope, receive, send)
+			return
+		gate = self.gates["reads"] if scope["method"] in ("GET", "HEAD") else self.gates["writes"]
+		if not await gate.acquire():
+			await send({
+				"type": "http.response.start",
+				"status": 503,
+				"headers": [
+					(b"content-type", b"application/json"),
+					(b"content-length", str(len(SHED_BODY)).encode("ascii")),
+					(b"retry-after", str(self.retry_after).encode("ascii")),
+				],
+			})
+			await send({"type": "http.response.body", "body": SHED_BODY})
+			return
+		try:
+			await self.app(scope, receive, send)
+		finally:
+			gate.release()
@@ -0,0 +1,128 @@
+from typing import Optional
+from collections import OrderedDict, deque
+import os
+import threading
+import time
+import uuid
+
+# cache =======================================================================
+# Entity cache settings, overridable from the environment
+CACHE_CONFIG = {
+	"maxsize": int(os.environ.get("CACHE_SIZE", 10000)),  # rows kept before the least recently used one is evicted
+	"ttl": float(os.environ.get("CACHE_TTL", 30)),  # seconds a row is served before it is re-read; bounds staleness if a broadcast is lost
+}
+# Invalidation lags kept for the mean/max reported on /health
+CACHE_LAG_SAMPLES = 1024
+
+# Ids arrive from URLs in any case, so key the cache on the canonical uuid text
+def cache_key(entity_id: str) -> str:
+	try:
+		return str(uuid.UUID(entity_id))
+	except (ValueError, TypeError, AttributeError):
+		return entity_id
+
+# LRU+TTL cache of single-row reads, per worker process. A write drops the key
+# here and broadcasts it so every other replica drops it too. Each invalidation
+# bumps a generation counter and a load that started before it is returned but
+# not stored, so a read racing an update cannot put the old row back.
+class TTLCache:
+	def __init__(self, maxsize: int = 10000, ttl: float = 30):
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self.origin = uuid.uuid4().hex  # tells this process's own broadcasts apart from other replicas
+		self._lock = threading.Lock()
+		self._entries = OrderedDict()  # key -> (expires, value)
+		self._generation = 0
+		self._lag = deque(maxlen=CACHE_LAG_SAMPLES)
+		self._stats = dict.fromkeys(("hits", "misses", "expired", "evicted", "invalidations", "remote_invalidations", "broadcast_failures"), 0)
+
+	# (True, value) on a hit, else (False, generation to hand to _store)
+	def _lookup(self, key) -> tuple:
+		now = time.monotonic()
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				if entry[0] > now:
+					self._entries.move_to_end(key)
+					self._stats["hits"] += 1
+					return True, entry[1]
+				del self._entries[key]
+				self._stats["expired"] += 1
+			self._stats["misses"] += 1
+			return False, self._generation
+
+	def _store(self, key, value, generation: int):
+		with self._lock:
+			if generation == self._generation:
+				self._entries[key] = (time.monotonic() + self.ttl, value)
+				self._entries.move_to_end(key)
+				while len(self._entries) > self.maxsize:
+					self._entries.popitem(last=False)
+					self._stats["evicted"] += 1
+
+	def get_or_load(self, key, loader):
+		hit, ret = self._lookup(key)
+		if hit:
+			return ret
+		value = loader()
+		self._store(key, value, ret)
+		return value
+
+	# sent is the sender's wall clock for a broadcast, used to measure how long other replicas kept serving the old row
+	def invalidate(self, key, sent: Optional[float] = None):
+		with self._lock:
+			self._generation += 1
+			self._entries.pop(key, None)
+			if sent is None:
+				self._stats["invalidations"] += 1
+			else:
+				self._stats["remote_invalidations"] += 1
+				self._lag.append(max(0.0, time.time() - sent))
+
+	# Tell the other replicas to drop key through send(message), e.g. EventBus.broadcast.
+	# Call after commit; if the broker is unreachable the others catch up within ttl.
+	def broadcast(self, key, send):
+		try:
+			send({"key": key, "origin": self.origin, "sent": time.time()})
+		except Exception as e:
+			with self._lock:
+				self._stats["broadcast_failures"] += 1
+			print(f"Failed to broadcast cache invalidation for {key}: {e}")
+
+	# Apply another replica's broadcast; this process's own are already applied
+	def handle_broadcast(self, message: dict):
+		if message.get("origin") == self.origin:
+			return
+		self.invalidate(message["key"], sent=message.get("sent"))
+
+	def stats(self) -> dict:
+		now = time.monotonic()
+		with self._lock:
+			stats = dict(self._stats)
+			lag = list(self._lag)
+			# the oldest row still served is how stale a reply can be when a broadcast was missed
+			oldest = max((now - (expires - self.ttl) for expires, _ in self._entries.values()), default=0.0)
+			size = len(self._entries)
+		lookups = stats["hits"] + stats["misses"]
+		stats.update(
+			size=size,
+			maxsize=self.maxsize,
+			ttl=self.ttl,
+			hit_rate=round(stats["hits"] / lookups, 4) if lookups else None,
+			oldest_entry_s=round(oldest, 3),
+			invalidation_lag_ms={
+				"mean": round(sum(lag) / len(lag) * 1000, 2) if lag else None,
+				"max": round(max(lag) * 1000, 2) if lag else None,
+			},
+		)
+		return stats
+
+# Same cache for async services: loader is a coroutine function
+class AsyncTTLCache(TTLCache):
+	async def get_or_load(self, key, loader):
+		hit, ret = self._lookup(key)
+		if hit:
+			return ret
+		value = await loader()
+		self._store(key, value, ret)
+		return value
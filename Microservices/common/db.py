@@ -0,0 +1,256 @@
+from typing import Optional
+from contextlib import contextmanager
+import io
+import os
+import threading
+import time
+import uuid
+import psycopg2
+import psycopg2.extensions
+
+from common.paging import MAX_PAGE_SIZE, decode_cursor, encode_cursor
+
+# database connection =========================================================
+# Connection pool settings, overridable from the environment
+POOL_CONFIG = {
+	"minconn": int(os.environ.get("DB_POOL_MIN", 2)),         # connections opened at startup and kept open
+	"maxconn": int(os.environ.get("DB_POOL_MAX", 10)),        # hard cap on open connections
+	"timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),  # seconds to wait for a free connection
+	"max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),  # seconds before a connection is replaced
+}
+
+# Bounded, thread-safe pool of psycopg2 connections.
+# Connections are rolled back when returned and replaced once older than max_lifetime.
+class ConnectionPool:
+	def __init__(self, dsn: dict, minconn: int = 2, maxconn: int = 10, timeout: float = 10, max_lifetime: float = 1800):
+		if minconn < 0 or maxconn < 1 or minconn > maxconn:
+			raise ValueError("Pool sizes must satisfy 0 <= minconn <= maxconn and maxconn >= 1.")
+		self.dsn = dsn
+		self.minconn = minconn
+		self.maxconn = maxconn
+		self.timeout = timeout
+		self.max_lifetime = max_lifetime
+		self._idle = []     # idle connections, most recently returned last
+		self._born = {}     # connection -> time it was opened
+		self._size = 0      # open connections, idle + borrowed
+		self._closed = False
+		self._cond = threading.Condition()
+		self._stats = {"created": 0, "closed": 0, "waits": 0, "timeouts": 0}
+
+	def _open(self):
+		try:
+			conn = psycopg2.connect(**self.dsn)
+		except Exception:
+			with self._cond:
+				self._size -= 1
+				self._cond.notify()
+			raise
+		with self._cond:
+			self._born[conn] = time.monotonic()
+			self._stats["created"] += 1
+		return conn
+
+	def _discard(self, conn):
+		try:
+			conn.close()
+		except Exception:
+			pass
+		with self._cond:
+			self._born.pop(conn, None)
+			self._size -= 1
+			self._stats["closed"] += 1
+			self._cond.notify()
+
+	# Open connections until minconn are available
+	def prewarm(self):
+		with self._cond:
+			missing = max(0, self.minconn - self._size)
+			self._size += missing
+		conns = []
+		try:
+			for n in range(missing):
+				try:
+					conns.append(self._open())
+				except Exception:
+					# give back the slots reserved for the connections not opened yet
+					with self._cond:
+						self._size -= missing - n - 1
+						self._cond.notify_all()
+					raise
+		finally:
+			for conn in conns:
+				self.putconn(conn)
+
+	def getconn(self):
+		deadline = time.monotonic() + self.timeout
+		while True:
+			with self._cond:
+				waited = False
+				while True:
+					if self._closed:
+						raise Exception("Connection pool is closed.")
+					if self._idle or self._size < self.maxconn:
+						break
+					remaining = deadline - time.monotonic()
+					if remaining <= 0:
+						self._stats["timeouts"] += 1
+						raise Exception(f"Timed out after {self.timeout}s waiting for a database connection.")
+					if not waited:
+						self._stats["waits"] += 1
+						waited = True
+					self._cond.wait(remaining)
+				if self._idle:
+					conn = self._idle.pop()
+				else:
+					conn = None
+					self._size += 1
+			if conn is None:
+				return self._open()
+			if not conn.closed and time.monotonic() - self._born.get(conn, 0) <= self.max_lifetime:
+				return conn
+			self._discard(conn)
+
+	def putconn(self, conn):
+		expired = conn.closed or time.monotonic() - self._born.get(conn, 0) > self.max_lifetime
+		if not expired:
+			try:
+				# reads leave a transaction open and failed writes leave an aborted one
+				if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+					conn.rollback()
+			except Exception:
+				expired = True
+		with self._cond:
+			if not expired and not self._closed:
+				self._idle.append(conn)
+				self._cond.notify()
+				return
+		self._discard(conn)
+
+	@contextmanager
+	def connection(self):
+		conn = self.getconn()
+		try:
+			yield conn
+		finally:
+			self.putconn(conn)
+
+	def stats(self) -> dict:
+		with self._cond:
+			ret = dict(self._stats)
+			ret.update({
+				"size": self._size,
+				"idle": len(self._idle),
+				"in_use": self._size - len(self._idle),
+				"minconn": self.minconn,
+				"maxconn": self.maxconn,
+			})
+			return ret
+
+	def close(self):
+		with self._cond:
+			self._closed = True
+			idle, self._idle = self._idle, []
+			self._cond.notify_all()
+		for conn in idle:
+			self._discard(conn)
+
+# batch loading ===============================================================
+# Escape a value for the COPY text format
+def copy_value(value) -> str:
+	if value is None:
+		return "\\N"
+	return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+# Load rows with one COPY and commit. If the database rejects the COPY, the rows are
+# inserted one at a time under a savepoint so only the offending ones are left out.
+# Returns {position in rows: error} for the rows that were not inserted.
+def copy_rows(conn, table: str, columns: tuple, rows: list) -> dict:
+	buf = io.StringIO()
+	for row in rows:
+		buf.write("\t".join(copy_value(v) for v in row) + "\n")
+	buf.seek(0)
+	failed = {}
+	try:
+		with conn.cursor() as c:
+			c.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+	except psycopg2.Error:
+		conn.rollback()
+		insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+		with conn.cursor() as c:
+			for n, row in enumerate(rows):
+				c.execute("SAVEPOINT batch_row")
+				try:
+					c.execute(insert, row)
+					c.execute("RELEASE SAVEPOINT batch_row")
+				except psycopg2.Error as e:
+					c.execute("ROLLBACK TO SAVEPOINT batch_row")
+					failed[n] = str(e).strip()
+	conn.commit()
+	return failed
+
+# Validate each row with check(row) -> tuple of column values (without the id),
+# COPY the valid ones and report the rest. ids are in input order, None where the row failed.
+def create_batch(pool: ConnectionPool, rows: list, table: str, columns: tuple, check) -> dict:
+	ids = [None] * len(rows)
+	errors = {}
+	valid = []
+	positions = []
+	for i, row in enumerate(rows):
+		try:
+			if isinstance(row, Exception):
+				raise row
+			values = check(row)
+		except Exception as e:
+			errors[i] = str(e)
+			continue
+		ids[i] = str(uuid.uuid4())
+		valid.append((ids[i],) + values)
+		positions.append(i)
+	if valid:
+		with pool.connection() as conn:
+			failed = copy_rows(conn, table, columns, valid)
+		for n, error in failed.items():
+			ids[positions[n]] = None
+			errors[positions[n]] = error
+	return {"ids": ids, "errors": [{"index": i, "error": errors[i]} for i in sorted(errors)]}
+
+# One page of ids ordered by sort (ties broken by the key), starting after the cursor.
+# Returns ([[id], ...], cursor of the next page or None on the last one).
+def read_page(pool: ConnectionPool, table: str, key: str, sortable: tuple, limit: int, after: Optional[str], sort: Optional[str], order: str):
+	sort = sort or key
+	if sort not in sortable:
+		raise ValueError(f"sort must be one of {', '.join(sortable)}.")
+	if order not in ("asc", "desc"):
+		raise ValueError('order must be "asc" or "desc".')
+	if limit < 1 or limit > MAX_PAGE_SIZE:
+		raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+	where, params = "", []
+	if after:
+		where = f"WHERE ({sort}, {key}) {'>' if order == 'asc' else '<'} (%s, %s)"
+		params = decode_cursor(after)
+	with pool.connection() as conn:
+		with conn.cursor() as c:
+			try:
+				c.execute(f"""
+					SELECT {key}, {sort} FROM {table} {where}
+					ORDER BY {sort} {order}, {key} {order}
+					LIMIT %s
+				""", params + [limit + 1])
+			except psycopg2.DataError:
+				raise ValueError("Invalid cursor.")
+			rows = c.fetchall()
+	more = len(rows) > limit
+	rows = rows[:limit]
+	cursor = encode_cursor([str(rows[-1][1]), str(rows[-1][0])]) if more else None
+	return [[row[0]] for row in rows], cursor
+
+# Planner's row count for a table, exact only right after ANALYZE; counts when the table was never analyzed
+def estimate_rows(pool: ConnectionPool, table: str) -> int:
+	with pool.connection() as conn:
+		with conn.cursor() as c:
+			c.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", (table,))
+			estimate = c.fetchone()[0]
+			if estimate < 0:
+				c.execute(f"SELECT COUNT(*) FROM {table}")
+				estimate = c.fetchone()[0]
+			return estimate
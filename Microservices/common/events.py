@@ -0,0 +1,124 @@
+from typing import Optional
+import json
+import os
+import threading
+import pika
+import pika.exceptions
+
+# events ======================================================================
+# RabbitMQ settings, overridable from the environment
+MQ_CONFIG = {
+	"host": os.environ.get("RABBITMQ_HOST", "rabbitmq"),
+	"user": os.environ.get("RABBITMQ_USER", "guest"),
+	"password": os.environ.get("RABBITMQ_PASS", "guest"),
+}
+EVENTS_EXCHANGE = "ims.events"  # topic exchange, routing key is the event name, e.g. "product.deleted"
+
+# Publishes domain events once the local transaction has committed and consumes
+# this service's queue on a background thread. pika connections are not
+# thread-safe, so publishers share one connection under a lock and the consumer
+# thread owns its own. service names the queue, "<service>_service.events" with
+# failed events going to its ".dlq", and the fanout exchange for cache
+# invalidations between replicas, "<service>_service.cache".
+class EventBus:
+	def __init__(self, service: str, host: str, user: str, password: str):
+		self.params = pika.ConnectionParameters(host=host, credentials=pika.PlainCredentials(user, password))
+		self.queue = f"{service}_service.events"
+		self.cache_exchange = f"{service}_service.cache"
+		self._lock = threading.Lock()
+		self._conn = None
+		self._channel = None
+		self._stop = threading.Event()
+		self._consumers = []
+
+	def publish(self, event: str, payload: dict):
+		self._send(EVENTS_EXCHANGE, event, json.dumps(dict(payload, event=event)), delivery_mode=2)
+
+	# Fire-and-forget message to every running replica of this service, this one included
+	def broadcast(self, payload: dict):
+		self._send(self.cache_exchange, "", json.dumps(payload), delivery_mode=1)
+
+	def _send(self, exchange: str, routing_key: str, body: str, delivery_mode: int):
+		with self._lock:
+			# an idle connection may have been dropped by the broker, so retry once on a fresh one
+			for attempt in range(2):
+				try:
+					if self._channel is None or self._channel.is_closed:
+						self._conn = pika.BlockingConnection(self.params)
+						self._channel = self._conn.channel()
+						self._channel.exchange_declare(exchange=EVENTS_EXCHANGE, exchange_type="topic", durable=True)
+						self._channel.exchange_declare(exchange=self.cache_exchange, exchange_type="fanout")
+					self._channel.basic_publish(
+						exchange=exchange,
+						routing_key=routing_key,
+						body=body,
+						properties=pika.BasicProperties(content_type="application/json", delivery_mode=delivery_mode)
+					)
+					return
+				except pika.exceptions.AMQPError:
+					self._channel = None
+					if attempt:
+						raise
+
+	# Run handler(event) for every event on the queue whose name matches one of routing_keys
+	def consume(self, routing_keys: list, handler):
+		def bind(channel):
+			channel.exchange_declare(exchange=EVENTS_EXCHANGE, exchange_type="topic", durable=True)
+			channel.queue_declare(queue=self.queue, durable=True)
+			channel.queue_declare(queue=self.queue + ".dlq", durable=True)
+			for key in routing_keys:
+				channel.queue_bind(queue=self.queue, exchange=EVENTS_EXCHANGE, routing_key=key)
+			return self.queue
+		self._start("events-consumer", bind, handler, self.queue + ".dlq")
+
+	# Run handler(payload) for every broadcast. Each replica reads its own
+	# server-named queue, which the broker drops when the replica disconnects.
+	def subscribe(self, handler):
+		def bind(channel):
+			channel.exchange_declare(exchange=self.cache_exchange, exchange_type="fanout")
+			queue = channel.queue_declare(queue="", exclusive=True).method.queue
+			channel.queue_bind(queue=queue, exchange=self.cache_exchange)
+			return queue
+		self._start("cache-subscriber", bind, handler, None)
+
+	def _start(self, name: str, bind, handler, dlq: Optional[str]):
+		consumer = threading.Thread(target=self._consume_loop, args=(bind, handler, dlq), name=name, daemon=True)
+		consumer.start()
+		self._consumers.append(consumer)
+
+	def _consume_loop(self, bind, handler, dlq: Optional[str]):
+		while not self._stop.is_set():
+			try:
+				conn = pika.BlockingConnection(self.params)
+				try:
+					channel = conn.channel()
+					queue = bind(channel)
+					channel.basic_qos(prefetch_count=10)
+					channel.basic_consume(queue=queue, on_message_callback=lambda ch, method, props, body: self._deliver(ch, method, body, handler, dlq))
+					while not self._stop.is_set():
+						conn.process_data_events(time_limit=1)
+				finally:
+					if conn.is_open:
+						conn.close()
+			except Exception as e:
+				print(f"Event consumer lost its connection, retrying: {e}")
+				self._stop.wait(2)
+
+	def _deliver(self, channel, method, body, handler, dlq: Optional[str]):
+		try:
+			handler(json.loads(body))
+		except Exception as e:
+			if dlq is None:
+				print(f"Failed to handle message: {e}")
+			else:
+				print(f"Failed to handle event, sending to {dlq}: {e}")
+				channel.basic_publish(exchange="", routing_key=dlq, body=body)
+		channel.basic_ack(delivery_tag=method.delivery_tag)
+
+	def close(self):
+		self._stop.set()
+		for consumer in self._consumers:
+			consumer.join(timeout=5)
+		with self._lock:
+			if self._conn is not None and self._conn.is_open:
+				self._conn.close()
@@ -0,0 +1,175 @@
+from typing import Optional
+import asyncio
+import json
+import os
+import threading
+
+# outbox ======================================================================
+# Relay settings, overridable from the environment
+OUTBOX_CONFIG = {
+	"interval": float(os.environ.get("OUTBOX_INTERVAL", 1)),  # seconds between polls when no local write woke the relay
+	"batch": int(os.environ.get("OUTBOX_BATCH", 100)),        # events claimed per round
+	"lease": float(os.environ.get("OUTBOX_LEASE", 30)),       # seconds a claim hides events from the other replicas
+	"retry": float(os.environ.get("OUTBOX_RETRY", 5)),        # seconds before events the broker refused are tried again
+}
+
+# Queue events in the caller's transaction (a psycopg2 cursor), so they exist if
+# and only if the change they announce commits
+def enqueue(cursor, event: str, payloads: list):
+	cursor.executemany("INSERT INTO event_outbox (event, payload) VALUES (%s, %s)", [(event, json.dumps(p)) for p in payloads])
+
+# enqueue for an asyncpg connection inside a transaction
+async def enqueue_async(conn, event: str, payloads: list):
+	await conn.executemany("INSERT INTO event_outbox (event, payload) VALUES ($1, $2::jsonb)", [(event, json.dumps(p)) for p in payloads])
+
+# Publishes what enqueue wrote. A round claims up to batch due events by pushing
+# their available_at lease seconds ahead and commits, so no transaction is open
+# while the broker is called and other replicas skip them. Published events are
+# deleted; the rest are made due again retry seconds later. A replica that dies
+# mid-round leaves its claim to expire, so an event can be published twice but
+# is never lost; consumers treat a repeated event as a no-op.
+class OutboxRelay:
+	def __init__(self, pool, events, interval: float = 1, batch: int = 100, lease: float = 30, retry: float = 5):
+		self.pool = pool
+		self.events = events
+		self.interval = interval
+		self.batch = batch
+		self.lease = lease
+		self.retry = retry
+		self._stop = threading.Event()
+		self._wake = threading.Event()
+		self._thread = None
+		self._stats = {"rounds": 0, "published": 0, "failures": 0}
+
+	def start(self):
+		self._thread = threading.Thread(target=self._loop, name="outbox-relay", daemon=True)
+		self._thread.start()
+
+	# Call after committing enqueued events, so they go out without waiting for the next poll
+	def wake(self):
+		self._wake.set()
+
+	def _loop(self):
+		while not self._stop.is_set():
+			self._wake.clear()
+			try:
+				published = self.relay()
+			except Exception as e:
+				self._stats["failures"] += 1
+				print(f"Outbox relay round failed: {e}")
+				published = 0
+			# a full batch means more may be due already
+			if published < self.batch:
+				self._wake.wait(self.interval)
+
+	# One round; returns the number of events published
+	def relay(self) -> int:
+		with self.pool.connection() as conn:
+			with conn.cursor() as c:
+				c.execute("""
+					UPDATE event_outbox SET available_at = now() + %s::float8 * interval '1 second'
+					WHERE event_id IN (
+						SELECT event_id FROM event_outbox
+						WHERE available_at <= now()
+						ORDER BY event_id
+						LIMIT %s
+						FOR UPDATE SKIP LOCKED
+					)
+					RETURNING event_id, event, payload
+				""", (self.lease, self.batch))
+				rows = sorted(c.fetchall())
+			conn.commit()
+		if not rows:
+			return 0
+		sent = self._publish(rows)
+		with self.pool.connection() as conn:
+			with conn.cursor() as c:
+				if sent:
+					c.execute("DELETE FROM event_outbox WHERE event_id = ANY(%s)", ([row[0] for row in rows[:sent]],))
+				if sent < len(rows):
+					c.execute("UPDATE event_outbox SET available_at = now() + %s::float8 * interval '1 second' WHERE event_id = ANY(%s)",
+						(self.retry, [row[0] for row in rows[sent:]]))
+			conn.commit()
+		return sent
+
+	# Publish rows in order until the broker fails; returns how many went out
+	def _publish(self, rows: list) -> int:
+		self._stats["rounds"] += 1
+		sent = 0
+		try:
+			for _, event, payload in rows:
+				self.events.publish(event, payload if isinstance(payload, dict) else json.loads(payload))
+				sent += 1
+		except Exception as e:
+			self._stats["failures"] += 1
+			print(f"Failed to publish {len(rows) - sent} outbox events, retrying in {self.retry}s: {e}")
+		self._stats["published"] += sent
+		return sent
+
+	def stats(self) -> dict:
+		return dict(self._stats, interval=self.interval, batch=self.batch)
+
+	def close(self):
+		self._stop.set()
+		self._wake.set()
+		if self._thread is not None:
+			self._thread.join(timeout=5)
+
+# Same relay on the event loop, for an asyncpg pool; events are handed to the
+# blocking EventBus on a worker thread
+class AsyncOutboxRelay(OutboxRelay):
+	def __init__(self, pool, events, interval: float = 1, batch: int = 100, lease: float = 30, retry: float = 5):
+		super().__init__(pool, events, interval, batch, lease, retry)
+		self._task: Optional[asyncio.Task] = None
+		self._wake = asyncio.Event()
+
+	def start(self):
+		self._task = asyncio.create_task(self._loop())
+
+	async def _loop(self):
+		while True:
+			self._wake.clear()
+			try:
+				published = await self.relay()
+			except Exception as e:
+				self._stats["failures"] += 1
+				print(f"Outbox relay round failed: {e}")
+				published = 0
+			if published < self.batch:
+				try:
+					await asyncio.wait_for(self._wake.wait(), self.interval)
+				except asyncio.TimeoutError:
+					pass
+
+	async def relay(self) -> int:
+		rows = await self.pool.fetch("""
+			UPDATE event_outbox SET available_at = now() + $1::float8 * interval '1 second'
+			WHERE event_id IN (
+				SELECT event_id FROM event_outbox
+				WHERE available_at <= now()
+				ORDER BY event_id
+				LIMIT $2
+				FOR UPDATE SKIP LOCKED
+			)
+			RETURNING event_id, event, payload
+		""", self.lease, self.batch)
+		if not rows:
+			return 0
+		rows = sorted(tuple(row) for row in rows)
+		sent = await asyncio.to_thread(self._publish, rows)
+		async with self.pool.acquire() as conn:
+			async with conn.transaction():
+				if sent:
+					await conn.execute("DELETE FROM event_outbox WHERE event_id = ANY($1::bigint[])", [row[0] for row in rows[:sent]])
+				if sent < len(rows):
+					await conn.execute("UPDATE event_outbox SET available_at = now() + $1::float8 * interval '1 second' WHERE event_id = ANY($2::bigint[])",
+						self.retry, [row[0] for row in rows[sent:]])
+		return sent
+
+	async def close(self):
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
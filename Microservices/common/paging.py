@@ -0,0 +1,59 @@
+from typing import Optional
+from urllib.parse import urlencode
+import base64
+import json
+import os
+
+# pagination ==================================================================
+PAGE_SIZE = 100       # rows per page when only after or sort is given
+MAX_PAGE_SIZE = 1000  # largest limit accepted
+
+# Opaque keyset cursor: the sort value and id of the last row on a page
+def encode_cursor(values: list) -> str:
+	return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+# Values come back as text, the way encode_cursor is given them; the query casts them
+def decode_cursor(cursor: str) -> list:
+	try:
+		values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+	except ValueError:
+		raise ValueError("Invalid cursor.")
+	if not isinstance(values, list) or len(values) != 2:
+		raise ValueError("Invalid cursor.")
+	return [str(v) for v in values]
+
+# Link to the next page as seen through the gateway, which strips the service prefix.
+# request is the Starlette request of the page being answered.
+def next_link(request, cursor: Optional[str], path: str = "/") -> Optional[str]:
+	if cursor is None:
+		return None
+	params = {k: v for k, v in request.query_params.items() if k not in ("after", "estimate")}
+	params["after"] = cursor
+	return f"{request.headers.get('x-forwarded-prefix', '')}{path}?{urlencode(params)}"
+
+# Whether If-None-Match names the current ETag; GET uses the weak comparison, so W/ is ignored
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+	if not if_none_match:
+		return False
+	if if_none_match.strip() == "*":
+		return True
+	return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+# batch loading ===============================================================
+BATCH_MAX_ROWS = int(os.environ.get("BATCH_MAX_ROWS", 500000))  # rows accepted by one POST /batch
+
+# Rows of a POST /batch body: a JSON array of objects, or NDJSON with one object per line.
+# Rows come back in input order; an NDJSON line that is not valid JSON comes back as its error.
+def parse_batch(body: bytes) -> list:
+	text = body.decode("utf-8").strip()
+	if text.startswith("["):
+		return json.loads(text)
+	rows = []
+	for line in text.splitlines():
+		if not line.strip():
+			continue
+		try:
+			rows.append(json.loads(line))
+		except ValueError as e:
+			rows.append(e)
+	return rows
@@ -0,0 +1,93 @@
+# test_admission.py - request gates and the 503 they answer with when shedding
+#   python -m pytest Microservices/common/tests
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.admission import AdmissionControl, AdmissionGate, admission_gates
+
+
+def test_full_queue_is_shed_at_once():
+	async def run():
+		gate = AdmissionGate(limit=1, queue=0, wait=5)
+		assert await gate.acquire()
+		assert not await gate.acquire()
+		return gate.stats()
+	stats = asyncio.run(run())
+	assert stats["shed_queue_full"] == 1
+	assert stats["shed"] == 1
+	assert stats["in_flight"] == 1
+
+
+def test_waiting_request_is_shed_after_wait():
+	async def run():
+		gate = AdmissionGate(limit=1, queue=1, wait=0.01)
+		await gate.acquire()
+		assert not await gate.acquire()
+		return gate.stats()
+	stats = asyncio.run(run())
+	assert stats["shed_timeout"] == 1
+	assert stats["waiting"] == 0
+
+
+def test_queued_request_gets_the_released_slot():
+	async def run():
+		gate = AdmissionGate(limit=1, queue=1, wait=5)
+		await gate.acquire()
+		waiter = asyncio.ensure_future(gate.acquire())
+		await asyncio.sleep(0)
+		gate.release()
+		assert await waiter
+		return gate.stats()
+	stats = asyncio.run(run())
+	assert stats["queued"] == 1
+	assert stats["admitted"] == 2
+	assert stats["shed"] == 0
+
+
+class App:
+	def __init__(self):
+		self.calls = 0
+		self.release = asyncio.Event()
+
+	async def __call__(self, scope, receive, send):
+		self.calls += 1
+		await self.release.wait()
+		await send({"type": "http.response.start", "status": 200, "headers": []})
+		await send({"type": "http.response.body", "body": b"{}"})
+
+
+def request(path: str = "/", method: str = "GET") -> dict:
+	return {"type": "http", "method": method, "path": path}
+
+
+async def call(middleware, scope) -> list:
+	sent = []
+
+	async def send(message):
+		sent.append(message)
+	await middleware(scope, None, send)
+	return sent
+
+
+def test_shed_request_gets_503_with_retry_after():
+	async def run():
+		app = App()
+		middleware = AdmissionControl(app, gates=admission_gates({"reads": 1, "writes": 1, "queue": 0, "wait": 0}), retry_after=3)
+		busy = asyncio.ensure_future(call(middleware, request()))
+		await asyncio.sleep(0)
+		shed = await call(middleware, request())
+		# writes have their own gate and health checks skip the gates
+		app.release.set()
+		admitted = [await call(middleware, request(method="POST")), await call(middleware, request("/health"))]
+		await busy
+		return app.calls, shed, admitted
+	calls, shed, admitted = asyncio.run(run())
+	assert calls == 3
+	assert shed[0]["status"] == 503
+	assert (b"retry-after", b"3") in shed[0]["headers"]
+	assert b"overloaded" in shed[1]["body"]
+	assert all(sent[0]["status"] == 200 for sent in admitted)
@@ -0,0 +1,90 @@
+# test_outbox.py - what the outbox relay deletes and retries after a round
+#   python -m pytest Microservices/common/tests
+
+import os
+import sys
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.outbox import OutboxRelay, enqueue
+
+
+# Just enough of a psycopg2 pool: records statements, claims return the given rows
+class Pool:
+	def __init__(self, claimed: list):
+		self.claimed = claimed
+		self.statements = []
+		self.commits = 0
+
+	@contextmanager
+	def connection(self):
+		yield self
+
+	@contextmanager
+	def cursor(self):
+		yield self
+
+	def execute(self, sql: str, params=None):
+		self.statements.append((" ".join(sql.split()), params))
+
+	def executemany(self, sql: str, params: list):
+		for p in params:
+			self.execute(sql, p)
+
+	def fetchall(self):
+		return self.claimed
+
+	def commit(self):
+		self.commits += 1
+
+	def after_claim(self, verb: str) -> list:
+		return [params for sql, params in self.statements[1:] if sql.startswith(verb)]
+
+
+class Bus:
+	def __init__(self, fail_on: str = None):
+		self.fail_on = fail_on
+		self.published = []
+
+	def publish(self, event: str, payload: dict):
+		if payload.get("id") == self.fail_on:
+			raise ConnectionError("broker down")
+		self.published.append((event, payload))
+
+
+ROWS = [(3, "supplier.deleted", {"id": "c"}), (1, "supplier.deleted", {"id": "a"}), (2, "supplier.deleted", '{"id": "b"}')]
+
+
+def test_published_events_are_deleted_in_order():
+	pool, bus = Pool(list(ROWS)), Bus()
+	assert OutboxRelay(pool, bus).relay() == 3
+	assert [payload["id"] for _, payload in bus.published] == ["a", "b", "c"]
+	assert pool.after_claim("DELETE") == [([1, 2, 3],)]
+	assert pool.after_claim("UPDATE") == []
+	# the claim is committed before the broker is called
+	assert pool.commits == 2
+
+
+def test_events_after_a_broker_failure_are_retried():
+	pool, bus = Pool(list(ROWS)), Bus(fail_on="b")
+	relay = OutboxRelay(pool, bus, retry=7)
+	assert relay.relay() == 1
+	assert pool.after_claim("DELETE") == [([1],)]
+	assert pool.after_claim("UPDATE") == [(7, [2, 3])]
+	assert relay.stats()["failures"] == 1
+
+
+def test_nothing_due_touches_nothing():
+	pool = Pool([])
+	assert OutboxRelay(pool, Bus()).relay() == 0
+	assert len(pool.statements) == 1
+
+
+def test_enqueue_writes_one_row_per_payload():
+	pool = Pool([])
+	enqueue(pool, "supplier.deleted", [{"supplier_id": "a"}, {"supplier_id": "b"}])
+	assert [params for _, params in pool.statements] == [
+		("supplier.deleted", '{"supplier_id": "a"}'),
+		("supplier.deleted", '{"supplier_id": "b"}'),
+	]
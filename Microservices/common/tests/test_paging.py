@@ -0,0 +1,57 @@
+# test_paging.py - keyset cursors, next links, ETag matching and batch bodies
+#   python -m pytest Microservices/common/tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.paging import decode_cursor, encode_cursor, etag_matches, next_link, parse_batch
+
+
+def test_cursor_round_trips_as_text():
+	cursor = encode_cursor(["9.990000", "0b6f0a56-5a3e-4b8e-9a44-6f6c5b0e8d1e"])
+	assert "=" not in cursor
+	assert decode_cursor(cursor) == ["9.990000", "0b6f0a56-5a3e-4b8e-9a44-6f6c5b0e8d1e"]
+	assert decode_cursor(encode_cursor([1.5, "id"])) == ["1.5", "id"]
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", encode_cursor(["only one"]), encode_cursor({"a": 1}), "e30"])
+def test_bad_cursor_is_rejected(cursor):
+	with pytest.raises(ValueError, match="Invalid cursor."):
+		decode_cursor(cursor)
+
+
+class Request:
+	def __init__(self, query: dict, headers: dict):
+		self.query_params = query
+		self.headers = headers
+
+
+def test_next_link_keeps_the_query_behind_the_gateway_prefix():
+	request = Request({"limit": "10", "after": "old", "estimate": "true", "sort": "name"}, {"x-forwarded-prefix": "/suppliers"})
+	assert next_link(request, "abc") == "/suppliers/?limit=10&sort=name&after=abc"
+	assert next_link(request, "abc", "/search") == "/suppliers/search?limit=10&sort=name&after=abc"
+	assert next_link(request, None) is None
+
+
+@pytest.mark.parametrize("header, matches", [
+	(None, False),
+	("", False),
+	('"abc"', True),
+	('W/"abc"', True),
+	('"xyz", W/"abc"', True),
+	('"xyz"', False),
+	("*", True),
+])
+def test_etag_matches(header, matches):
+	assert etag_matches(header, '"abc"') is matches
+
+
+def test_parse_batch_accepts_json_and_ndjson():
+	assert parse_batch(b'[{"name": "a"}, {"name": "b"}]') == [{"name": "a"}, {"name": "b"}]
+	rows = parse_batch(b'{"name": "a"}\n\nnot json\n{"name": "b"}\n')
+	assert rows[0] == {"name": "a"} and rows[2] == {"name": "b"}
+	assert isinstance(rows[1], ValueError)
@@ -0,0 +1,90 @@
+# test_ttl_cache.py - read cache expiry, eviction and invalidation between replicas
+#   python -m pytest Microservices/common/tests
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.cache import AsyncTTLCache, TTLCache, cache_key
+
+
+def test_cache_key_is_the_canonical_uuid():
+	sid = uuid.uuid4()
+	assert cache_key(str(sid).upper()) == str(sid)
+	assert cache_key("not-a-uuid") == "not-a-uuid"
+	assert cache_key(None) is None
+
+
+def test_hits_expiry_and_eviction():
+	cache = TTLCache(maxsize=2, ttl=60)
+	assert cache.get_or_load("a", lambda: 1) == 1
+	assert cache.get_or_load("a", lambda: 2) == 1
+	cache.get_or_load("b", lambda: 1)
+	cache.get_or_load("c", lambda: 1)
+	assert cache.get_or_load("a", lambda: 3) == 3
+	stats = cache.stats()
+	assert (stats["hits"], stats["misses"], stats["evicted"]) == (1, 4, 2)
+	expiring = TTLCache(maxsize=2, ttl=0)
+	expiring.get_or_load("a", lambda: 1)
+	assert expiring.get_or_load("a", lambda: 2) == 2
+
+
+def test_invalidate_drops_the_row():
+	cache = TTLCache()
+	cache.get_or_load("a", lambda: "old")
+	cache.invalidate("a")
+	assert cache.get_or_load("a", lambda: "new") == "new"
+	assert cache.stats()["invalidations"] == 1
+
+
+def test_load_racing_an_invalidation_is_not_stored():
+	cache = TTLCache()
+
+	def racing_load():
+		cache.invalidate("a")
+		return "stale"
+	assert cache.get_or_load("a", racing_load) == "stale"
+	assert cache.get_or_load("a", lambda: "fresh") == "fresh"
+
+
+def test_broadcast_reaches_other_replicas_only():
+	ours, theirs = TTLCache(), TTLCache()
+	for cache in (ours, theirs):
+		cache.get_or_load("a", lambda: "old")
+	sent = []
+	ours.invalidate("a")
+	ours.broadcast("a", sent.append)
+	# the broker delivers every broadcast to every replica, the sender included
+	for cache in (ours, theirs):
+		cache.handle_broadcast(sent[0])
+	assert ours.stats()["remote_invalidations"] == 0
+	assert theirs.stats()["remote_invalidations"] == 1
+	assert theirs.get_or_load("a", lambda: "new") == "new"
+	assert theirs.stats()["invalidation_lag_ms"]["max"] >= 0
+
+
+def test_failed_broadcast_is_counted():
+	cache = TTLCache()
+
+	def unreachable(message):
+		raise ConnectionError("broker down")
+	cache.broadcast("a", unreachable)
+	assert cache.stats()["broadcast_failures"] == 1
+
+
+def test_async_cache_awaits_the_loader():
+	cache = AsyncTTLCache()
+	loads = []
+
+	async def load():
+		loads.append(time.monotonic())
+		return "row"
+
+	async def run():
+		return [await cache.get_or_load("a", load) for _ in range(2)]
+	assert asyncio.run(run()) == ["row", "row"]
+	assert len(loads) == 1
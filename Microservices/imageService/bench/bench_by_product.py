@@ -0,0 +1,112 @@
+# bench_by_product.py - images-by-product lookups at 1M images, with and without images_product_id_idx
+#
+# Loads --images rows spread over --products products into a temporary copy of
+# the images table (the real table is not touched), then times the queries
+# behind GET /?p_id= and POST /by-products before and after creating the index.
+# Prints mean/p99 latency and the plan Postgres picked for each.
+# Needs the image database, e.g. run it inside the images_service container:
+#   python bench/bench_by_product.py --images 1000000 --products 100000
+
+import argparse
+import os
+import random
+import time
+
+import psycopg2
+
+DB_CONFIG = {
+	"dbname": os.environ.get("DB_NAME", "image_db"),
+	"user": os.environ.get("DB_USER", "postgres"),
+	"password": os.environ.get("DB_PASSWORD", "solid"),
+	"host": os.environ.get("DB_HOST", "image_db"),
+	"port": int(os.environ.get("DB_PORT", 5432)),
+}
+
+# the statements image.py runs, pointed at the temporary table
+SINGLE = "SELECT * FROM bench_images WHERE product_id = %s ORDER BY image_id"
+BULK = "SELECT * FROM bench_images WHERE product_id = ANY(%s::uuid[]) ORDER BY product_id, image_id"
+
+
+# Images are inserted in random order, as they would arrive over time, so a
+# product's rows are scattered across the table
+def load(cur, images: int, products: int):
+	cur.execute("CREATE TEMP TABLE bench_products (product_id UUID PRIMARY KEY DEFAULT uuid_generate_v4())")
+	cur.execute("INSERT INTO bench_products SELECT FROM generate_series(1, %s)", (products,))
+	cur.execute("CREATE TEMP TABLE bench_images (LIKE images INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+	cur.execute("""
+		INSERT INTO bench_images (product_id, url)
+		SELECT p.product_id, 'http://images.example/' || g
+		FROM generate_series(1, %s) g
+		JOIN (SELECT product_id, row_number() OVER () - 1 AS n FROM bench_products) p ON p.n = g %% %s
+		ORDER BY random()
+	""", (images, products))
+	cur.execute("ANALYZE bench_images")
+	cur.execute("SELECT product_id::text FROM bench_products")
+	return [row[0] for row in cur.fetchall()]
+
+
+def plan(cur, sql: str, params: tuple) -> str:
+	cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+	node = cur.fetchone()[0][0]["Plan"]
+	# skip the Sort on top to show how the rows are found
+	while node["Node Type"] == "Sort" and node.get("Plans"):
+		node = node["Plans"][0]
+	return node["Node Type"]
+
+
+def timed(cur, sql: str, params_list: list) -> list:
+	latencies = []
+	for params in params_list:
+		start = time.perf_counter()
+		cur.execute(sql, params)
+		cur.fetchall()
+		latencies.append(time.perf_counter() - start)
+	latencies.sort()
+	return latencies
+
+
+def report(label: str, latencies: list, node: str):
+	mean = sum(latencies) / len(latencies) * 1000
+	p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000
+	print(f"{label:<28} {mean:>10.3f} {p99:>10.3f}  {node}")
+
+
+def run(cur, label: str, pids: list, args):
+	rng = random.Random(1)
+	singles = [(rng.choice(pids),) for _ in range(args.lookups)]
+	bulks = [(rng.sample(pids, args.bulk_size),) for _ in range(max(1, args.lookups // 10))]
+	report(f"{label} GET /?p_id=", timed(cur, SINGLE, singles), plan(cur, SINGLE, singles[0]))
+	report(f"{label} POST /by-products", timed(cur, BULK, bulks), plan(cur, BULK, bulks[0]))
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--images", type=int, default=1000000)
+	parser.add_argument("--products", type=int, default=100000)
+	parser.add_argument("--lookups", type=int, default=200)
+	parser.add_argument("--bulk-size", type=int, default=100)
+	args = parser.parse_args()
+
+	conn = psycopg2.connect(**DB_CONFIG)
+	conn.autocommit = True
+	cur = conn.cursor()
+
+	start = time.perf_counter()
+	pids = load(cur, args.images, args.products)
+	print(f"loaded {args.images} images over {args.products} products in {time.perf_counter() - start:.1f}s")
+	print(f"lookups={args.lookups} bulk_size={args.bulk_size}")
+	print(f"{'query':<28} {'mean ms':>10} {'p99 ms':>10}  plan")
+
+	# fewer lookups without the index: each one reads the whole table
+	run(cur, "no index", pids, argparse.Namespace(**dict(vars(args), lookups=max(10, args.lookups // 10))))
+	start = time.perf_counter()
+	cur.execute("CREATE INDEX ON bench_images (product_id, image_id)")
+	cur.execute("ANALYZE bench_images")
+	print(f"index built in {time.perf_counter() - start:.1f}s")
+	run(cur, "index", pids, args)
+
+	conn.close()
+
+
+if __name__ == "__main__":
+	main()
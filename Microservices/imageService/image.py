@@ -1,28 +1,55 @@
-from typing import Optional
-import psycopg2
-from contextlib import contextmanager
+from typing import Optional, Union
+from contextlib import asynccontextmanager, contextmanager
+import os
 import uuid
 from fastapi import FastAPI, Request, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-import json
+from common.admission import ADMISSION_CONFIG, ADMISSION_RETRY_AFTER, AdmissionControl, admission_gates
+from common.cache import CACHE_CONFIG, TTLCache, cache_key
+from common.db import POOL_CONFIG, ConnectionPool, create_batch, estimate_rows, read_page
+from common.events import MQ_CONFIG, EventBus
+from common.paging import BATCH_MAX_ROWS, PAGE_SIZE, etag_matches, next_link, parse_batch
 
 # database connection =========================================================
 DB_CONFIG = {
-	"dbname": "image_db",
-	"user": "postgres",
-	"password": "solid",
-	"host": "image_db",  # add when docker set up for containers
-	"port": 5432
+	"dbname": os.environ.get("DB_NAME", "image_db"),
+	"user": os.environ.get("DB_USER", "postgres"),
+	"password": os.environ.get("DB_PASSWORD", "solid"),
+	"host": os.environ.get("DB_HOST", "image_db"),  # add when docker set up for containers
+	"port": int(os.environ.get("DB_PORT", 5432))
 }
 
+# created in the app lifespan, one per worker process
+pool: Optional[ConnectionPool] = None
+
 @contextmanager
 def get_conn():
-	conn = psycopg2.connect(**DB_CONFIG)
+	conn = pool.getconn()
 	try:
 		yield conn
 	finally:
-		conn.close()
+		pool.putconn(conn)
+
+class NotFoundError(Exception):
+	pass
+
+# events ======================================================================
+# created in the app lifespan, one per worker process
+events: Optional[EventBus] = None
+
+# cache =======================================================================
+# one per worker process; replicas keep each other's copy fresh through the cache exchange
+cache = TTLCache(**CACHE_CONFIG)
+
+# Drop a row from this replica's cache and tell the other replicas to do the same.
+# Call after commit; if the broker is unreachable the others catch up within CACHE_TTL.
+def invalidate(entity_id: str):
+	key = cache_key(entity_id)
+	cache.invalidate(key)
+	cache.broadcast(key, events.broadcast)
 
 # validation functions ========================================================
 def gen_uuid():
@@ -43,6 +70,9 @@ def validate_nonnegative(field_name: str, value):
 	if not isinstance(value, int) or value < 0:
 		raise Exception(f"{field_name} must be a non-negative integer.")
 
+# batch loading ===============================================================
+BY_PRODUCTS_MAX = int(os.environ.get("BY_PRODUCTS_MAX", 1000))  # product ids accepted by one POST /by-products
+
 # database functions ==========================================================
 def images_read() -> Optional[list]:
 	with get_conn() as conn:
@@ -50,6 +80,9 @@ def images_read() -> Optional[list]:
 			c.execute("""SELECT (image_id) FROM images""")
 			return c.fetchall()
 
+def images_page(limit: int, after: Optional[str] = None, sort: Optional[str] = None, order: str = "asc"):
+	return read_page(pool, "images", "image_id", ("image_id",), limit, after, sort, order)
+
 def image_create(product_id: str, url: str) -> str:
     try:
         validate_nonempty("product_id", product_id)
@@ -60,35 +93,72 @@ def image_create(product_id: str, url: str) -> str:
                 c.execute("""
                     INSERT INTO images (image_id, product_id, url)
                     VALUES (%s, %s, %s)
+                    RETURNING image_id
                 """, (iid, product_id, url))
+                iid = c.fetchone()[0]
                 conn.commit()
         return iid
     except Exception as e:
         raise Exception(f"Failed to create image: {str(e)}")
 
-def image_read(image_id: str) -> Optional[tuple]:
+# Same checks as image_create, for one row of a batch; product_id must also parse as a UUID
+def image_row_values(row: dict) -> tuple:
+	img = Image.model_validate(row)
+	validate_nonempty("product_id", img.p_id)
+	validate_nonempty("url", img.url)
+	try:
+		uuid.UUID(img.p_id)
+	except ValueError:
+		raise ValueError(f"product_id {img.p_id} is not a valid UUID.")
+	return (img.p_id, img.url)
+
+def images_create_batch(rows: list) -> dict:
+	return create_batch(pool, rows, "images", ("image_id", "product_id", "url"), image_row_values)
+
+def image_read(image_id: str) -> dict:
+    return image_read_tagged(image_id)[0]
+
+# Columns an image row is returned with, in order
+IMAGE_COLUMNS = "image_id, product_id, url"
+
+# A row read with IMAGE_COLUMNS as the object ImageRow describes, ready for orjson
+def image_row(row) -> dict:
+    return {"image_id": str(row[0]), "product_id": str(row[1]), "url": row[2]}
+
+# The row and its ETag, an md5 of the row's text form computed by Postgres,
+# so any change to any column gives a new tag. Served from the cache when fresh.
+def image_read_tagged(image_id: str) -> tuple:
+    return cache.get_or_load(cache_key(image_id), lambda: image_load(image_id))
+
+def image_load(image_id: str) -> tuple:
     with get_conn() as conn:
         with conn.cursor() as c:
-            c.execute("SELECT * FROM images WHERE image_id = %s", (image_id,))
-            row = c.fetchall()[0]
-            ret = []
-            for data in row:
-                ret.append(str(data))
-            return ret
-
-def image_update(image_id: str, product_id: str, url: str) -> Optional[tuple]:
+            c.execute(f"""SELECT {IMAGE_COLUMNS}, md5(ROW({IMAGE_COLUMNS})::text) FROM images WHERE image_id = %s""", (image_id,))
+            row = c.fetchone()
+            if row is None:
+                raise NotFoundError(f"Image {image_id} not found.")
+            return image_row(row), f'"{row[-1]}"'
+
+def image_update(image_id: str, product_id: str, url: str) -> dict:
     try:
         validate_nonempty("product_id", product_id)
         validate_nonempty("url", url)
         with get_conn() as conn:
             with conn.cursor() as c:
-                c.execute("""
+                c.execute(f"""
                     UPDATE images
                     SET product_id = %s, url = %s
                     WHERE image_id = %s
+                    RETURNING {IMAGE_COLUMNS}
                 """, (product_id, url, image_id))
+                row = c.fetchone()
+                if row is None:
+                    raise NotFoundError(f"Image {image_id} not found.")
                 conn.commit()
-        return image_read(image_id)
+        invalidate(image_id)
+        return image_row(row)
+    except NotFoundError:
+        raise
     except Exception as e:
         raise Exception(f"Failed to update image: {str(e)}")
 
@@ -97,19 +167,111 @@ def image_delete(image_id: str) -> None:
         with conn.cursor() as c:
             c.execute("DELETE FROM images WHERE image_id = %s", (image_id,))
             conn.commit()
+    invalidate(image_id)
+
+# Served from images_product_id_idx
+def productImages_read(product_id: str) -> list:
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            c.execute(f"SELECT {IMAGE_COLUMNS} FROM images WHERE product_id = %s ORDER BY image_id", (product_id,))
+            return [image_row(row) for row in c.fetchall()]
+
+# Images of many products in one query: {product_id: [image rows]}, with an
+# empty list for products that have none. Raises ValueError on an id that is not a UUID.
+def productsImages_read(product_ids: list) -> dict:
+    ids = [str(uuid.UUID(pid)) for pid in product_ids]
+    ret = {pid: [] for pid in ids}
+    if not ids:
+        return ret
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            c.execute(f"""
+                SELECT {IMAGE_COLUMNS} FROM images
+                WHERE product_id = ANY(%s::uuid[])
+                ORDER BY product_id, image_id
+            """, (ids,))
+            for row in c.fetchall():
+                ret[str(row[1])].append(image_row(row))
+    return ret
+
+def productImages_delete(product_id: str) -> None:
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM images WHERE product_id = %s RETURNING image_id", (product_id,))
+            deleted = [str(row[0]) for row in c.fetchall()]
+            conn.commit()
+    for image_id in deleted:
+        invalidate(image_id)
+
+# events from other services: images of a deleted product go with it
+def handle_event(event: dict):
+    if event["event"] == "product.deleted":
+        productImages_delete(event["product_id"])
+
+# admission control ===========================================================
+# one gate per kind of request, per worker process
+admission = admission_gates(ADMISSION_CONFIG)
 
 # http server config ==========================================================
 class Image(BaseModel):
 	p_id: str
 	url: str
 
-app = FastAPI()
+class ProductIds(BaseModel):
+	p_ids: list[str]
+
+# response models: they document the replies, which read paths build as plain
+# dicts (image_row) and hand straight to orjson without another validation pass
+class ImageRow(BaseModel):
+	image_id: str
+	product_id: str
+	url: str
+
+class ImageReply(BaseModel):
+	image: ImageRow
+
+class ImageIdList(BaseModel):
+	images: list[list[str]]
+	next: Optional[str] = None
+
+class ImageList(BaseModel):
+	images: list[ImageRow]
+
+# GET / answers one image with i_id, a product's images with p_id, otherwise their ids; 304 when the If-None-Match tag is still current
+READ_RESPONSES = {200: {"model": Union[ImageReply, ImageList, ImageIdList]}, 304: {"description": "Not Modified"}}
+
+class ImagesByProduct(BaseModel):
+	images: dict[str, list[ImageRow]]
+
+# Open the pool and the event bus when a worker starts and close them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	global pool, events
+	pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+	events = EventBus("image", **MQ_CONFIG)
+	events.consume(["product.deleted"], handle_event)
+	events.subscribe(cache.handle_broadcast)
+	try:
+		pool.prewarm()
+	except Exception as e:
+		print(f"Database not reachable yet, connections will be opened on demand: {e}")
+	try:
+		yield
+	finally:
+		events.close()
+		pool.close()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# added first, so it runs inside CORS and shed replies still carry the CORS headers
+app.add_middleware(AdmissionControl, gates=admission, retry_after=ADMISSION_RETRY_AFTER)
 
 app.add_middleware(
 		CORSMiddleware,
 		allow_origins=["*"],
 		allow_methods=["*"],
-		allow_headers=["*"]
+		allow_headers=["*"],
+		expose_headers=["X-Total-Count-Estimate", "ETag", "Retry-After"]
 )
 
 @app.options("/")
@@ -121,27 +283,49 @@ def preflight_handler():
 	}
 	return Response(status_code=200, headers=headers)
 
-@app.get("/")
-def read_images(i_id: Optional[str] = None):
+# pool occupancy, cache hit rate/staleness and admitted/shed requests for load balancers and dashboards
+@app.get("/health")
+def health():
+	return {"status": "ok", "pool": pool.stats(), "cache": cache.stats(), "admission": {kind: gate.stats() for kind, gate in admission.items()}}
+
+@app.get("/", responses=READ_RESPONSES)
+def read_images(request: Request, response: Response, i_id: Optional[str] = None, p_id: Optional[str] = None, limit: Optional[int] = None,
+        after: Optional[str] = None, sort: Optional[str] = None, order: str = "asc", estimate: bool = False):
     try:
+        # every image of one product
+        if (i_id is None or i_id == "") and p_id:
+            return ORJSONResponse({"images": productImages_read(p_id)})
         if (i_id is None or i_id == ""):
-            data = images_read() #read all images
-            return {"images": data}
+            if estimate:
+                response.headers["X-Total-Count-Estimate"] = str(estimate_rows(pool, "images"))
+            # no paging parameters: every id, as before
+            if limit is None and after is None and sort is None:
+                data = images_read() #read all images
+                return {"images": data}
+            data, cursor = images_page(limit or PAGE_SIZE, after, sort, order)
+            return {"images": data, "next": next_link(request, cursor)}
         else:
-            data = image_read(i_id) #read specific image
-            return {"image": data}
+            data, etag = image_read_tagged(i_id) #read specific image
+            # the client's copy is current: answer without a body
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+            return ORJSONResponse({"image": data}, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    except NotFoundError as ex:
+        raise HTTPException(status_code=404, detail=str(ex))
     except Exception as ex:
         raise HTTPException(status_code=400, detail=str(ex))
 
 
-@app.put("/{i_id}")
+@app.put("/{i_id}", response_model=ImageReply)
 def update_image(i_id: str, img: Image):
 	#return {"image": img}
 	try:
 		data = image_update(i_id, img.p_id, img.url)
+	except NotFoundError as ex:
+		raise HTTPException(status_code=404, detail=str(ex))
 	except Exception as ex:
 		raise HTTPException(status_code=400, detail=str(ex))
-	return {"image": data}
+	return ORJSONResponse({"image": data})
 
 @app.post("/")
 def create_image(img: Image):
@@ -152,6 +336,30 @@ def create_image(img: Image):
 		raise HTTPException(status_code=400, detail=str(ex))
 	return {"i_id": data}
 
+# bulk import: a JSON array or NDJSON of the objects POST / takes
+@app.post("/batch")
+async def create_images_batch(request: Request):
+	try:
+		rows = parse_batch(await request.body())
+	except ValueError as ex:
+		raise HTTPException(status_code=400, detail=f"Invalid batch: {ex}")
+	if not isinstance(rows, list):
+		raise HTTPException(status_code=400, detail="Invalid batch: expected a JSON array or NDJSON.")
+	if len(rows) > BATCH_MAX_ROWS:
+		raise HTTPException(status_code=413, detail=f"Batch of {len(rows)} rows exceeds the {BATCH_MAX_ROWS} row limit.")
+	return await run_in_threadpool(images_create_batch, rows)
+
+# images of many products at once, e.g. for a product list page
+@app.post("/by-products", response_model=ImagesByProduct)
+def read_images_by_products(body: ProductIds):
+	if len(body.p_ids) > BY_PRODUCTS_MAX:
+		raise HTTPException(status_code=413, detail=f"{len(body.p_ids)} products exceed the {BY_PRODUCTS_MAX} product limit.")
+	try:
+		data = productsImages_read(body.p_ids)
+	except ValueError as ex:
+		raise HTTPException(status_code=400, detail=f"Invalid product id: {ex}")
+	return ORJSONResponse({"images": data})
+
 @app.delete("/{i_id}")
 def delete_image(i_id: str):
     try:
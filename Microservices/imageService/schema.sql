@@ -6,6 +6,10 @@ CREATE TABLE IF NOT EXISTS images (
     url TEXT NOT NULL
 );
 
+-- GET /?p_id=, POST /by-products and the product.deleted cleanup look images up by product;
+-- the id makes the per-product order an index order
+CREATE INDEX IF NOT EXISTS images_product_id_idx ON images (product_id, image_id);
+
 /*
 --old table from layered, kept here for debugging
 CREATE TABLE IF NOT EXISTS images (
@@ -0,0 +1,173 @@
+# bench_async.py - the sync product service this app replaced vs product.py under concurrent load
+#
+# The sync baseline is the psycopg2/requests product.py as it was before the
+# async rewrite, taken from git (--sync-ref, by default the parent of the
+# commit that added the async app) or from a file exported with
+#   git show <ref>:Microservices/productService/product.py > product_sync.py
+# when the machine running the bench has no checkout (--sync-file).
+# Starts each app with uvicorn on its own port, seeds some products, then keeps
+# --concurrency requests in flight for --seconds with a mix of single-product
+# reads, supplier-link reads and updates. Prints requests/sec and p50/p99 latency.
+# Needs the product database, RabbitMQ, and psycopg2-binary and requests for the
+# baseline, e.g. run it inside the products_service container:
+#   python bench/bench_async.py --sync-file product_sync.py --concurrency 64 --seconds 20
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SERVICE_PATH = "Microservices/productService/product.py"
+ASYNC_PATH = "Microservices/productService/product_async.py"  # where the async app was first added
+APPS = ("sync", "async")
+
+
+def git(*args) -> str:
+	return subprocess.run(["git", *args], cwd=SERVICE_DIR, check=True, capture_output=True, text=True).stdout
+
+
+# Write the baseline to app_dir/product_sync.py and return its uvicorn app name
+def export_sync_app(args, app_dir: str) -> str:
+	if args.sync_file:
+		with open(args.sync_file) as f:
+			source = f.read()
+	else:
+		ref = args.sync_ref or git("log", "--diff-filter=A", "--format=%H", "--", ":/" + ASYNC_PATH).split()[-1] + "^"
+		source = git("show", f"{ref}:{SERVICE_PATH}")
+	with open(os.path.join(app_dir, "product_sync.py"), "w") as f:
+		f.write(source)
+	return "product_sync:app"
+
+
+async def wait_ready(url: str, timeout: float = 20):
+	deadline = time.monotonic() + timeout
+	async with httpx.AsyncClient() as client:
+		while time.monotonic() < deadline:
+			try:
+				await client.options(url + "/")
+				return
+			except httpx.TransportError:
+				await asyncio.sleep(0.2)
+	raise Exception(f"{url} did not come up")
+
+
+async def seed(client: httpx.AsyncClient, url: str, products: int) -> list:
+	pids = []
+	for n in range(products):
+		r = await client.post(url + "/", json={
+			"name": f"bench product {n}", "description": "created by bench_async.py",
+			"quantity": n, "price": "9.99",
+		})
+		r.raise_for_status()
+		pids.append(r.json()["p_id"])
+	return pids
+
+
+async def worker(client: httpx.AsyncClient, url: str, pids: list, deadline: float, write_ratio: float, latencies: list, errors: list):
+	rng = random.Random()
+	while time.monotonic() < deadline:
+		pid = rng.choice(pids)
+		r = rng.random()
+		start = time.perf_counter()
+		try:
+			if r < write_ratio:
+				resp = await client.put(f"{url}/{pid}", json={
+					"name": "bench product", "description": "updated by bench_async.py",
+					"quantity": rng.randint(0, 1000), "price": "9.99",
+				})
+			elif r < write_ratio + (1 - write_ratio) / 2:
+				resp = await client.get(url + "/", params={"p_id": pid})
+			else:
+				resp = await client.get(f"{url}/suppliers/{pid}")
+			if resp.status_code > 299:
+				errors.append(resp.status_code)
+				continue
+		except httpx.HTTPError:
+			errors.append(None)
+			continue
+		latencies.append(time.perf_counter() - start)
+
+
+async def load(url: str, pids: list, concurrency: int, seconds: float, write_ratio: float):
+	latencies, errors = [], []
+	limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+	async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+		deadline = time.monotonic() + seconds
+		await asyncio.gather(*[
+			worker(client, url, pids, deadline, write_ratio, latencies, errors)
+			for _ in range(concurrency)
+		])
+	latencies.sort()
+	return latencies, errors
+
+
+def percentile(values: list, q: float) -> float:
+	if not values:
+		return 0.0
+	return values[min(len(values) - 1, int(q * len(values)))]
+
+
+# Both apps see the service directory and common/, wherever the bench runs from
+def app_env(app_dir: str) -> dict:
+	path = [app_dir, SERVICE_DIR, os.path.join(SERVICE_DIR, "..")]
+	if os.environ.get("PYTHONPATH"):
+		path.append(os.environ["PYTHONPATH"])
+	return dict(os.environ, PYTHONPATH=os.pathsep.join(path))
+
+
+async def run(name: str, app: str, app_dir: str, port: int, args):
+	url = f"http://127.0.0.1:{port}"
+	server = subprocess.Popen(
+		[sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+		 "--workers", str(args.workers), "--log-level", "warning"],
+		cwd=SERVICE_DIR, env=app_env(app_dir),
+	)
+	try:
+		await wait_ready(url)
+		async with httpx.AsyncClient(timeout=30) as client:
+			pids = await seed(client, url, args.products)
+			try:
+				latencies, errors = await load(url, pids, args.concurrency, args.seconds, args.write_ratio)
+			finally:
+				for pid in pids:
+					await client.delete(f"{url}/{pid}")
+	finally:
+		server.terminate()
+		server.wait()
+	rate = len(latencies) / args.seconds
+	print(f"{name:>6} {rate:>10.1f} {percentile(latencies, 0.50) * 1000:>8.1f} "
+	      f"{percentile(latencies, 0.99) * 1000:>8.1f} {len(errors):>7}")
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--apps", nargs="+", choices=APPS, default=list(APPS))
+	parser.add_argument("--sync-ref", help="git revision to take the sync product.py from")
+	parser.add_argument("--sync-file", help="sync product.py exported from git, for machines without a checkout")
+	parser.add_argument("--concurrency", type=int, default=64)
+	parser.add_argument("--seconds", type=float, default=15)
+	parser.add_argument("--products", type=int, default=200)
+	parser.add_argument("--write-ratio", type=float, default=0.2)
+	parser.add_argument("--workers", type=int, default=1)
+	parser.add_argument("--port", type=int, default=8200)
+	args = parser.parse_args()
+
+	print(f"concurrency={args.concurrency} seconds={args.seconds} workers={args.workers} write_ratio={args.write_ratio}")
+	print(f"{'app':>6} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+	with tempfile.TemporaryDirectory() as app_dir:
+		apps = {"async": "product:app"}
+		if "sync" in args.apps:
+			apps["sync"] = export_sync_app(args, app_dir)
+		for n, name in enumerate(args.apps):
+			asyncio.run(run(name, apps[name], app_dir, args.port + n, args))
+
+
+if __name__ == "__main__":
+	main()
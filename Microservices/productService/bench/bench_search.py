@@ -0,0 +1,121 @@
+# bench_search.py - GET /search latency at 1M products
+#
+# Loads --products generated products into a temporary "products" table, which
+# shadows the real one for this session only, so product.products_search runs
+# unchanged against it. Word frequencies are skewed so some terms match a large
+# share of the rows and others only a few. For each query prints the number of
+# matches and the mean/p99 latency of the first and second page, next to an
+# ILIKE scan of the same rows for comparison.
+# Needs the product database, e.g. run it inside the products_service container:
+#   python bench/bench_search.py --products 1000000
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))  # common/
+
+import product
+
+WORDS = [
+	"steel", "blue", "cable", "pack", "large", "small", "red", "wooden", "chair", "table",
+	"desk", "lamp", "green", "black", "white", "box", "screw", "bolt", "washer", "bracket",
+	"hinge", "handle", "drawer", "shelf", "panel", "frame", "glass", "mirror", "cushion", "fabric",
+	"leather", "cotton", "wool", "silk", "rubber", "plastic", "copper", "brass", "aluminium", "carbon",
+	"battery", "charger", "adapter", "switch", "socket", "plug", "sensor", "monitor", "keyboard", "mouse",
+	"printer", "scanner", "router", "antenna", "speaker", "headphone", "microphone", "camera", "tripod", "lens",
+	"bottle", "kettle", "teapot", "saucepan", "skillet", "spatula", "whisk", "grater", "colander", "ladle",
+	"hammer", "wrench", "pliers", "chisel", "sander", "drill", "plane", "clamp", "level", "trowel",
+	"notebook", "pencil", "marker", "stapler", "envelope", "binder", "folder", "easel", "canvas", "palette",
+	"telescope", "compass", "barometer", "thermostat", "hygrometer", "anemometer", "sextant", "astrolabe", "gyroscope", "pendulum",
+]
+
+
+# Name of 3 words and description of 12, drawn with a bias towards the start of WORDS
+async def load(conn, products: int):
+	async with conn.transaction():
+		await conn.execute("CREATE TEMP TABLE products (LIKE public.products INCLUDING DEFAULTS INCLUDING GENERATED)")
+		await conn.execute("""
+			INSERT INTO products (name, description, quantity, price)
+			SELECT
+				(SELECT string_agg(w[1 + floor(power(random(), 2) * array_length(w, 1))::int], ' ') FROM generate_series(1, 3) WHERE g > 0),
+				(SELECT string_agg(w[1 + floor(power(random(), 2) * array_length(w, 1))::int], ' ') FROM generate_series(1, 12) WHERE g > 0),
+				(random() * 1000)::int,
+				round((1 + random() * 500)::numeric, 2)
+			FROM generate_series(1, $1::int) g, (SELECT $2::text[] AS w) v
+		""", products, WORDS)
+		await conn.execute("ALTER TABLE products ADD PRIMARY KEY (product_id)")
+		await conn.execute("CREATE INDEX ON products USING GIN (search)")
+	await conn.execute("ANALYZE products")
+
+
+async def matches(conn, q: str) -> int:
+	return await conn.fetchval("SELECT COUNT(*) FROM products WHERE search @@ to_tsquery('english', $1)", product.search_query(q))
+
+
+async def timed(fn, iterations: int) -> list:
+	latencies = []
+	for _ in range(iterations):
+		start = time.perf_counter()
+		await fn()
+		latencies.append(time.perf_counter() - start)
+	latencies.sort()
+	return latencies
+
+
+def summary(latencies: Optional[list]) -> str:
+	if not latencies:
+		return f"{'-':>9} {'-':>9}"
+	mean = sum(latencies) / len(latencies) * 1000
+	p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000
+	return f"{mean:>9.2f} {p99:>9.2f}"
+
+
+async def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--products", type=int, default=1000000)
+	parser.add_argument("--iterations", type=int, default=50)
+	parser.add_argument("--limit", type=int, default=product.SEARCH_PAGE_SIZE)
+	args = parser.parse_args()
+
+	# one connection, so the temporary table is what products_search sees
+	product.pool = product.ConnectionPool(product.DB_CONFIG, minconn=1, maxconn=1)
+	await product.pool.open()
+	queries = [
+		WORDS[0],                 # in most rows
+		WORDS[-1],                # in few rows
+		WORDS[40][:4],            # prefix
+		f"{WORDS[3]} {WORDS[30]}",  # two words
+	]
+	try:
+		async with product.pool.acquire() as conn:
+			start = time.perf_counter()
+			await load(conn, args.products)
+			print(f"loaded {args.products} products in {time.perf_counter() - start:.1f}s")
+			counts = {q: await matches(conn, q) for q in queries}
+
+		async def ilike(q: str):
+			await product.pool.fetch("""
+				SELECT product_id FROM products WHERE name ILIKE $1 OR description ILIKE $1
+				ORDER BY product_id LIMIT $2
+			""", f"%{q}%", args.limit)
+
+		print(f"iterations={args.iterations} limit={args.limit}")
+		print(f"{'q':<20} {'matches':>9} {'page 1 ms':>9} {'p99':>9} {'page 2 ms':>9} {'p99':>9} {'ILIKE ms':>9} {'p99':>9}")
+		for q in queries:
+			_, cursor = await product.products_search(q, args.limit)
+			first = await timed(lambda: product.products_search(q, args.limit), args.iterations)
+			second = await timed(lambda: product.products_search(q, args.limit, cursor), args.iterations) if cursor else None
+			# only single words have an ILIKE equivalent
+			scan = await timed(lambda: ilike(q), max(3, args.iterations // 10)) if " " not in q else None
+			print(f"{q:<20} {counts[q]:>9} {summary(first)} {summary(second)} {summary(scan)}")
+	finally:
+		await product.pool.close()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
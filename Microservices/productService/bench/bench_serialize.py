@@ -0,0 +1,81 @@
+# bench_serialize.py - CPU spent turning product rows into a response body
+#
+# Compares the old read path, every column passed through str() and the reply
+# run through jsonable_encoder and the stdlib JSONResponse, with the current one,
+# product.product_row and ORJSONResponse. Rows are built in memory the way
+# asyncpg returns them (UUID, str, str, int, Decimal), so no database is needed.
+# Prints CPU microseconds per reply and body size for GET /?p_id= (one row) and a
+# GET /search page (--page rows).
+#   python bench/bench_serialize.py --iterations 20000 --page 100
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))  # common/
+
+import product
+
+
+def make_row(rng: random.Random) -> tuple:
+	return (
+		uuid.UUID(int=rng.getrandbits(128), version=4),
+		f"product {rng.randrange(100000)}",
+		" ".join(rng.choice(("steel", "blue", "cable", "pack", "large", "small")) for _ in range(12)),
+		rng.randrange(1000),
+		Decimal(rng.randrange(100, 50000)) / 100,
+	)
+
+
+# the path before typed rows: a list of strings per row, encoded by FastAPI's defaults
+def old_single(row: tuple) -> bytes:
+	return JSONResponse(jsonable_encoder({"product": [str(data) for data in row]})).body
+
+def old_page(rows: list) -> bytes:
+	return JSONResponse(jsonable_encoder({"products": [[str(data) for data in row] for row in rows], "next": None})).body
+
+def new_single(row: tuple) -> bytes:
+	return ORJSONResponse({"product": product.product_row(row)}).body
+
+def new_page(rows: list) -> bytes:
+	return ORJSONResponse({"products": [product.product_row(row) for row in rows], "next": None}).body
+
+
+# CPU microseconds per call, process time so other load on the machine does not count
+def cpu_us(fn, arg, iterations: int) -> float:
+	start = time.process_time()
+	for _ in range(iterations):
+		fn(arg)
+	return (time.process_time() - start) / iterations * 1e6
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--iterations", type=int, default=20000)
+	parser.add_argument("--page", type=int, default=100)
+	args = parser.parse_args()
+
+	rng = random.Random(1)
+	row = make_row(rng)
+	rows = [make_row(rng) for _ in range(args.page)]
+
+	print(f"iterations={args.iterations} page={args.page}")
+	print(f"{'reply':<18} {'old us':>9} {'new us':>9} {'saved':>7} {'old B':>8} {'new B':>8}")
+	for label, old, new, arg, n in (
+		("one product", old_single, new_single, row, args.iterations),
+		("search page", old_page, new_page, rows, max(1, args.iterations // args.page)),
+	):
+		old_us, new_us = cpu_us(old, arg, n), cpu_us(new, arg, n)
+		print(f"{label:<18} {old_us:>9.1f} {new_us:>9.1f} {1 - new_us / old_us:>7.0%} {len(old(arg)):>8} {len(new(arg)):>8}")
+
+
+if __name__ == "__main__":
+	main()
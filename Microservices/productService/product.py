@@ -1,33 +1,229 @@
-from typing import Optional
-import psycopg2
-from contextlib import contextmanager
+from typing import Optional, Union
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from collections import deque
+from urllib.parse import urlsplit
+import asyncio
+import os
+import re
+import time
 import uuid
+import asyncpg
+import httpx
 from fastapi import FastAPI, Request, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-import requests
-import json
+from common.admission import ADMISSION_CONFIG, ADMISSION_RETRY_AFTER, AdmissionControl, admission_gates
+from common.cache import CACHE_CONFIG, AsyncTTLCache, cache_key
+from common.events import MQ_CONFIG, EventBus
+from common.outbox import OUTBOX_CONFIG, AsyncOutboxRelay, enqueue_async
+from common.paging import BATCH_MAX_ROWS, MAX_PAGE_SIZE, PAGE_SIZE, decode_cursor, encode_cursor, etag_matches, next_link, parse_batch
+
+# Endpoints run on the event loop with an asyncpg connection pool and an httpx
+# client, so a request waiting on the database or another service does not hold
+# a threadpool thread.
 
 # URLs ========================================================================
 supplier_url = "http://kong:8000/suppliers/"
 category_url = "http://kong:8000/categories/"
+image_url = "http://kong:8000/images/"
 
 # database connection =========================================================
 DB_CONFIG = {
-	"dbname": "product_db",
-	"user": "postgres",
-	"password": "solid",
-	"host": "product_db",  # add when docker set up for containers
-	"port": 5432
+	"database": os.environ.get("DB_NAME", "product_db"),
+	"user": os.environ.get("DB_USER", "postgres"),
+	"password": os.environ.get("DB_PASSWORD", "solid"),
+	"host": os.environ.get("DB_HOST", "product_db"),  # add when docker set up for containers
+	"port": int(os.environ.get("DB_PORT", 5432))
 }
 
-@contextmanager
-def get_conn():
-	conn = psycopg2.connect(**DB_CONFIG)
-	try:
-		yield conn
-	finally:
-		conn.close()
+# Connection pool settings, overridable from the environment
+POOL_CONFIG = {
+	"minconn": int(os.environ.get("DB_POOL_MIN", 2)),         # connections opened at startup
+	"maxconn": int(os.environ.get("DB_POOL_MAX", 10)),        # hard cap on open connections
+	"timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),  # seconds to wait for a free connection
+	"max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),  # seconds before a connection is replaced
+	"max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", 300)),  # idle seconds before a connection is closed
+}
+
+# asyncpg pool with the limits of the psycopg2 pools in the other services:
+# acquiring waits at most timeout seconds, and a connection older than
+# max_lifetime is closed when it is returned, so the pool opens a fresh one.
+class ConnectionPool:
+	def __init__(self, dsn: dict, minconn: int = 2, maxconn: int = 10, timeout: float = 10, max_lifetime: float = 1800, max_idle: float = 300):
+		if minconn < 0 or maxconn < 1 or minconn > maxconn:
+			raise ValueError("Pool sizes must satisfy 0 <= minconn <= maxconn and maxconn >= 1.")
+		self.dsn = dsn
+		self.minconn = minconn
+		self.maxconn = maxconn
+		self.timeout = timeout
+		self.max_lifetime = max_lifetime
+		self.max_idle = max_idle
+		self._pool: Optional[asyncpg.Pool] = None
+		self._born = {}  # server pid of a connection -> time it was opened
+		self._stats = {"created": 0, "recycled": 0, "timeouts": 0}
+
+	async def open(self):
+		self._pool = await asyncpg.create_pool(
+			**self.dsn, min_size=self.minconn, max_size=self.maxconn,
+			max_inactive_connection_lifetime=self.max_idle, init=self._init,
+		)
+
+	async def _init(self, conn):
+		now = time.monotonic()
+		# connections the pool closed for idling are never seen again, forget them eventually
+		self._born = {pid: born for pid, born in self._born.items() if now - born <= 2 * self.max_lifetime}
+		self._born[conn.get_server_pid()] = now
+		self._stats["created"] += 1
+
+	@asynccontextmanager
+	async def acquire(self):
+		try:
+			conn = await self._pool.acquire(timeout=self.timeout)
+		except asyncio.TimeoutError:
+			self._stats["timeouts"] += 1
+			raise Exception(f"Timed out after {self.timeout}s waiting for a database connection.")
+		try:
+			yield conn
+		finally:
+			try:
+				if time.monotonic() - self._born.get(conn.get_server_pid(), 0) > self.max_lifetime:
+					self._stats["recycled"] += 1
+					# releasing a closed connection is a no-op, the pool reconnects on demand
+					await conn.close(timeout=self.timeout)
+			finally:
+				await self._pool.release(conn)
+
+	async def fetch(self, query: str, *args):
+		async with self.acquire() as conn:
+			return await conn.fetch(query, *args)
+
+	async def fetchrow(self, query: str, *args):
+		async with self.acquire() as conn:
+			return await conn.fetchrow(query, *args)
+
+	async def fetchval(self, query: str, *args):
+		async with self.acquire() as conn:
+			return await conn.fetchval(query, *args)
+
+	async def execute(self, query: str, *args):
+		async with self.acquire() as conn:
+			return await conn.execute(query, *args)
+
+	def stats(self) -> dict:
+		ret = dict(self._stats)
+		size, idle = self._pool.get_size(), self._pool.get_idle_size()
+		ret.update({
+			"size": size,
+			"idle": idle,
+			"in_use": size - idle,
+			"minconn": self.minconn,
+			"maxconn": self.maxconn,
+		})
+		return ret
+
+	async def close(self):
+		await self._pool.close()
+
+# Settings for calls to the other services, overridable from the environment
+HTTP_CONFIG = {
+	"pool_maxsize": int(os.environ.get("HTTP_POOL_MAX", 10)),             # kept-alive connections to the gateway
+	"connect_timeout": float(os.environ.get("HTTP_CONNECT_TIMEOUT", 2)),  # seconds to open a connection
+	"read_timeout": float(os.environ.get("HTTP_READ_TIMEOUT", 5)),        # seconds to wait for a response
+}
+
+# Settings for GET /{p_id}/full, overridable from the environment
+DETAIL_CONFIG = {
+	"deadline": float(os.environ.get("DETAIL_DEADLINE", 2)),  # seconds to wait for the other services before answering with what arrived
+}
+
+# Orphan-supplier reaper settings, overridable from the environment
+REAPER_CONFIG = {
+	"interval": float(os.environ.get("REAPER_INTERVAL", 30)),  # seconds between runs
+	"batch": int(os.environ.get("REAPER_BATCH", 500)),         # candidates claimed at once, at most the supplier service's BULK_DELETE_MAX
+	"lease": float(os.environ.get("REAPER_LEASE", 60)),        # seconds a claim hides candidates; longer than a bulk-delete call may take
+}
+
+# Latencies kept per target for the percentiles reported on /health
+HTTP_SAMPLES = 1024
+
+# One keep-alive httpx client shared by every cross-service call, with latency
+# recorded per target, e.g. "DELETE kong:8000/suppliers", for /health.
+class ServiceClient:
+	def __init__(self, pool_maxsize: int = 10, connect_timeout: float = 2, read_timeout: float = 5):
+		self.client = httpx.AsyncClient(
+			limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+			timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+		)
+		self._targets = {}
+
+	async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+		parts = urlsplit(url)
+		target = f"{method} {parts.netloc}/{parts.path.strip('/').split('/')[0]}"
+		start = time.perf_counter()
+		failed = True
+		try:
+			r = await self.client.request(method, url, **kwargs)
+			failed = r.status_code >= 500
+			return r
+		finally:
+			entry = self._targets.get(target)
+			if entry is None:
+				entry = self._targets[target] = {"calls": 0, "errors": 0, "samples": deque(maxlen=HTTP_SAMPLES)}
+			entry["calls"] += 1
+			entry["errors"] += failed
+			entry["samples"].append(time.perf_counter() - start)
+
+	async def get(self, url: str, **kwargs) -> httpx.Response:
+		return await self.request("GET", url, **kwargs)
+
+	async def post(self, url: str, **kwargs) -> httpx.Response:
+		return await self.request("POST", url, **kwargs)
+
+	async def delete(self, url: str, **kwargs) -> httpx.Response:
+		return await self.request("DELETE", url, **kwargs)
+
+	# Latency in milliseconds over the most recent calls to each target
+	def stats(self) -> dict:
+		ret = {}
+		for target, entry in self._targets.items():
+			samples = sorted(entry["samples"])
+			pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+			ret[target] = {
+				"calls": entry["calls"],
+				"errors": entry["errors"],
+				"mean": sum(samples) / len(samples) * 1000,
+				"p50": pick(0.50),
+				"p95": pick(0.95),
+				"p99": pick(0.99),
+				"max": samples[-1] * 1000,
+			}
+		return ret
+
+	async def close(self):
+		await self.client.aclose()
+
+# created in the app lifespan, one per worker process
+pool: Optional[ConnectionPool] = None
+http: Optional[ServiceClient] = None
+events: Optional[EventBus] = None
+outbox: Optional[AsyncOutboxRelay] = None  # events reach the broker through it, cache invalidations straight through events
+loop: Optional[asyncio.AbstractEventLoop] = None
+
+class NotFoundError(Exception):
+	pass
+
+# cache =======================================================================
+# one per worker process; replicas keep each other's copy fresh through the cache exchange
+cache = AsyncTTLCache(**CACHE_CONFIG)
+
+# Drop a row from this replica's cache and tell the other replicas to do the same.
+# Call after commit; if the broker is unreachable the others catch up within CACHE_TTL.
+async def invalidate(entity_id: str):
+	key = cache_key(entity_id)
+	cache.invalidate(key)
+	await asyncio.to_thread(cache.broadcast, key, events.broadcast)
 
 # validation functions ========================================================
 def gen_uuid():
@@ -48,14 +244,98 @@ def validate_nonnegative(field_name: str, value):
 	if not isinstance(value, int) or value < 0:
 		raise Exception(f"{field_name} must be a non-negative integer.")
 
+# batch loading ===============================================================
+# Load rows with one COPY in a transaction. If the database rejects the COPY, the rows
+# are inserted one at a time under a savepoint so only the offending ones are left out.
+# Returns {position in rows: error} for the rows that were not inserted.
+async def copy_rows(table: str, columns: tuple, rows: list) -> dict:
+	failed = {}
+	async with pool.acquire() as conn:
+		try:
+			async with conn.transaction():
+				await conn.copy_records_to_table(table, records=rows, columns=list(columns))
+			return failed
+		except Exception:
+			pass
+		insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(f'${n + 1}' for n in range(len(columns)))})"
+		async with conn.transaction():
+			for n, row in enumerate(rows):
+				try:
+					async with conn.transaction():
+						await conn.execute(insert, *row)
+				except Exception as e:
+					failed[n] = str(e).strip()
+	return failed
+
+# Validate each row with check(row) -> tuple of column values (without the id),
+# COPY the valid ones and report the rest. ids are in input order, None where the row failed.
+async def create_batch(rows: list, table: str, columns: tuple, check) -> dict:
+	ids = [None] * len(rows)
+	errors = {}
+	valid = []
+	positions = []
+	for i, row in enumerate(rows):
+		try:
+			if isinstance(row, Exception):
+				raise row
+			values = check(row)
+		except Exception as e:
+			errors[i] = str(e)
+			continue
+		ids[i] = gen_uuid()
+		valid.append((ids[i],) + values)
+		positions.append(i)
+	if valid:
+		failed = await copy_rows(table, columns, valid)
+		for n, error in failed.items():
+			ids[positions[n]] = None
+			errors[positions[n]] = error
+	return {"ids": ids, "errors": [{"index": i, "error": errors[i]} for i in sorted(errors)]}
+
+# pagination ==================================================================
+# Columns GET / can sort by, with their types; asyncpg binds cursor values as text and casts them
+SORTABLE = {"product_id": "uuid", "name": "text", "price": "numeric", "quantity": "integer"}
+
+# One page of product ids ordered by sort (ties broken by product_id), starting after the cursor.
+# Returns ([[id], ...], cursor of the next page or None on the last one).
+async def products_page(limit: int, after: Optional[str] = None, sort: Optional[str] = None, order: str = "asc"):
+	sort = sort or "product_id"
+	if sort not in SORTABLE:
+		raise ValueError(f"sort must be one of {', '.join(SORTABLE)}.")
+	if order not in ("asc", "desc"):
+		raise ValueError('order must be "asc" or "desc".')
+	if limit < 1 or limit > MAX_PAGE_SIZE:
+		raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+	where, params = "", []
+	if after:
+		where = f"WHERE ({sort}, product_id) {'>' if order == 'asc' else '<'} ($1::text::{SORTABLE[sort]}, $2::text::uuid)"
+		params = decode_cursor(after)
+	try:
+		rows = await pool.fetch(f"""
+			SELECT product_id, {sort} FROM products {where}
+			ORDER BY {sort} {order}, product_id {order}
+			LIMIT ${len(params) + 1}
+		""", *params, limit + 1)
+	except asyncpg.exceptions.DataError:
+		raise ValueError("Invalid cursor.")
+	more = len(rows) > limit
+	rows = rows[:limit]
+	cursor = encode_cursor([str(rows[-1][1]), str(rows[-1][0])]) if more else None
+	return [[str(row[0])] for row in rows], cursor
+
+# Planner's row count for a table, exact only right after ANALYZE; counts when the table was never analyzed
+async def estimate_rows(table: str) -> int:
+	estimate = await pool.fetchval("SELECT reltuples::bigint FROM pg_class WHERE oid = $1::regclass", table)
+	if estimate < 0:
+		estimate = await pool.fetchval(f"SELECT COUNT(*) FROM {table}")
+	return estimate
+
 # database functions ==========================================================
-def products_read() -> Optional[list]:
-	with get_conn() as conn:
-		with conn.cursor() as c:
-			c.execute("""SELECT (product_id) FROM products""")
-			return c.fetchall()
+async def products_read() -> Optional[list]:
+	rows = await pool.fetch("""SELECT (product_id) FROM products""")
+	return [[str(row[0])] for row in rows]
 
-def product_create(name: str, description: Optional[str], quantity: int, price: str) -> str:
+async def product_create(name: str, description: Optional[str], quantity: int, price: str) -> str:
 	try:
 		validate_nonempty("name", name)
 		if description is not None:
@@ -63,118 +343,343 @@ def product_create(name: str, description: Optional[str], quantity: int, price:
 		validate_nonnegative("quantity", quantity)
 		validate_positive("price", float(price))
 		pid = gen_uuid()
-		with get_conn() as conn:
-			with conn.cursor() as c:
-				c.execute("""
-					INSERT INTO products (product_id, name, description, quantity, price)
-					VALUES (%s, %s, %s, %s, %s)
-				""", (pid, name, description, quantity, price))
-				conn.commit()
-		return pid
+		pid = await pool.fetchval("""
+			INSERT INTO products (product_id, name, description, quantity, price)
+			VALUES ($1, $2, $3, $4, $5)
+			RETURNING product_id
+		""", pid, name, description, quantity, Decimal(price))
+		return str(pid)
 
 	except Exception as e:
 		raise Exception(f"Failed to create product: {str(e)}")
 
-def product_read(product_id: str) -> Optional[tuple]:
-	with get_conn() as conn:
-		with conn.cursor() as c:
-			c.execute("""SELECT * FROM products WHERE product_id = %s""", (product_id,))
-			row = c.fetchall()[0]
-			ret = []
-			for data in row:
-				ret.append(str(data))
-			return ret
-
-def product_update(product_id: str, name: str, description: str, quantity: int, price: str) -> Optional[tuple]:
+# Same checks as product_create, for one row of a batch
+def product_row_values(row: dict) -> tuple:
+	prod = Product.model_validate(row)
+	validate_nonempty("name", prod.name)
+	if prod.description is not None:
+		validate_nonempty("description", prod.description)
+	validate_nonnegative("quantity", prod.quantity)
+	validate_positive("price", float(prod.price))
+	return (prod.name, prod.description, prod.quantity, Decimal(prod.price))
+
+async def products_create_batch(rows: list) -> dict:
+	return await create_batch(rows, "products", ("product_id", "name", "description", "quantity", "price"), product_row_values)
+
+async def product_read(product_id: str) -> dict:
+	return (await product_read_tagged(product_id))[0]
+
+# Columns a product row is returned with, in order; the search vector stays in the database
+PRODUCT_COLUMNS = "product_id, name, description, quantity, price"
+
+# A row read with PRODUCT_COLUMNS as the object ProductRow describes, ready for orjson
+def product_row(row) -> dict:
+	return {"product_id": str(row[0]), "name": row[1], "description": row[2], "quantity": row[3], "price": str(row[4])}
+
+# The row and its ETag, an md5 of the row's text form computed by Postgres,
+# so any change to any column gives a new tag. Served from the cache when fresh.
+async def product_read_tagged(product_id: str) -> tuple:
+	return await cache.get_or_load(cache_key(product_id), lambda: product_load(product_id))
+
+async def product_load(product_id: str) -> tuple:
+	row = await pool.fetchrow(f"""SELECT {PRODUCT_COLUMNS}, md5(ROW({PRODUCT_COLUMNS})::text) FROM products WHERE product_id = $1""", product_id)
+	if row is None:
+		raise NotFoundError(f"Product {product_id} not found.")
+	return product_row(row), f'"{row[-1]}"'
+
+async def product_update(product_id: str, name: str, description: str, quantity: int, price: str) -> Optional[tuple]:
 	try:
 		validate_nonempty("name", name)
 		if description is not None:
 			validate_nonempty("description", description)
 		validate_nonnegative("quantity", quantity)
 		validate_positive("price", float(price))
-		with get_conn() as conn:
-			with conn.cursor() as c:
-				c.execute("""
-					UPDATE products
-					SET name = %s, description = %s, quantity = %s, price = %s
-					WHERE product_id = %s
-				""", (name, description, quantity, price, product_id))
-				conn.commit()
-		return product_read(product_id)
+		row = await pool.fetchrow(f"""
+			UPDATE products
+			SET name = $1, description = $2, quantity = $3, price = $4
+			WHERE product_id = $5
+			RETURNING {PRODUCT_COLUMNS}
+		""", name, description, quantity, Decimal(price), product_id)
+		if row is None:
+			raise NotFoundError(f"Product {product_id} not found.")
+		await invalidate(product_id)
+		return product_row(row)
+	except NotFoundError:
+		raise
 	except Exception as e:
-		raise Exception(f"Failed to update product: {str(e)}")  
-
-def product_delete(product_id: str) -> None:
-	with get_conn() as conn:
-		with conn.cursor() as c:
-			c.execute("""
-				SELECT supplier_id, COUNT(supplier_id) FROM product_suppliers WHERE supplier_id IN (
-				SELECT supplier_id FROM product_suppliers WHERE product_id = %s
-				) GROUP BY supplier_id
-			""", (product_id,))
-			rows = c.fetchall()
-			for row in rows:
-				count = row[1]
-				if count == 1:
-					r = requests.delete(supplier_url + '/' + row[0])
-					if r.status_code > 299:
-						print(r.json().get("detail"))
-						return
-			c.execute("DELETE FROM products WHERE product_id = %s", (product_id,))
-			conn.commit()
-	# r = requests.delete(supplier_url + "products/" + product_id)
-	# if r.status_code > 299:
-	# 	print(r.json().get("detail"))
-	requests.delete(category_url + "products/" + product_id)
+		raise Exception(f"Failed to update product: {str(e)}")
+
+# Deletes the product with one local statement and announces it. Its supplier links
+# go with it (ON DELETE CASCADE) and the orphan reaper removes suppliers left without
+# products; the category and image services clean up their own data on the event.
+async def product_delete(product_id: str) -> None:
+	async with pool.acquire() as conn:
+		async with conn.transaction():
+			deleted = await conn.fetchval("DELETE FROM products WHERE product_id = $1 RETURNING product_id", product_id)
+			# the other services drop their links to the product when they see the event
+			if deleted is not None:
+				await enqueue_async(conn, "product.deleted", [{"product_id": product_id}])
+	if deleted is not None:
+		await invalidate(product_id)
+		outbox.wake()
+
+# search ======================================================================
+SEARCH_PAGE_SIZE = 20  # results per page when no limit is given
+SEARCH_MAX_WORDS = 8   # words of q used, the rest are ignored
+
+# "red cha" -> "red:* & cha:*": every word has to match, each as a word prefix.
+# Only letters and digits are kept, so q cannot inject tsquery operators.
+def search_query(q: str) -> str:
+	words = re.findall(r"[^\W_]+", q)
+	if not words:
+		raise ValueError("q must contain at least one letter or digit.")
+	return " & ".join(f"{word}:*" for word in words[:SEARCH_MAX_WORDS])
+
+# One page of products matching q, best match first (name counts more than
+# description), from the GIN index on products.search. The cursor holds the last
+# row's rank and id. Returns ([row, ...], cursor of the next page or None on the last one).
+async def products_search(q: str, limit: int = SEARCH_PAGE_SIZE, after: Optional[str] = None):
+	if limit < 1 or limit > MAX_PAGE_SIZE:
+		raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+	params = [search_query(q)]
+	where = ""
+	if after:
+		where = "WHERE (rank, product_id) < ($2::text::real, $3::text::uuid)"
+		params += decode_cursor(after)
+	try:
+		rows = await pool.fetch(f"""
+			SELECT {PRODUCT_COLUMNS}, rank FROM (
+				SELECT {PRODUCT_COLUMNS}, ts_rank_cd(search, query) AS rank
+				FROM products, to_tsquery('english', $1) query
+				WHERE search @@ query
+			) matches {where}
+			ORDER BY rank DESC, product_id DESC
+			LIMIT ${len(params) + 1}
+		""", *params, limit + 1)
+	except asyncpg.exceptions.DataError:
+		raise ValueError("Invalid cursor.")
+	more = len(rows) > limit
+	rows = rows[:limit]
+	cursor = encode_cursor([str(rows[-1][-1]), str(rows[-1][0])]) if more else None
+	return [product_row(row) for row in rows], cursor
 
 # association =================================================================
-def productSupplier_create(product_id: str, supplier_id: str) -> None:
-	with get_conn() as conn:
-		with conn.cursor() as cur:
-			cur.execute("""
-				INSERT INTO product_suppliers (product_id, supplier_id)
-				VALUES (%s, %s)
-				ON CONFLICT DO NOTHING
-			""", (product_id, supplier_id,))
-			conn.commit()
-
-def productSuppliers_read(supplier_id: str) -> Optional[list]:
-	with get_conn() as conn:
-		with conn.cursor() as cur:
-			cur.execute("""
-				SELECT (product_id)
-				FROM product_suppliers
-				WHERE supplier_id = %s
-			""", (supplier_id,))
-			rows = cur.fetchall()
-			ret = []
-			for data in rows:
-				ret.append(data[0])
-			return ret
-
-def productSupplier_delete(supplier_id: str, product_id: Optional[str] = None) -> None:
-	with get_conn() as conn:
-		with conn.cursor() as cur:
-			if (product_id == None):
-				cur.execute("""
-					DELETE FROM product_suppliers 
-					WHERE supplier_id = %s
-				""", (supplier_id,))
-			else:
-				cur.execute("""
-					SELECT COUNT(*) FROM product_suppliers WHERE supplier_id = %s
-				""", (supplier_id,))
-				count = cur.fetchone()[0]
-				if count == 1:
-					r = requests.delete(supplier_url + '/' + supplier_id)
-					if r.status_code > 299:
-						print(r.json().get("detail"))
-						return
-				cur.execute("""
-					DELETE FROM product_suppliers 
-					WHERE supplier_id = %s AND product_id = %s
-				""", (supplier_id, product_id,))
-			conn.commit()		
+async def productSupplier_create(product_id: str, supplier_id: str) -> None:
+	await pool.execute("""
+		INSERT INTO product_suppliers (product_id, supplier_id)
+		VALUES ($1, $2)
+		ON CONFLICT DO NOTHING
+	""", product_id, supplier_id)
+
+async def productSuppliers_read(supplier_id: str) -> Optional[list]:
+	rows = await pool.fetch("""
+		SELECT (product_id)
+		FROM product_suppliers
+		WHERE supplier_id = $1
+	""", supplier_id)
+	return [str(data[0]) for data in rows]
+
+# the other direction: suppliers linked to a product
+async def productSupplierIds_read(product_id: str) -> list:
+	rows = await pool.fetch("""
+		SELECT supplier_id
+		FROM product_suppliers
+		WHERE product_id = $1
+	""", product_id)
+	return [str(data[0]) for data in rows]
+
+# A supplier left without products is removed later by the orphan reaper
+async def productSupplier_delete(supplier_id: str, product_id: Optional[str] = None) -> None:
+	if (product_id == None):
+		await pool.execute("""
+			DELETE FROM product_suppliers
+			WHERE supplier_id = $1
+		""", supplier_id)
+	else:
+		await pool.execute("""
+			DELETE FROM product_suppliers
+			WHERE supplier_id = $1 AND product_id = $2
+		""", supplier_id, product_id)
+
+# events from other services, delivered on the consumer thread and run on the event loop
+def handle_event(event: dict):
+	if event["event"] == "supplier.deleted":
+		asyncio.run_coroutine_threadsafe(productSupplier_delete(event["supplier_id"]), loop).result()
+
+# orphan reaper ===============================================================
+# Runs kept for the per-run counts and durations reported on /health
+REAPER_RUNS = 20
+
+# Deletes suppliers that no product links to any more, off the request path.
+# ps_after_del queues every supplier that lost a link in supplier_orphan_candidates.
+# Each run claims due candidates in batches with SKIP LOCKED by pushing their
+# queued_at lease seconds ahead, the way the outbox relay claims events, so
+# replicas never work on the same ones and no transaction or row lock is held
+# while the supplier service works. Those that still have no links are removed
+# with one POST /bulk-delete, and the claim is deleted only once that succeeds.
+# If the call fails the orphans are due again at once; if the worker dies or is
+# cancelled mid-call they are due again when the lease runs out, so a supplier
+# can be sent twice but is never forgotten. A claimed supplier that loses
+# another link is made due again by the trigger and kept.
+class OrphanReaper:
+	def __init__(self, interval: float = 30, batch: int = 500, lease: float = 60):
+		self.interval = interval
+		self.batch = batch
+		self.lease = lease
+		self._task = None
+		self._runs = deque(maxlen=REAPER_RUNS)
+		self._totals = {"runs": 0, "failures": 0, "checked": 0, "removed": 0, "requeued": 0}
+
+	def start(self):
+		self._task = asyncio.create_task(self._loop())
+
+	async def _loop(self):
+		while True:
+			await asyncio.sleep(self.interval)
+			try:
+				await self.run()
+			except Exception as e:
+				self._totals["failures"] += 1
+				print(f"Orphan reaper run failed: {e}")
+
+	# One pass over the waiting candidates; returns the number of suppliers removed
+	async def run(self) -> int:
+		start = time.perf_counter()
+		checked = removed = 0
+		while True:
+			claimed, reaped = await self._reap_batch()
+			checked += claimed
+			removed += reaped
+			if claimed < self.batch:
+				break
+		elapsed = (time.perf_counter() - start) * 1000
+		self._totals["runs"] += 1
+		self._totals["checked"] += checked
+		self._totals["removed"] += removed
+		self._runs.append({"at": time.time(), "checked": checked, "removed": removed, "ms": round(elapsed, 1)})
+		if checked:
+			print(f"Orphan reaper removed {removed} of {checked} candidate suppliers in {elapsed:.1f} ms")
+		return removed
+
+	# (candidates claimed, suppliers removed) for one batch
+	async def _reap_batch(self) -> tuple:
+		rows = await pool.fetch("""
+			UPDATE supplier_orphan_candidates q SET queued_at = now() + $2::float8 * interval '1 second'
+			WHERE q.supplier_id IN (
+				SELECT supplier_id FROM supplier_orphan_candidates
+				WHERE queued_at <= now()
+				ORDER BY queued_at
+				LIMIT $1
+				FOR UPDATE SKIP LOCKED
+			)
+			RETURNING q.supplier_id, q.queued_at, NOT EXISTS (
+				SELECT 1 FROM product_suppliers ps WHERE ps.supplier_id = q.supplier_id
+			)
+		""", self.batch, self.lease)
+		if not rows:
+			return 0, 0
+		# every row of one claim carries the same lease
+		lease = rows[0][1]
+		orphans = [row[0] for row in rows if row[2]]
+		linked = [row[0] for row in rows if not row[2]]
+		removed = 0
+		if orphans:
+			try:
+				r = await http.post(supplier_url + "bulk-delete", json={"s_ids": [str(s_id) for s_id in orphans]})
+				r.raise_for_status()
+				# suppliers already deleted some other way are not counted
+				removed = len(r.json()["deleted"])
+			except Exception:
+				# the orphans go to the back of the queue; the linked ones are done
+				await self._finish(lease, linked, orphans)
+				self._totals["requeued"] += len(orphans)
+				raise
+		await self._finish(lease, linked + orphans, [])
+		return len(rows), removed
+
+	# Delete the claimed candidates in done and make those in retry due again.
+	# Rows queued again since the claim no longer carry its lease and are left alone.
+	async def _finish(self, lease, done: list, retry: list):
+		await pool.execute("""
+			WITH done AS (
+				DELETE FROM supplier_orphan_candidates
+				WHERE supplier_id = ANY($1::uuid[]) AND queued_at = $3
+			)
+			UPDATE supplier_orphan_candidates SET queued_at = now()
+			WHERE supplier_id = ANY($2::uuid[]) AND queued_at = $3
+		""", done, retry, lease)
+
+	def stats(self) -> dict:
+		return dict(self._totals, interval=self.interval, batch=self.batch, lease=self.lease, last_runs=list(self._runs))
+
+	async def close(self):
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+
+# created in the app lifespan, one per worker process
+reaper: Optional[OrphanReaper] = None
+
+# product detail ==============================================================
+# GET on another service through the gateway; None when it answers 404
+async def fetch_json(url: str, params: Optional[dict] = None) -> Optional[dict]:
+	r = await http.get(url, params=params)
+	if r.status_code == 404:
+		return None
+	r.raise_for_status()
+	return r.json()
+
+# The result of a fan-out call, or raises if it failed or is still running at the deadline
+def fanout_result(task: asyncio.Task):
+	if not task.done():
+		task.cancel()
+		raise TimeoutError("deadline passed")
+	return task.result()
+
+# The product with its suppliers, categories and images in one reply. Categories
+# and images are requested while the product is read locally, then one request
+# per linked supplier; all of them share one deadline. Whatever has not answered
+# by then is named in "missing" instead of failing the whole page.
+async def product_detail(product_id: str) -> dict:
+	deadline = loop.time() + DETAIL_CONFIG["deadline"]
+	categories = asyncio.create_task(fetch_json(f"{category_url}products/{product_id}"))
+	images = asyncio.create_task(fetch_json(image_url, {"p_id": product_id}))
+	try:
+		product = await product_read(product_id)
+		supplier_ids = await productSupplierIds_read(product_id)
+	except BaseException:
+		categories.cancel()
+		images.cancel()
+		raise
+	suppliers = [asyncio.create_task(fetch_json(supplier_url, {"s_id": s_id})) for s_id in supplier_ids]
+	await asyncio.wait([categories, images] + suppliers, timeout=max(0, deadline - loop.time()))
+
+	detail = {"product": product, "suppliers": [], "categories": [], "images": [], "missing": []}
+	for name, task in (("categories", categories), ("images", images)):
+		try:
+			body = fanout_result(task)
+			detail[name] = body[name] if body else []
+		except Exception as e:
+			print(f"Product {product_id} detail without {name}: {e}")
+			detail["missing"].append(name)
+	for s_id, task in zip(supplier_ids, suppliers):
+		try:
+			body = fanout_result(task)
+			# a supplier deleted since it was linked is left out
+			if body:
+				detail["suppliers"].append(body["supplier"])
+		except Exception as e:
+			print(f"Product {product_id} detail without supplier {s_id}: {e}")
+			detail["missing"].append(f"suppliers/{s_id}")
+	detail["partial"] = bool(detail["missing"])
+	return detail
+
+# admission control ===========================================================
+# one gate per kind of request, per worker process
+admission = admission_gates(ADMISSION_CONFIG)
 
 # http server config ==========================================================
 class Product(BaseModel):
@@ -183,17 +688,76 @@ class Product(BaseModel):
 	quantity: int
 	price: str
 
-app = FastAPI()
+# response models: they document the replies, which read paths build as plain
+# dicts (product_row) and hand straight to orjson without another validation pass
+class ProductRow(BaseModel):
+	product_id: str
+	name: str
+	description: Optional[str]
+	quantity: int
+	price: str
+
+class ProductReply(BaseModel):
+	product: ProductRow
+
+class ProductIdList(BaseModel):
+	products: list[list[str]]
+	next: Optional[str] = None
+
+# GET / answers one product with p_id, otherwise their ids; 304 when the If-None-Match tag is still current
+READ_RESPONSES = {200: {"model": Union[ProductReply, ProductIdList]}, 304: {"description": "Not Modified"}}
+
+class ProductSearchPage(BaseModel):
+	products: list[ProductRow]
+	next: Optional[str]
+
+class ProductDetail(BaseModel):
+	product: ProductRow
+	suppliers: list[dict]
+	categories: list[dict]
+	images: list[dict]
+	missing: list[str]
+	partial: bool
+
+# Open the pool, the HTTP client and the event bus and start the outbox relay and the orphan reaper once per worker process; close them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	global pool, http, events, outbox, loop, reaper
+	loop = asyncio.get_running_loop()
+	pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+	await pool.open()
+	http = ServiceClient(**HTTP_CONFIG)
+	events = EventBus("product", **MQ_CONFIG)
+	outbox = AsyncOutboxRelay(pool, events, **OUTBOX_CONFIG)
+	outbox.start()
+	events.consume(["supplier.deleted"], handle_event)
+	events.subscribe(cache.handle_broadcast)
+	reaper = OrphanReaper(**REAPER_CONFIG)
+	reaper.start()
+	try:
+		yield
+	finally:
+		await reaper.close()
+		await outbox.close()
+		await asyncio.to_thread(events.close)
+		await http.close()
+		await pool.close()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# added first, so it runs inside CORS and shed replies still carry the CORS headers
+app.add_middleware(AdmissionControl, gates=admission, retry_after=ADMISSION_RETRY_AFTER)
 
 app.add_middleware(
 		CORSMiddleware,
 		allow_origins=["*"],
 		allow_methods=["*"],
-		allow_headers=["*"]
+		allow_headers=["*"],
+		expose_headers=["X-Total-Count-Estimate", "ETag", "Retry-After"]
 )
 
 @app.options("/")
-def preflight_handler():
+async def preflight_handler():
 	headers = {
 		"Access-Control-Allow-Origin": "http://localhost:5173",
 		"Access-Control-Allow-Methods": "POST, GET, PUT, DELETE",
@@ -201,54 +765,107 @@ def preflight_handler():
 	}
 	return Response(status_code=200, headers=headers)
 
-@app.get("/")
-def read_products(p_id: Optional[str] = None):
+# pool occupancy, cache hit rate/staleness, reaper runs, outbox relay and admitted/shed requests for load balancers and dashboards
+@app.get("/health")
+async def health():
+	return {"status": "ok", "pool": pool.stats(), "http": http.stats(), "cache": cache.stats(), "reaper": reaper.stats(), "outbox": outbox.stats(), "admission": {kind: gate.stats() for kind, gate in admission.items()}}
+
+@app.get("/", responses=READ_RESPONSES)
+async def read_products(request: Request, response: Response, p_id: Optional[str] = None, limit: Optional[int] = None,
+		after: Optional[str] = None, sort: Optional[str] = None, order: str = "asc", estimate: bool = False):
 	if (p_id is None or p_id == ""):
-		data = products_read()
-		return {"products": data}
-	data = product_read(p_id)
-	return {"product": data}
+		if estimate:
+			response.headers["X-Total-Count-Estimate"] = str(await estimate_rows("products"))
+		# no paging parameters: every id, as before
+		if limit is None and after is None and sort is None:
+			data = await products_read()
+			return {"products": data}
+		try:
+			data, cursor = await products_page(limit or PAGE_SIZE, after, sort, order)
+		except ValueError as ex:
+			raise HTTPException(status_code=400, detail=str(ex))
+		return {"products": data, "next": next_link(request, cursor)}
+	try:
+		data, etag = await product_read_tagged(p_id)
+	except NotFoundError as ex:
+		raise HTTPException(status_code=404, detail=str(ex))
+	# the client's copy is current: answer without a body
+	if etag_matches(request.headers.get("if-none-match"), etag):
+		return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+	return ORJSONResponse({"product": data}, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
-@app.put("/{p_id}")
-def update_product(p_id: str, prod: Product):
+@app.put("/{p_id}", response_model=ProductReply)
+async def update_product(p_id: str, prod: Product):
 	try:
-		data = product_update(p_id, prod.name, prod.description, prod.quantity, prod.price)
+		data = await product_update(p_id, prod.name, prod.description, prod.quantity, prod.price)
+	except NotFoundError as ex:
+		raise HTTPException(status_code=404, detail=str(ex))
 	except Exception as ex:
 		raise HTTPException(status_code=400, detail=str(ex))
-	return {"product": data}
+	return ORJSONResponse({"product": data})
 
 @app.post("/")
-def create_product(prod: Product):
+async def create_product(prod: Product):
 	try:
-		data = product_create(prod.name, prod.description, prod.quantity, prod.price)
+		data = await product_create(prod.name, prod.description, prod.quantity, prod.price)
 	except Exception as ex:
 		raise HTTPException(status_code=400, detail=str(ex))
 	return {"p_id": data}
 
+# bulk import: a JSON array or NDJSON of the objects POST / takes
+@app.post("/batch")
+async def create_products_batch(request: Request):
+	try:
+		rows = parse_batch(await request.body())
+	except ValueError as ex:
+		raise HTTPException(status_code=400, detail=f"Invalid batch: {ex}")
+	if not isinstance(rows, list):
+		raise HTTPException(status_code=400, detail="Invalid batch: expected a JSON array or NDJSON.")
+	if len(rows) > BATCH_MAX_ROWS:
+		raise HTTPException(status_code=413, detail=f"Batch of {len(rows)} rows exceeds the {BATCH_MAX_ROWS} row limit.")
+	return await products_create_batch(rows)
+
 @app.delete("/{p_id}")
-def delete_product(p_id: str):
-	product_delete(p_id)
+async def delete_product(p_id: str):
+	await product_delete(p_id)
 
 # get product suppliers
 @app.get("/suppliers/{s_id}")
-def read_suppliers(s_id: str):
-	data = productSuppliers_read(s_id)
+async def read_suppliers(s_id: str):
+	data = await productSuppliers_read(s_id)
 	return {"products": data}
 
+# full-text search on name and description, ranked, with prefix matching
+@app.get("/search", response_model=ProductSearchPage)
+async def search_products(request: Request, q: str = "", limit: int = SEARCH_PAGE_SIZE, after: Optional[str] = None):
+	try:
+		data, cursor = await products_search(q, limit, after)
+	except ValueError as ex:
+		raise HTTPException(status_code=400, detail=str(ex))
+	return ORJSONResponse({"products": data, "next": next_link(request, cursor, "/search")})
+
+# product, suppliers, categories and images for the product page in one call
+@app.get("/{p_id}/full", response_model=ProductDetail)
+async def read_product_detail(p_id: str):
+	try:
+		return ORJSONResponse(await product_detail(p_id))
+	except NotFoundError as ex:
+		raise HTTPException(status_code=404, detail=str(ex))
+
 # associate supplier with product
 @app.post("/{p_id}/suppliers/{s_id}")
-def associate_product(p_id: str, s_id: str):
-	productSupplier_create(p_id, s_id)
+async def associate_product(p_id: str, s_id: str):
+	await productSupplier_create(p_id, s_id)
 
 # disassociate supplier with product
 @app.delete("/{p_id}/suppliers/{s_id}")
-def delete_association(p_id: str, s_id: str):
-	productSupplier_delete(s_id, p_id)
+async def delete_association(p_id: str, s_id: str):
+	await productSupplier_delete(s_id, p_id)
 
 # dissasociate supplier with all products
 @app.delete("/suppliers/{s_id}")
-def delete_supplier(s_id: str):
+async def delete_supplier(s_id: str):
 	try:
-		productSupplier_delete(s_id)
+		await productSupplier_delete(s_id)
 	except Exception as ex:
-		raise HTTPException(status_code=400, detail=str(ex))
\ No newline at end of file
+		raise HTTPException(status_code=400, detail=str(ex))
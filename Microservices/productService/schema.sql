@@ -8,9 +8,68 @@ CREATE TABLE IF NOT EXISTS products (
     price NUMERIC(20,6) NOT NULL CHECK (price > 0)
 );
 
+-- keyset pagination on GET /?sort=...; the id breaks ties
+CREATE INDEX IF NOT EXISTS products_name_id_idx ON products (name, product_id);
+CREATE INDEX IF NOT EXISTS products_price_id_idx ON products (price, product_id);
+CREATE INDEX IF NOT EXISTS products_quantity_id_idx ON products (quantity, product_id);
+
+-- GET /search: name and description as one weighted tsvector, computed by Postgres on
+-- every insert and update so it cannot drift from the columns
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'B')
+) STORED;
+CREATE INDEX IF NOT EXISTS products_search_idx ON products USING GIN (search);
+
 CREATE TABLE IF NOT EXISTS product_suppliers (
 	product_id UUID NOT NULL,
 	supplier_id UUID NOT NULL,
 	PRIMARY KEY (product_id, supplier_id),
 	FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
-);
\ No newline at end of file
+);
+
+-- lookups and deletes by supplier, and the orphan check below
+CREATE INDEX IF NOT EXISTS product_suppliers_supplier_id_idx ON product_suppliers (supplier_id);
+
+-- suppliers that lost a product link. The orphan reaper in product.py claims them
+-- in batches and deletes, through the supplier service, those left with no links.
+-- queued_at is when a candidate is due: a claim pushes it ahead as a lease and
+-- the row is deleted once the supplier service has answered.
+CREATE TABLE IF NOT EXISTS supplier_orphan_candidates (
+	supplier_id UUID PRIMARY KEY,
+	queued_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS supplier_orphan_candidates_queued_at_idx ON supplier_orphan_candidates (queued_at);
+
+-- Function: queue the suppliers of removed links, once per statement so deleting
+-- a product with many suppliers is a single insert. One already claimed by the
+-- reaper is made due again, which also keeps the reaper from deleting its row.
+CREATE OR REPLACE FUNCTION queue_orphan_supplier_candidates() RETURNS TRIGGER AS $$
+BEGIN
+	INSERT INTO supplier_orphan_candidates (supplier_id)
+	SELECT DISTINCT supplier_id FROM removed
+	ON CONFLICT (supplier_id) DO UPDATE SET queued_at = LEAST(supplier_orphan_candidates.queued_at, now());
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger: also fires for the links removed by ON DELETE CASCADE
+DROP TRIGGER IF EXISTS ps_after_del ON product_suppliers;
+CREATE TRIGGER ps_after_del
+AFTER DELETE ON product_suppliers
+REFERENCING OLD TABLE AS removed
+FOR EACH STATEMENT
+EXECUTE FUNCTION queue_orphan_supplier_candidates();
+
+-- Events written in the same transaction as the change they announce. The
+-- outbox relay publishes due rows in event_id order and deletes them once the
+-- broker has them; available_at is pushed ahead while a replica holds a claim
+-- and after a failed publish.
+CREATE TABLE IF NOT EXISTS event_outbox (
+	event_id BIGSERIAL PRIMARY KEY,
+	event TEXT NOT NULL,
+	payload JSONB NOT NULL,
+	created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+	available_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS event_outbox_available_at_idx ON event_outbox (available_at);
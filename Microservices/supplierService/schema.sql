@@ -5,6 +5,9 @@ CREATE TABLE IF NOT EXISTS suppliers (
     name TEXT NOT NULL,
     contact_email TEXT NOT NULL
 );
+
+-- keyset pagination on GET /?sort=name; the id breaks ties
+CREATE INDEX IF NOT EXISTS suppliers_name_id_idx ON suppliers (name, supplier_id);
 /*
 --Old table from layered for debugging
 CREATE TABLE IF NOT EXISTS supplier_products (
@@ -34,3 +37,16 @@ AFTER DELETE ON supplier_products
 FOR EACH ROW
 EXECUTE FUNCTION delete_orphan_supplier();
 */
+
+-- Events written in the same transaction as the change they announce. The
+-- outbox relay publishes due rows in event_id order and deletes them once the
+-- broker has them; available_at is pushed ahead while a replica holds a claim
+-- and after a failed publish.
+CREATE TABLE IF NOT EXISTS event_outbox (
+    event_id BIGSERIAL PRIMARY KEY,
+    event TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    available_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS event_outbox_available_at_idx ON event_outbox (available_at);
@@ -1,32 +1,58 @@
-from typing import Optional
-import psycopg2
-from contextlib import contextmanager
+from typing import Optional, Union
+from contextlib import asynccontextmanager, contextmanager
+import os
 import uuid
 from fastapi import FastAPI, Request, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-import requests
-import json
-
-# URLs ========================================================================
-product_url = "http://kong:8000/products/"
+from common.admission import ADMISSION_CONFIG, ADMISSION_RETRY_AFTER, AdmissionControl, admission_gates
+from common.cache import CACHE_CONFIG, TTLCache, cache_key
+from common.db import POOL_CONFIG, ConnectionPool, create_batch, estimate_rows, read_page
+from common.events import MQ_CONFIG, EventBus
+from common.outbox import OUTBOX_CONFIG, OutboxRelay, enqueue
+from common.paging import BATCH_MAX_ROWS, PAGE_SIZE, etag_matches, next_link, parse_batch
 
 # database connection =========================================================
 DB_CONFIG = {
-	"dbname": "supplier_db",
-	"user": "postgres",
-	"password": "solid",
-	"host": "supplier_db",  # add when docker set up for containers
-	"port": 5432
+	"dbname": os.environ.get("DB_NAME", "supplier_db"),
+	"user": os.environ.get("DB_USER", "postgres"),
+	"password": os.environ.get("DB_PASSWORD", "solid"),
+	"host": os.environ.get("DB_HOST", "supplier_db"),  # add when docker set up for containers
+	"port": int(os.environ.get("DB_PORT", 5432))
 }
 
+# created in the app lifespan, one per worker process
+pool: Optional[ConnectionPool] = None
+
 @contextmanager
 def get_conn():
-	conn = psycopg2.connect(**DB_CONFIG)
+	conn = pool.getconn()
 	try:
 		yield conn
 	finally:
-		conn.close()
+		pool.putconn(conn)
+
+class NotFoundError(Exception):
+	pass
+
+# events ======================================================================
+# created in the app lifespan, one per worker process; events reach the broker
+# through the outbox relay, cache invalidations straight through events
+events: Optional[EventBus] = None
+outbox: Optional[OutboxRelay] = None
+
+# cache =======================================================================
+# one per worker process; replicas keep each other's copy fresh through the cache exchange
+cache = TTLCache(**CACHE_CONFIG)
+
+# Drop a row from this replica's cache and tell the other replicas to do the same.
+# Call after commit; if the broker is unreachable the others catch up within CACHE_TTL.
+def invalidate(entity_id: str):
+	key = cache_key(entity_id)
+	cache.invalidate(key)
+	cache.broadcast(key, events.broadcast)
 
 # validation functions ========================================================
 def gen_uuid():
@@ -47,6 +73,9 @@ def validate_nonnegative(field_name: str, value):
 	if not isinstance(value, int) or value < 0:
 		raise Exception(f"{field_name} must be a non-negative integer.")
 
+# batch loading ===============================================================
+BULK_DELETE_MAX = int(os.environ.get("BULK_DELETE_MAX", 1000))  # supplier ids accepted by one POST /bulk-delete
+
 # database functions ==========================================================
 def suppliers_read() -> Optional[list]:
 	with get_conn() as conn:
@@ -54,6 +83,9 @@ def suppliers_read() -> Optional[list]:
 			c.execute("""SELECT (supplier_id) FROM suppliers""")
 			return c.fetchall()
 
+def suppliers_page(limit: int, after: Optional[str] = None, sort: Optional[str] = None, order: str = "asc"):
+	return read_page(pool, "suppliers", "supplier_id", ("supplier_id", "name"), limit, after, sort, order)
+
 def supplier_create(name: str, contact_email: str, supplier_id: Optional[str] = None) -> str:
 	try:
 		validate_nonempty("name", name)
@@ -64,35 +96,68 @@ def supplier_create(name: str, contact_email: str, supplier_id: Optional[str] =
 				c.execute("""
 					INSERT INTO suppliers (supplier_id, name, contact_email)
 					VALUES (%s, %s, %s)
+					RETURNING supplier_id
 				""", (sid, name, contact_email))
+				sid = c.fetchone()[0]
 				conn.commit()
 		return sid
 	except Exception as e:
 		raise Exception(f"Failed to create Supplier: {str(e)}")
 
-def supplier_read(supplier_id: str) -> Optional[tuple]:
+# Same checks as supplier_create, for one row of a batch
+def supplier_row_values(row: dict) -> tuple:
+	sup = Supplier.model_validate(row)
+	validate_nonempty("name", sup.name)
+	validate_nonempty("contact_email", sup.contact)
+	return (sup.name, sup.contact)
+
+def suppliers_create_batch(rows: list) -> dict:
+	return create_batch(pool, rows, "suppliers", ("supplier_id", "name", "contact_email"), supplier_row_values)
+
+def supplier_read(supplier_id: str) -> dict:
+	return supplier_read_tagged(supplier_id)[0]
+
+# Columns a supplier row is returned with, in order
+SUPPLIER_COLUMNS = "supplier_id, name, contact_email"
+
+# A row read with SUPPLIER_COLUMNS as the object SupplierRow describes, ready for orjson
+def supplier_row(row) -> dict:
+	return {"supplier_id": str(row[0]), "name": row[1], "contact_email": row[2]}
+
+# The row and its ETag, an md5 of the row's text form computed by Postgres,
+# so any change to any column gives a new tag. Served from the cache when fresh.
+def supplier_read_tagged(supplier_id: str) -> tuple:
+	return cache.get_or_load(cache_key(supplier_id), lambda: supplier_load(supplier_id))
+
+def supplier_load(supplier_id: str) -> tuple:
 	with get_conn() as conn:
 		with conn.cursor() as c:
-			c.execute("SELECT * FROM suppliers WHERE supplier_id = %s", (supplier_id,))
-			row = c.fetchall()[0]
-			ret = []
-			for data in row:
-				ret.append(str(data))
-			return ret
-
-def supplier_update(supplier_id: str, name: str, contact_email: str) -> Optional[tuple]:
+			c.execute(f"""SELECT {SUPPLIER_COLUMNS}, md5(ROW({SUPPLIER_COLUMNS})::text) FROM suppliers WHERE supplier_id = %s""", (supplier_id,))
+			row = c.fetchone()
+			if row is None:
+				raise NotFoundError(f"Supplier {supplier_id} not found.")
+			return supplier_row(row), f'"{row[-1]}"'
+
+def supplier_update(supplier_id: str, name: str, contact_email: str) -> dict:
 	try:
 		validate_nonempty("name", name)
 		validate_nonempty("contact_email", contact_email)
 		with get_conn() as conn:
 			with conn.cursor() as c:
-				c.execute("""
+				c.execute(f"""
 					UPDATE suppliers
 					SET name = %s, contact_email = %s
 					WHERE supplier_id = %s
+					RETURNING {SUPPLIER_COLUMNS}
 				""", (name, contact_email, supplier_id))
+				row = c.fetchone()
+				if row is None:
+					raise NotFoundError(f"Supplier {supplier_id} not found.")
 				conn.commit()
-		return supplier_read(supplier_id)
+		invalidate(supplier_id)
+		return supplier_row(row)
+	except NotFoundError:
+		raise
 	except Exception as e:
 		raise Exception(f"Failed to update Supplier: {str(e)}")
 
@@ -100,10 +165,33 @@ def supplier_delete(supplier_id: str) -> None:
 	with get_conn() as conn:
 		with conn.cursor() as c:
 			c.execute("DELETE FROM suppliers WHERE supplier_id = %s", (supplier_id,))
+			deleted = c.rowcount
+			# the product service drops its links to the supplier when it sees the event
+			if deleted:
+				enqueue(c, "supplier.deleted", [{"supplier_id": supplier_id}])
+			conn.commit()
+	if deleted:
+		invalidate(supplier_id)
+		outbox.wake()
+
+# Deletes many suppliers with one statement, for the product service's orphan reaper.
+# Returns the ids that existed; raises ValueError on an id that is not a UUID.
+def suppliers_delete(supplier_ids: list) -> list:
+	ids = [str(uuid.UUID(sid)) for sid in supplier_ids]
+	if not ids:
+		return []
+	with get_conn() as conn:
+		with conn.cursor() as c:
+			c.execute("DELETE FROM suppliers WHERE supplier_id = ANY(%s::uuid[]) RETURNING supplier_id", (ids,))
+			deleted = [str(row[0]) for row in c.fetchall()]
+			# a link made since the reaper checked is dropped when the product service sees the event
+			enqueue(c, "supplier.deleted", [{"supplier_id": supplier_id} for supplier_id in deleted])
 			conn.commit()
-	r = requests.delete(product_url + "suppliers/" + supplier_id)
-	if r.status_code > 299:
-		print(r.json().get("detail"))
+	for supplier_id in deleted:
+		invalidate(supplier_id)
+	if deleted:
+		outbox.wake()
+	return deleted
 
 # association =================================================================
 # def supplierProduct_create(supplier_id: str, product_id: str) -> None:
@@ -144,18 +232,66 @@ def supplier_delete(supplier_id: str) -> None:
 #				""", (supplier_id, product_id))
 #			conn.commit()
 
+# admission control ===========================================================
+# one gate per kind of request, per worker process
+admission = admission_gates(ADMISSION_CONFIG)
+
 # http server config ==========================================================
 class Supplier(BaseModel):
 	name: str
 	contact: str
 
-app = FastAPI()
+class SupplierIds(BaseModel):
+	s_ids: list[str]
+
+# response models: they document the replies, which read paths build as plain
+# dicts (supplier_row) and hand straight to orjson without another validation pass
+class SupplierRow(BaseModel):
+	supplier_id: str
+	name: str
+	contact_email: str
+
+class SupplierReply(BaseModel):
+	supplier: SupplierRow
+
+class SupplierIdList(BaseModel):
+	suppliers: list[list[str]]
+	next: Optional[str] = None
+
+# GET / answers one supplier with s_id, otherwise their ids; 304 when the If-None-Match tag is still current
+READ_RESPONSES = {200: {"model": Union[SupplierReply, SupplierIdList]}, 304: {"description": "Not Modified"}}
+
+# Open the pool and the event bus and start the outbox relay when a worker starts; close them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	global pool, events, outbox
+	pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+	events = EventBus("supplier", **MQ_CONFIG)
+	outbox = OutboxRelay(pool, events, **OUTBOX_CONFIG)
+	outbox.start()
+	events.subscribe(cache.handle_broadcast)
+	try:
+		pool.prewarm()
+	except Exception as e:
+		print(f"Database not reachable yet, connections will be opened on demand: {e}")
+	try:
+		yield
+	finally:
+		outbox.close()
+		events.close()
+		pool.close()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# added first, so it runs inside CORS and shed replies still carry the CORS headers
+app.add_middleware(AdmissionControl, gates=admission, retry_after=ADMISSION_RETRY_AFTER)
 
 app.add_middleware(
 		CORSMiddleware,
 		allow_origins=["*"],
 		allow_methods=["*"],
-		allow_headers=["*"]
+		allow_headers=["*"],
+		expose_headers=["X-Total-Count-Estimate", "ETag", "Retry-After"]
 )
 
 @app.options("/")
@@ -167,21 +303,44 @@ def preflight_handler():
 	}
 	return Response(status_code=200, headers=headers)
 
-@app.get("/")
-def read_suppliers(s_id: Optional[str] = None):
+# pool occupancy, cache hit rate/staleness, outbox relay and admitted/shed requests for load balancers and dashboards
+@app.get("/health")
+def health():
+	return {"status": "ok", "pool": pool.stats(), "cache": cache.stats(), "outbox": outbox.stats(), "admission": {kind: gate.stats() for kind, gate in admission.items()}}
+
+@app.get("/", responses=READ_RESPONSES)
+def read_suppliers(request: Request, response: Response, s_id: Optional[str] = None, limit: Optional[int] = None,
+		after: Optional[str] = None, sort: Optional[str] = None, order: str = "asc", estimate: bool = False):
 	if (s_id is None or s_id == ""):
-		data = suppliers_read()
-		return {"suppliers": data}
-	data = supplier_read(s_id)
-	return {"supplier": data}
+		if estimate:
+			response.headers["X-Total-Count-Estimate"] = str(estimate_rows(pool, "suppliers"))
+		# no paging parameters: every id, as before
+		if limit is None and after is None and sort is None:
+			data = suppliers_read()
+			return {"suppliers": data}
+		try:
+			data, cursor = suppliers_page(limit or PAGE_SIZE, after, sort, order)
+		except ValueError as ex:
+			raise HTTPException(status_code=400, detail=str(ex))
+		return {"suppliers": data, "next": next_link(request, cursor)}
+	try:
+		data, etag = supplier_read_tagged(s_id)
+	except NotFoundError as ex:
+		raise HTTPException(status_code=404, detail=str(ex))
+	# the client's copy is current: answer without a body
+	if etag_matches(request.headers.get("if-none-match"), etag):
+		return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+	return ORJSONResponse({"supplier": data}, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
-@app.put("/{s_id}")
+@app.put("/{s_id}", response_model=SupplierReply)
 def update_supplier(s_id: str, sup: Supplier):
 	try:
 		data = supplier_update(s_id, sup.name, sup.contact)
+	except NotFoundError as ex:
+		raise HTTPException(status_code=404, detail=str(ex))
 	except Exception as ex:
 		raise HTTPException(status_code=400, detail=str(ex))
-	return {"supplier": data}
+	return ORJSONResponse({"supplier": data})
 
 @app.post("/")
 def create_supplier(sup: Supplier):
@@ -191,6 +350,30 @@ def create_supplier(sup: Supplier):
 		raise HTTPException(status_code=400, detail=str(ex))
 	return {"s_id": data}
 
+# bulk import: a JSON array or NDJSON of the objects POST / takes
+@app.post("/batch")
+async def create_suppliers_batch(request: Request):
+	try:
+		rows = parse_batch(await request.body())
+	except ValueError as ex:
+		raise HTTPException(status_code=400, detail=f"Invalid batch: {ex}")
+	if not isinstance(rows, list):
+		raise HTTPException(status_code=400, detail="Invalid batch: expected a JSON array or NDJSON.")
+	if len(rows) > BATCH_MAX_ROWS:
+		raise HTTPException(status_code=413, detail=f"Batch of {len(rows)} rows exceeds the {BATCH_MAX_ROWS} row limit.")
+	return await run_in_threadpool(suppliers_create_batch, rows)
+
+# delete many suppliers at once; used by the product service's orphan reaper
+@app.post("/bulk-delete")
+def delete_suppliers(body: SupplierIds):
+	if len(body.s_ids) > BULK_DELETE_MAX:
+		raise HTTPException(status_code=413, detail=f"{len(body.s_ids)} suppliers exceed the {BULK_DELETE_MAX} supplier limit.")
+	try:
+		data = suppliers_delete(body.s_ids)
+	except ValueError as ex:
+		raise HTTPException(status_code=400, detail=f"Invalid supplier id: {ex}")
+	return {"deleted": data}
+
 @app.delete("/{s_id}")
 def delete_supplier(s_id: str):
 	supplier_delete(s_id)
@@ -4,7 +4,23 @@
 from typing import Optional
 from xmlrpc.server import SimpleXMLRPCServer
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from collections import OrderedDict
 from contextlib import contextmanager
+from decimal import Decimal
+import datetime
+import functools
+import json
+import os
+import queue
+import selectors
+import signal
+import socket
+import socketserver
+import struct
+import threading
+import time
 import uuid
 
 DB_CONFIG = {
@@ -15,14 +31,390 @@ DB_CONFIG = {
     "port": 5432 # Postgresql port (otherwise try 5432)
 }
 
-# Using contextmanager to handle database connection
+# Connection pool settings, overridable from the environment
+POOL_CONFIG = {
+    "minconn": int(os.environ.get("DB_POOL_MIN", 2)),        # connections kept open while idle
+    "maxconn": int(os.environ.get("DB_POOL_MAX", 20)),       # hard cap on open connections
+    "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)), # seconds to wait for a free connection
+    "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", 300)),  # idle seconds before a spare connection is closed
+    "check_after": float(os.environ.get("DB_POOL_CHECK_AFTER", 5)),  # idle seconds before a borrow pings the server
+}
+
+# Read cache settings, overridable from the environment
+CACHE_CONFIG = {
+    "maxsize": int(os.environ.get("DB_CACHE_SIZE", 10000)),  # entries kept before the least recently used is evicted
+    "ttl": float(os.environ.get("DB_CACHE_TTL", 60)),        # seconds an entry is served before it is reloaded
+}
+
+# RPC server settings, overridable from the environment
+SERVER_CONFIG = {
+    "host": os.environ.get("RPC_HOST", "0.0.0.0"),
+    "port": int(os.environ.get("RPC_PORT", 8000)),
+    "json_port": int(os.environ.get("RPC_JSON_PORT", 8001)),  # compact JSON endpoint, 0 turns it off
+    "mode": os.environ.get("RPC_MODE", "thread"),       # "single", "thread" or "fork"
+    "workers": int(os.environ.get("RPC_WORKERS", 8)),   # worker threads, or worker processes in fork mode
+    "json_workers": int(os.environ.get("RPC_JSON_WORKERS", 8)),  # threads per process running JSON calls; idle connections hold none
+    "backlog": int(os.environ.get("RPC_BACKLOG", 64)),  # pending connections before clients are refused
+}
+
+# Per-method call statistics, overridable from the environment
+STATS_CONFIG = {
+    "path": os.environ.get("RPC_STATS_FILE", ""),  # JSON file the stats are dumped to, empty turns it off; {pid} is expanded
+    "interval": float(os.environ.get("RPC_STATS_INTERVAL", 60)),  # seconds between dumps
+}
+
+
+# Connection that remembers which registered statements it has already PREPAREd
+class PreparingConnection(psycopg2.extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+# Hot statements, PREPAREd once per connection and then run with EXECUTE.
+# name -> (parameter types, SQL with $n placeholders)
+STATEMENTS = {
+    "product_read": ("uuid", "SELECT * FROM products WHERE product_id = $1"),
+    "supplier_read": ("uuid", "SELECT * FROM suppliers WHERE supplier_id = $1"),
+    "category_read": ("uuid", "SELECT * FROM categories WHERE category_id = $1"),
+    "image_read": ("uuid", "SELECT * FROM images WHERE image_id = $1"),
+    "categoryProducts_read": ("uuid", """
+        SELECT p.product_id, p.name, p.price
+        FROM category_products cp
+        JOIN products p ON cp.product_id = p.product_id
+        WHERE cp.category_id = $1
+    """),
+    "supplierProducts_read": ("uuid", """
+        SELECT p.product_id, p.name, p.price
+        FROM supplier_products sp
+        JOIN products p ON sp.product_id = p.product_id
+        WHERE sp.supplier_id = $1
+    """),
+}
+
+
+# Run a registered statement, preparing it first if this connection has not seen it.
+# Prepared statements live for the whole session, so they survive rollbacks and
+# are reused by every later borrower of the pooled connection.
+def execute_prepared(cur, name: str, params: tuple):
+    prepared = cur.connection.prepared
+    if name not in prepared:
+        types, sql = STATEMENTS[name]
+        cur.execute(f"PREPARE {name} ({types}) AS {sql}")
+        prepared.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    cur.execute(f"EXECUTE {name} ({placeholders})", params)
+
+
+# Bounded, thread-safe pool of psycopg2 connections.
+# Connections are health-checked when borrowed, rolled back when returned and
+# closed by a background reaper once they sit idle for longer than max_idle.
+class ConnectionPool:
+    def __init__(self, dsn: dict, minconn: int = 2, maxconn: int = 20, timeout: float = 10,
+                 max_idle: float = 300, check_after: float = 5):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool sizes must satisfy 0 <= minconn <= maxconn and maxconn >= 1.")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.pid = os.getpid()
+        self._idle = []          # stack of (conn, last_used) pairs, most recently used last
+        self._size = 0           # open connections, idle + borrowed
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._stats = {
+            "created": 0, "closed": 0, "borrowed": 0, "waits": 0,
+            "timeouts": 0, "failed_checks": 0, "reaped": 0,
+        }
+        self._reaper = threading.Thread(target=self._reap_loop, name="db-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PreparingConnection, **self.dsn)
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["closed"] += 1
+            self._cond.notify()
+
+    def _healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.check_after:
+            return True
+        try:
+            with conn.cursor() as c:
+                c.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # Open connections until minconn are available
+    def prewarm(self):
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            self.putconn(conn)
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise Exception("Connection pool is closed.")
+                waited = False
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise Exception(f"Timed out after {self.timeout}s waiting for a database connection.")
+                    if not waited:
+                        self._stats["waits"] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    conn, last_used = None, None
+                    self._size += 1
+                self._stats["borrowed"] += 1
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            if self._healthy(conn, last_used):
+                return conn
+            with self._cond:
+                self._stats["failed_checks"] += 1
+            self._discard(conn)
+
+    def putconn(self, conn):
+        if conn.closed:
+            self._discard(conn)
+            return
+        try:
+            # reads leave a transaction open and failed writes leave an aborted one
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed:
+                closing = True
+            else:
+                closing = False
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+        if closing:
+            self._discard(conn)
+
+    # Close idle connections above minconn that have not been used for max_idle seconds
+    def reap(self) -> int:
+        cutoff = time.monotonic() - self.max_idle
+        expired = []
+        with self._cond:
+            keep = []
+            spare = self._size - self.minconn
+            # oldest connections sit at the bottom of the stack
+            for conn, last_used in self._idle:
+                if spare > 0 and last_used < cutoff:
+                    expired.append(conn)
+                    spare -= 1
+                else:
+                    keep.append((conn, last_used))
+            self._idle = keep
+            self._stats["reaped"] += len(expired)
+        for conn in expired:
+            self._discard(conn)
+        return len(expired)
+
+    def _reap_loop(self):
+        interval = max(1.0, min(self.max_idle / 2, 30.0))
+        while not self._stop.wait(interval):
+            self.reap()
+
+    def stats(self) -> dict:
+        with self._cond:
+            ret = dict(self._stats)
+            ret.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+            })
+            return ret
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._stop.set()
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Lazily create the process-wide pool; a forked child builds its own
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+    return _pool
+
+
+# Raised when a read or write targets an id that does not exist
+class NotFoundError(Exception):
+    pass
+
+
+# Using contextmanager to borrow a pooled database connection
 @contextmanager
 def get_conn():
-    conn = psycopg2.connect(**DB_CONFIG)
+    pool = get_pool()
+    start = time.perf_counter()
+    conn = pool.getconn()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.putconn(conn)
+        rpc_stats.add_db_time(time.perf_counter() - start)
+
+# Cache keys in one spelling, so equivalent reads share an entry and an
+# invalidation finds it however the caller wrote the id: uuids as canonical
+# lowercase text, other strings stripped, lists and tuples element by element,
+# sets and dicts in sorted order.
+def cache_key(key):
+    if isinstance(key, uuid.UUID):
+        return str(key)
+    if isinstance(key, str):
+        try:
+            return str(uuid.UUID(key))
+        except ValueError:
+            return key.strip()
+    if isinstance(key, (list, tuple)):
+        return tuple(cache_key(k) for k in key)
+    if isinstance(key, (set, frozenset)):
+        return tuple(sorted((cache_key(k) for k in key), key=repr))
+    if isinstance(key, dict):
+        return tuple(sorted(((cache_key(k), cache_key(v)) for k, v in key.items()), key=repr))
+    return key
+
+# In-process read-through cache with LRU eviction and a TTL per entry.
+# Keys are (namespace, id) pairs so writes can drop one row or a whole namespace;
+# both lookups and invalidations go through cache_key.
+# Every invalidation bumps a generation counter; a load that raced with one is
+# returned to its caller but not stored, so a stale row cannot be cached.
+class TTLCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._gen = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get_or_load(self, key: tuple, loader):
+        key = cache_key(key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[1]
+                del self._data[key]
+                self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            gen = self._gen
+        value = loader()
+        if self.maxsize > 0:
+            with self._lock:
+                if gen == self._gen:
+                    self._data[key] = (time.monotonic() + self.ttl, value)
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+                        self._stats["evictions"] += 1
+        return value
+
+    def invalidate(self, namespace: str, key=None):
+        with self._lock:
+            self._gen += 1
+            if key is not None:
+                if self._data.pop(cache_key((namespace, key)), None) is not None:
+                    self._stats["invalidations"] += 1
+                return
+            stale = [k for k in self._data if k[0] == namespace]
+            for k in stale:
+                del self._data[k]
+            self._stats["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._gen += 1
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            ret = dict(self._stats)
+            lookups = ret["hits"] + ret["misses"]
+            ret.update({
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hit_rate": ret["hits"] / lookups if lookups else 0.0,
+            })
+            return ret
+
+
+cache = TTLCache(**CACHE_CONFIG)
+
+
+# Serve a single-key read through the cache under the given namespace
+def read_through(namespace: str):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(key):
+            return cache.get_or_load((namespace, key), lambda: func(key))
+        return wrapper
+    return decorator
+
 
 # ========================= HELPER AND VALIDATION METHODS =========================
 
@@ -51,6 +443,16 @@ def validate_nonnegative(field_name: str, value):
     
 
 
+# Connection pool statistics
+def pool_stats() -> dict:
+    return get_pool().stats()
+
+
+# Read cache statistics
+def cache_stats() -> dict:
+    return cache.stats()
+
+
 # =============================================== LIST FUNCTIONS ===============================================
 
 def products_read() -> Optional[list]:
@@ -81,6 +483,178 @@ def images_read() -> Optional[list]:
 			return c.fetchall()
 
 
+# ========================== PAGINATED LIST FUNCTIONS ==========================
+# Keyset pagination: each page starts after the last id of the previous one, so
+# every page is an index range scan no matter how deep the caller has paged.
+# Rows are streamed from a server-side (named) cursor in small batches, which
+# keeps server memory flat regardless of table size.
+
+PAGE_SIZE = 100        # default rows per page
+MAX_PAGE_SIZE = 1000   # largest page a caller may ask for
+CURSOR_ITERSIZE = 200  # rows fetched from Postgres per round trip
+
+
+def _page(table: str, key: str, after_id: Optional[str] = None, limit: int = PAGE_SIZE, convert=str) -> dict:
+    limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+    with get_conn() as conn:
+        with conn.cursor(name=f"{table}_page") as c:
+            c.itersize = CURSOR_ITERSIZE
+            if after_id:
+                c.execute(f"SELECT * FROM {table} WHERE {key} > %s ORDER BY {key} LIMIT %s", (after_id, limit))
+            else:
+                c.execute(f"SELECT * FROM {table} ORDER BY {key} LIMIT %s", (limit,))
+            rows = [[convert(data) for data in row] for row in c]
+    # a short page means there is nothing after it
+    next_id = rows[-1][0] if len(rows) == limit else None
+    return {"rows": rows, "next": next_id}
+
+
+def products_page(after_id: Optional[str] = None, limit: int = PAGE_SIZE) -> dict:
+    return _page("products", "product_id", after_id, limit)
+
+
+def suppliers_page(after_id: Optional[str] = None, limit: int = PAGE_SIZE) -> dict:
+    return _page("suppliers", "supplier_id", after_id, limit)
+
+
+def categories_page(after_id: Optional[str] = None, limit: int = PAGE_SIZE) -> dict:
+    return _page("categories", "category_id", after_id, limit)
+
+
+def images_page(after_id: Optional[str] = None, limit: int = PAGE_SIZE) -> dict:
+    return _page("images", "image_id", after_id, limit)
+
+
+# ========================== HYDRATED LIST FUNCTIONS ==========================
+# One query returns whole rows as structs, so callers no longer need an extra
+# *_read call per id. Columns can be projected and related rows embedded; the
+# embeds are correlated subqueries aggregated to JSON inside the same query.
+# Numbers keep their type except NUMERIC, which stays a string to keep its precision.
+
+LIST_SPECS = {
+    "products": {
+        "key": "product_id",
+        "columns": ["product_id", "name", "description", "quantity", "price"],
+        "embeds": {
+            "suppliers": """
+                SELECT json_agg(json_build_object('supplier_id', s.supplier_id, 'name', s.name,
+                                                  'contact_email', s.contact_email))
+                FROM supplier_products sp JOIN suppliers s ON sp.supplier_id = s.supplier_id
+                WHERE sp.product_id = t.product_id""",
+            "categories": """
+                SELECT json_agg(json_build_object('category_id', c.category_id, 'name', c.name,
+                                                  'description', c.description))
+                FROM category_products cp JOIN categories c ON cp.category_id = c.category_id
+                WHERE cp.product_id = t.product_id""",
+            "images": """
+                SELECT json_agg(json_build_object('image_id', i.image_id, 'url', i.url))
+                FROM images i
+                WHERE i.product_id = t.product_id""",
+        },
+    },
+    "suppliers": {
+        "key": "supplier_id",
+        "columns": ["supplier_id", "name", "contact_email"],
+        "embeds": {
+            "products": """
+                SELECT json_agg(json_build_object('product_id', p.product_id, 'name', p.name,
+                                                  'price', p.price::text))
+                FROM supplier_products sp JOIN products p ON sp.product_id = p.product_id
+                WHERE sp.supplier_id = t.supplier_id""",
+        },
+    },
+    "categories": {
+        "key": "category_id",
+        "columns": ["category_id", "name", "description"],
+        "embeds": {
+            "products": """
+                SELECT json_agg(json_build_object('product_id', p.product_id, 'name', p.name,
+                                                  'price', p.price::text))
+                FROM category_products cp JOIN products p ON cp.product_id = p.product_id
+                WHERE cp.category_id = t.category_id""",
+        },
+    },
+    "images": {
+        "key": "image_id",
+        "columns": ["image_id", "product_id", "url"],
+        "embeds": {
+            "product": """
+                SELECT json_build_object('product_id', p.product_id, 'name', p.name,
+                                         'price', p.price::text)
+                FROM products p
+                WHERE p.product_id = t.product_id""",
+        },
+    },
+}
+
+
+def _typed(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _native(value):
+    return value
+
+
+def _list(table: str, columns: Optional[list] = None, embed: Optional[list] = None,
+          after_id: Optional[str] = None, limit: int = PAGE_SIZE, convert=_typed) -> dict:
+    spec = LIST_SPECS[table]
+    key = spec["key"]
+    columns = list(columns or spec["columns"])
+    embed = list(embed or [])
+    for col in columns:
+        if col not in spec["columns"]:
+            raise Exception(f"Unknown {table} column: {col}")
+    for name in embed:
+        if name not in spec["embeds"]:
+            raise Exception(f"Cannot embed {name} in {table}.")
+    # one spelling per projection: spec order without duplicates, key first since
+    # it drives the cursor, so equivalent calls run the same statement
+    columns = [key] + [col for col in spec["columns"] if col in columns and col != key]
+    embed = [name for name in spec["embeds"] if name in embed]
+    limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+
+    select = [f"t.{col}" for col in columns]
+    select += [f"COALESCE(({spec['embeds'][name]}), '[]'::json) AS {name}" for name in embed]
+    where = f"WHERE {key} > %s" if after_id else ""
+    params = (after_id, limit) if after_id else (limit,)
+    sql = f"""
+        SELECT {', '.join(select)}
+        FROM (SELECT * FROM {table} {where} ORDER BY {key} LIMIT %s) t
+        ORDER BY t.{key}
+    """
+    names = columns + embed
+    with get_conn() as conn:
+        with conn.cursor(name=f"{table}_list") as c:
+            c.itersize = CURSOR_ITERSIZE
+            c.execute(sql, params)
+            rows = [{name: convert(data) for name, data in zip(names, row)} for row in c]
+    next_id = rows[-1][key] if len(rows) == limit else None
+    return {"rows": rows, "next": next_id}
+
+
+def products_list(columns: Optional[list] = None, embed: Optional[list] = None,
+                  after_id: Optional[str] = None, limit: int = PAGE_SIZE) -> dict:
+    return _list("products", columns, embed, after_id, limit)
+
+
+def suppliers_list(columns: Optional[list] = None, embed: Optional[list] = None,
+                   after_id: Optional[str] = None, limit: int = PAGE_SIZE) -> dict:
+    return _list("suppliers", columns, embed, after_id, limit)
+
+
+def categories_list(columns: Optional[list] = None, embed: Optional[list] = None,
+                    after_id: Optional[str] = None, limit: int = PAGE_SIZE) -> dict:
+    return _list("categories", columns, embed, after_id, limit)
+
+
+def images_list(columns: Optional[list] = None, embed: Optional[list] = None,
+                after_id: Optional[str] = None, limit: int = PAGE_SIZE) -> dict:
+    return _list("images", columns, embed, after_id, limit)
+
+
 # ========================== CRUD FUNCTIONS ==================================
 
 #  PRODUCT CRUD
@@ -99,7 +673,9 @@ def product_create(name: str, description: Optional[str], quantity: int, price:
                 c.execute("""
                     INSERT INTO products (product_id, name, description, quantity, price)
                     VALUES (%s, %s, %s, %s, %s)
+                    RETURNING product_id
                 """, (pid, name, description, quantity, price))
+                pid = c.fetchone()[0]
                 conn.commit()
         return pid
 
@@ -107,15 +683,20 @@ def product_create(name: str, description: Optional[str], quantity: int, price:
         raise Exception(f"Failed to create product: {str(e)}")
 
 
-def product_read(product_id: str) -> Optional[tuple]:
+# Product row with its native column types
+@read_through("product")
+def product_row(product_id: str) -> list:
 	with get_conn() as conn:
 		with conn.cursor() as c:
-			c.execute("""SELECT * FROM products WHERE product_id = %s""", (product_id,))
-			row = c.fetchall()[0]
-			ret = []
-			for data in row:
-				ret.append(str(data))
-			return ret
+			execute_prepared(c, "product_read", (product_id,))
+			row = c.fetchone()
+			if row is None:
+				raise NotFoundError(f"Product {product_id} not found.")
+			return list(row)
+
+
+def product_read(product_id: str) -> Optional[tuple]:
+	return [str(data) for data in product_row(product_id)]
 
 
 def product_update(product_id: str, name: str, description: str, quantity: int, price: str) -> Optional[tuple]:
@@ -131,9 +712,17 @@ def product_update(product_id: str, name: str, description: str, quantity: int,
                     UPDATE products
                     SET name = %s, description = %s, quantity = %s, price = %s
                     WHERE product_id = %s
+                    RETURNING *
                 """, (name, description, quantity, price, product_id))
+                row = c.fetchone()
+                if row is None:
+                    raise NotFoundError(f"Product {product_id} not found.")
                 conn.commit()
-        return product_read(product_id)
+        # the link reads embed product names and prices
+        cache.invalidate("product", product_id)
+        cache.invalidate("categoryProducts")
+        cache.invalidate("supplierProducts")
+        return [str(data) for data in row]
     except Exception as e:
         raise Exception(f"Failed to update product: {str(e)}")  
 
@@ -143,6 +732,11 @@ def product_delete(product_id: str) -> None:
         with conn.cursor() as c:
             c.execute("DELETE FROM products WHERE product_id = %s", (product_id,))
             conn.commit()
+    # cascades remove the product's images and links, and the orphan triggers
+    # may then remove suppliers and categories that lost their last product
+    cache.invalidate("product", product_id)
+    for namespace in ("image", "categoryProducts", "supplierProducts", "category", "supplier"):
+        cache.invalidate(namespace)
 
 
 #  SUPPLIER CRUD
@@ -156,22 +750,29 @@ def supplier_create(name: str, contact_email: str) -> str:
                 c.execute("""
                     INSERT INTO suppliers (supplier_id, name, contact_email)
                     VALUES (%s, %s, %s)
+                    RETURNING supplier_id
                 """, (sid, name, contact_email))
+                sid = c.fetchone()[0]
                 conn.commit()
         return sid
     except Exception as e:
         raise Exception(f"Failed to create Supplier: {str(e)}")
 
 
-def supplier_read(supplier_id: str) -> Optional[tuple]:
+# Supplier row with its native column types
+@read_through("supplier")
+def supplier_row(supplier_id: str) -> list:
     with get_conn() as conn:
         with conn.cursor() as c:
-            c.execute("SELECT * FROM suppliers WHERE supplier_id = %s", (supplier_id,))
-            row = c.fetchall()[0]
-            ret = []
-            for data in row:
-                ret.append(str(data))
-            return ret
+            execute_prepared(c, "supplier_read", (supplier_id,))
+            row = c.fetchone()
+            if row is None:
+                raise NotFoundError(f"Supplier {supplier_id} not found.")
+            return list(row)
+
+
+def supplier_read(supplier_id: str) -> Optional[tuple]:
+    return [str(data) for data in supplier_row(supplier_id)]
 
 
 def supplier_update(supplier_id: str, name: str, contact_email: str) -> Optional[tuple]:
@@ -184,9 +785,14 @@ def supplier_update(supplier_id: str, name: str, contact_email: str) -> Optional
                     UPDATE suppliers
                     SET name = %s, contact_email = %s
                     WHERE supplier_id = %s
+                    RETURNING *
                 """, (name, contact_email, supplier_id))
+                row = c.fetchone()
+                if row is None:
+                    raise NotFoundError(f"Supplier {supplier_id} not found.")
                 conn.commit()
-        return supplier_read(supplier_id)
+        cache.invalidate("supplier", supplier_id)
+        return [str(data) for data in row]
     except Exception as e:
         raise Exception(f"Failed to update Supplier: {str(e)}")
 
@@ -196,6 +802,8 @@ def supplier_delete(supplier_id: str) -> None:
         with conn.cursor() as c:
             c.execute("DELETE FROM suppliers WHERE supplier_id = %s", (supplier_id,))
             conn.commit()
+    cache.invalidate("supplier", supplier_id)
+    cache.invalidate("supplierProducts", supplier_id)
 
 
 #  CATEGORY CRUD
@@ -210,22 +818,29 @@ def category_create(name: str, description: Optional[str]) -> str:
                 c.execute("""
                     INSERT INTO categories (category_id, name, description)
                     VALUES (%s, %s, %s)
+                    RETURNING category_id
                 """, (cid, name, description))
+                cid = c.fetchone()[0]
                 conn.commit()
         return cid
     except Exception as e:
         raise Exception(f"Failed to create category: {str(e)}")
 
 
-def category_read(category_id: str) -> Optional[tuple]:
+# Category row with its native column types
+@read_through("category")
+def category_row(category_id: str) -> list:
     with get_conn() as conn:
         with conn.cursor() as c:
-            c.execute("SELECT * FROM categories WHERE category_id = %s", (category_id,))
-            row = c.fetchall()[0]
-            ret = []
-            for data in row:
-                ret.append(str(data))
-            return ret
+            execute_prepared(c, "category_read", (category_id,))
+            row = c.fetchone()
+            if row is None:
+                raise NotFoundError(f"Category {category_id} not found.")
+            return list(row)
+
+
+def category_read(category_id: str) -> Optional[tuple]:
+    return [str(data) for data in category_row(category_id)]
 
 
 def category_update(category_id: str, name: str, description: str) -> Optional[tuple]:
@@ -239,9 +854,14 @@ def category_update(category_id: str, name: str, description: str) -> Optional[t
                     UPDATE categories
                     SET name = %s, description = %s
                     WHERE category_id = %s
+                    RETURNING *
                 """, (name, description, category_id))
+                row = c.fetchone()
+                if row is None:
+                    raise NotFoundError(f"Category {category_id} not found.")
                 conn.commit()
-        return category_read(category_id)
+        cache.invalidate("category", category_id)
+        return [str(data) for data in row]
     except Exception as e:
         raise Exception(f"Failed to update category: {str(e)}")
 
@@ -251,6 +871,8 @@ def category_delete(category_id: str) -> None:
         with conn.cursor() as c:
             c.execute("DELETE FROM categories WHERE category_id = %s", (category_id,))
             conn.commit()
+    cache.invalidate("category", category_id)
+    cache.invalidate("categoryProducts", category_id)
 
 
 #  IMAGE CRUD
@@ -264,22 +886,29 @@ def image_create(product_id: str, url: str) -> str:
                 c.execute("""
                     INSERT INTO images (image_id, product_id, url)
                     VALUES (%s, %s, %s)
+                    RETURNING image_id
                 """, (iid, product_id, url))
+                iid = c.fetchone()[0]
                 conn.commit()
         return iid
     except Exception as e:
         raise Exception(f"Failed to create image: {str(e)}")
 
 
-def image_read(image_id: str) -> Optional[tuple]:
+# Image row with its native column types
+@read_through("image")
+def image_row(image_id: str) -> list:
     with get_conn() as conn:
         with conn.cursor() as c:
-            c.execute("SELECT * FROM images WHERE image_id = %s", (image_id,))
-            row = c.fetchall()[0]
-            ret = []
-            for data in row:
-                ret.append(str(data))
-            return ret
+            execute_prepared(c, "image_read", (image_id,))
+            row = c.fetchone()
+            if row is None:
+                raise NotFoundError(f"Image {image_id} not found.")
+            return list(row)
+
+
+def image_read(image_id: str) -> Optional[tuple]:
+    return [str(data) for data in image_row(image_id)]
 
 
 def image_update(image_id: str, product_id: str, url: str) -> Optional[tuple]:
@@ -292,9 +921,14 @@ def image_update(image_id: str, product_id: str, url: str) -> Optional[tuple]:
                     UPDATE images
                     SET product_id = %s, url = %s
                     WHERE image_id = %s
+                    RETURNING *
                 """, (product_id, url, image_id))
+                row = c.fetchone()
+                if row is None:
+                    raise NotFoundError(f"Image {image_id} not found.")
                 conn.commit()
-        return image_read(image_id)
+        cache.invalidate("image", image_id)
+        return [str(data) for data in row]
     except Exception as e:
         raise Exception(f"Failed to update image: {str(e)}")
 
@@ -304,6 +938,7 @@ def image_delete(image_id: str) -> None:
         with conn.cursor() as c:
             c.execute("DELETE FROM images WHERE image_id = %s", (image_id,))
             conn.commit()
+    cache.invalidate("image", image_id)
 
 
 #----------------------- RELATIONSHIP TABLES CRUD --------------------------
@@ -318,26 +953,23 @@ def categoryProducts_create(category_id, product_id) -> None:
                 ON CONFLICT DO NOTHING
             """, (category_id, product_id))
             conn.commit()
+    cache.invalidate("categoryProducts", category_id)
 
 
-def categoryProducts_read(category_id) -> Optional[list]:
+# (product_id, name, price) rows with the price as a Decimal
+@read_through("categoryProducts")
+def categoryProducts_rows(category_id) -> list:
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT p.product_id, p.name, p.price
-                FROM category_products cp
-                JOIN products p ON cp.product_id = p.product_id
-                WHERE cp.category_id = %s
-            """, (category_id,))
-            results = []
-            for row in cur.fetchall():
-                product_id, name, price_decimal = row
-
-                price_str = str(price_decimal) 
-                
-                results.append((product_id, name, price_str))
-                
-            return results
+            execute_prepared(cur, "categoryProducts_read", (category_id,))
+            return cur.fetchall()
+
+
+def categoryProducts_read(category_id) -> Optional[list]:
+    results = []
+    for product_id, name, price_decimal in categoryProducts_rows(category_id):
+        results.append((product_id, name, str(price_decimal)))
+    return results
 
 
 def categoryProducts_delete(category_id, product_id) -> None:
@@ -348,6 +980,9 @@ def categoryProducts_delete(category_id, product_id) -> None:
                 WHERE category_id = %s AND product_id = %s
             """, (category_id, product_id))
             conn.commit()
+    # the orphan trigger deletes the category when this was its last product
+    cache.invalidate("categoryProducts", category_id)
+    cache.invalidate("category", category_id)
 
 
 # SUPPLIER-PRODUCTS CRUD
@@ -360,26 +995,23 @@ def supplierProducts_create(supplier_id, product_id) -> None:
                 ON CONFLICT DO NOTHING
             """, (supplier_id, product_id))
             conn.commit()
+    cache.invalidate("supplierProducts", supplier_id)
 
 
-def supplierProducts_read(supplier_id) -> Optional[list]:
+# (product_id, name, price) rows with the price as a Decimal
+@read_through("supplierProducts")
+def supplierProducts_rows(supplier_id) -> list:
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT p.product_id, p.name, p.price
-                FROM supplier_products sp
-                JOIN products p ON sp.product_id = p.product_id
-                WHERE sp.supplier_id = %s
-            """, (supplier_id,))
-            results = []
-            for row in cur.fetchall():
-                product_id, name, price_decimal = row
-
-                price_str = str(price_decimal) 
-                
-                results.append((product_id, name, price_str))
-                
-            return results
+            execute_prepared(cur, "supplierProducts_read", (supplier_id,))
+            return cur.fetchall()
+
+
+def supplierProducts_read(supplier_id) -> Optional[list]:
+    results = []
+    for product_id, name, price_decimal in supplierProducts_rows(supplier_id):
+        results.append((product_id, name, str(price_decimal)))
+    return results
 
 
 def supplierProducts_delete(supplier_id, product_id) -> None:
@@ -390,10 +1022,599 @@ def supplierProducts_delete(supplier_id, product_id) -> None:
                 WHERE supplier_id = %s AND product_id = %s
             """, (supplier_id, product_id))
             conn.commit()
+    # the orphan trigger deletes the supplier when this was its last product
+    cache.invalidate("supplierProducts", supplier_id)
+    cache.invalidate("supplier", supplier_id)
 
 
-if __name__ == "__main__":
-    server = SimpleXMLRPCServer(("0.0.0.0", 8000), allow_none=True)
+# ============================== BULK FUNCTIONS ==============================
+# Each bulk call validates every row first, then inserts them all with
+# multi-row INSERTs in a single transaction: either every row lands or none do.
+
+BULK_PAGE_SIZE = 1000  # rows per INSERT statement
+
+
+def _bulk_insert(sql: str, rows: list):
+    with get_conn() as conn:
+        with conn.cursor() as c:
+            psycopg2.extras.execute_values(c, sql, rows, page_size=BULK_PAGE_SIZE)
+            conn.commit()
+
+
+def products_create_many(products: list) -> list:
+    try:
+        rows = []
+        for i, p in enumerate(products):
+            try:
+                validate_nonempty("name", p.get("name"))
+                if p.get("description") is not None:
+                    validate_nonempty("description", p["description"])
+                validate_nonnegative("quantity", p.get("quantity"))
+                validate_positive("price", float(p.get("price")))
+            except Exception as e:
+                raise Exception(f"row {i}: {str(e)}")
+            rows.append((gen_uuid(), p["name"], p.get("description"), p["quantity"], p["price"]))
+        _bulk_insert("""
+            INSERT INTO products (product_id, name, description, quantity, price)
+            VALUES %s
+        """, rows)
+        return [row[0] for row in rows]
+    except Exception as e:
+        raise Exception(f"Failed to create products: {str(e)}")
+
+
+def suppliers_create_many(suppliers: list) -> list:
+    try:
+        rows = []
+        for i, s in enumerate(suppliers):
+            try:
+                validate_nonempty("name", s.get("name"))
+                validate_nonempty("contact_email", s.get("contact_email"))
+            except Exception as e:
+                raise Exception(f"row {i}: {str(e)}")
+            rows.append((gen_uuid(), s["name"], s["contact_email"]))
+        _bulk_insert("""
+            INSERT INTO suppliers (supplier_id, name, contact_email)
+            VALUES %s
+        """, rows)
+        return [row[0] for row in rows]
+    except Exception as e:
+        raise Exception(f"Failed to create Suppliers: {str(e)}")
+
+
+def categories_create_many(categories: list) -> list:
+    try:
+        rows = []
+        for i, cat in enumerate(categories):
+            try:
+                validate_nonempty("name", cat.get("name"))
+                if cat.get("description") is not None:
+                    validate_nonempty("description", cat["description"])
+            except Exception as e:
+                raise Exception(f"row {i}: {str(e)}")
+            rows.append((gen_uuid(), cat["name"], cat.get("description")))
+        _bulk_insert("""
+            INSERT INTO categories (category_id, name, description)
+            VALUES %s
+        """, rows)
+        return [row[0] for row in rows]
+    except Exception as e:
+        raise Exception(f"Failed to create categories: {str(e)}")
+
+
+def images_create_many(images: list) -> list:
+    try:
+        rows = []
+        for i, img in enumerate(images):
+            try:
+                validate_nonempty("product_id", img.get("product_id"))
+                validate_nonempty("url", img.get("url"))
+            except Exception as e:
+                raise Exception(f"row {i}: {str(e)}")
+            rows.append((gen_uuid(), img["product_id"], img["url"]))
+        _bulk_insert("""
+            INSERT INTO images (image_id, product_id, url)
+            VALUES %s
+        """, rows)
+        return [row[0] for row in rows]
+    except Exception as e:
+        raise Exception(f"Failed to create images: {str(e)}")
+
+
+# links are given as [category_id, product_id] pairs
+def categoryProducts_create_many(links: list) -> None:
+    _bulk_insert("""
+        INSERT INTO category_products (category_id, product_id)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+    """, [(category_id, product_id) for category_id, product_id in links])
+    for category_id in {link[0] for link in links}:
+        cache.invalidate("categoryProducts", category_id)
+
+
+# links are given as [supplier_id, product_id] pairs
+def supplierProducts_create_many(links: list) -> None:
+    _bulk_insert("""
+        INSERT INTO supplier_products (supplier_id, product_id)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+    """, [(supplier_id, product_id) for supplier_id, product_id in links])
+    for supplier_id in {link[0] for link in links}:
+        cache.invalidate("supplierProducts", supplier_id)
+
+
+# ============================== RPC SERVER ==================================
+
+# Latency histogram with exponentially growing buckets, 50us up to ~26s.
+# Percentiles are reported as the upper bound of the bucket they fall in.
+class Histogram:
+    BOUNDS = [0.00005 * 2 ** i for i in range(20)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        i = 0
+        while i < len(self.BOUNDS) and seconds > self.BOUNDS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        n = sum(self.counts)
+        if not n:
+            return 0.0
+        rank = q * n
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.BOUNDS[i], self.max) if i < len(self.BOUNDS) else self.max
+        return self.max
+
+    # Summary in milliseconds
+    def summary(self) -> dict:
+        n = sum(self.counts)
+        return {
+            "mean": self.total / n * 1000 if n else 0.0,
+            "p50": self.percentile(0.50) * 1000,
+            "p95": self.percentile(0.95) * 1000,
+            "p99": self.percentile(0.99) * 1000,
+            "max": self.max * 1000,
+        }
+
+
+# Call counts, error counts and latency per registered RPC method.
+# "total" is the time spent in the function, "db" the part of it spent holding a
+# pooled connection (see get_conn) and "serialize" the time the server spent
+# decoding the request and encoding the reply around the call.
+class RPCStats:
+    def __init__(self):
+        self._methods = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started = time.time()
+
+    def _method(self, name: str) -> dict:
+        entry = self._methods.get(name)
+        if entry is None:
+            entry = self._methods[name] = {
+                "calls": 0, "errors": 0,
+                "total": Histogram(), "db": Histogram(), "serialize": Histogram(),
+            }
+        return entry
+
+    def add_db_time(self, seconds: float):
+        self._local.db = getattr(self._local, "db", 0.0) + seconds
+
+    # Wrap a function so every call through the server is counted and timed
+    def instrument(self, name: str, func):
+        local = self._local
+
+        def wrapper(*args, **kwargs):
+            depth = getattr(local, "depth", 0)
+            local.depth = depth + 1
+            db_start = getattr(local, "db", 0.0)
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                local.depth = depth
+                with self._lock:
+                    entry = self._method(name)
+                    entry["calls"] += 1
+                    entry["errors"] += failed
+                    entry["total"].add(elapsed)
+                    entry["db"].add(getattr(local, "db", 0.0) - db_start)
+                # calls made from inside system.multicall belong to it
+                if depth == 0:
+                    local.method = name
+                    local.call_time = elapsed
+        return wrapper
+
+    # Time one whole request; whatever is not spent in the call is serialization
+    @contextmanager
+    def request(self):
+        local = self._local
+        local.method = None
+        local.call_time = 0.0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if local.method is not None:
+                serialize = time.perf_counter() - start - local.call_time
+                with self._lock:
+                    self._method(local.method)["serialize"].add(max(serialize, 0.0))
+
+    def snapshot(self, reset: bool = False) -> dict:
+        with self._lock:
+            methods = {
+                name: {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "total_ms": entry["total"].summary(),
+                    "db_ms": entry["db"].summary(),
+                    "serialize_ms": entry["serialize"].summary(),
+                }
+                for name, entry in sorted(self._methods.items())
+            }
+            ret = {"pid": os.getpid(), "since": self.started, "methods": methods}
+            if reset:
+                self._methods = {}
+                self.started = time.time()
+            return ret
+
+
+rpc_stats = RPCStats()
+
+
+# Per-method call statistics of this process; reset=True starts a new window
+def system_stats(reset: bool = False) -> dict:
+    return rpc_stats.snapshot(reset)
+
+
+# Write the stats to a JSON file every interval seconds until stopped.
+# In fork mode every child writes its own file when the path contains {pid}.
+class StatsDumper:
+    def __init__(self, path: str, interval: float = 60):
+        self.path = path.format(pid=os.getpid())
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="rpc-stats-dumper", daemon=True)
+        self._thread.start()
+
+    def dump(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(rpc_stats.snapshot(), f, indent=2)
+        os.replace(tmp, self.path)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.dump()
+            except OSError as e:
+                print(f"Could not write RPC stats to {self.path}: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        try:
+            self.dump()
+        except OSError as e:
+            print(f"Could not write RPC stats to {self.path}: {e}")
+
+
+# Instruments every function as it is registered
+class InstrumentedMixIn:
+    def register_function(self, function=None, name=None):
+        if function is None:
+            return functools.partial(self.register_function, name=name)
+        if name is None:
+            name = function.__name__
+        super().register_function(rpc_stats.instrument(name, function), name)
+        return function
+
+    def register_multicall_functions(self):
+        super().register_multicall_functions()
+        self.funcs["system.multicall"] = rpc_stats.instrument("system.multicall", self.funcs["system.multicall"])
+
+
+# Hands accepted connections to a fixed set of worker threads.
+# The hand-off queue and the listen backlog are both bounded, so a burst of
+# callers waits in the kernel instead of spawning unbounded threads.
+class WorkerPoolMixIn:
+    _threads = []
+
+    def start_workers(self, workers: int, backlog: int, name: str):
+        self._requests = queue.Queue(maxsize=max(workers, backlog))
+        self._threads = []
+        for n in range(workers):
+            t = threading.Thread(target=self._work, name=f"{name}-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def process_request(self, request, client_address):
+        if not self._threads:
+            return super().process_request(request, client_address)
+        self._requests.put((request, client_address))
+
+    def _work(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    # Let the workers drain queued requests, then stop them
+    def server_close(self):
+        super().server_close()
+        for _ in self._threads:
+            self._requests.put(None)
+        for t in self._threads:
+            t.join()
+
+
+class PooledXMLRPCServer(InstrumentedMixIn, WorkerPoolMixIn, SimpleXMLRPCServer):
+    def __init__(self, addr, workers: int = 8, backlog: int = 64, **kwargs):
+        self.request_queue_size = backlog
+        super().__init__(addr, **kwargs)
+        if workers:
+            self.start_workers(workers, backlog, "rpc")
+
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        with rpc_stats.request():
+            return super()._marshaled_dispatch(data, dispatch_method, path)
+
+
+# ---------------------------- compact transport -----------------------------
+# Same functions as the XML-RPC endpoint, framed as a 4-byte big-endian length
+# followed by a UTF-8 JSON body. A request is {"id", "method", "params"} and the
+# reply is {"id", "result"} or {"id", "error"}. Connections are kept open for
+# any number of calls. Reads and lists answer with native numbers instead of
+# the strings the XML-RPC endpoint returns; NUMERIC columns stay decimal
+# strings, so prices keep every digit, as on the XML-RPC endpoint.
+
+MAX_FRAME = 64 * 1024 * 1024  # largest request body accepted, in bytes
+FRAME_HEADER = struct.Struct(">I")
+
+
+def _json_default(value):
+    if isinstance(value, (Decimal, uuid.UUID, datetime.date, datetime.datetime)):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} as JSON")
+
+
+def encode_frame(obj) -> bytes:
+    body = json.dumps(obj, default=_json_default, separators=(",", ":")).encode("utf-8")
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+# Between calls a kept-alive connection waits in a selector instead of holding
+# a worker, so an idle client costs a file descriptor, not a thread, and
+# json_workers only bounds the calls running at once. A worker takes the
+# connection once bytes arrive, serves every frame received in full and hands
+# it back. Connections idle, or stalled mid-frame, for idle_timeout seconds are
+# closed; the open file limit is what caps how many clients can stay connected.
+class FramedJSONServer(WorkerPoolMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    idle_timeout = 60  # seconds a connection may sit idle before it is dropped
+    recv_size = 64 * 1024
+
+    def __init__(self, addr, workers: int = 8, backlog: int = 64, bind_and_activate: bool = True):
+        self.request_queue_size = backlog
+        self.funcs = {}
+        self._conns = {}  # open connection -> (client address, bytes received but not yet served)
+        self._parking = []
+        self._closing = False
+        self._conns_lock = threading.Lock()
+        self._selector = None
+        # connections are served by serve_ready, not by a handler class
+        super().__init__(addr, None, bind_and_activate=bind_and_activate)
+        if workers:
+            self.start_workers(workers, backlog, "json")
+
+    def start_workers(self, workers: int, backlog: int, name: str):
+        super().start_workers(workers, backlog, name)
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self._watcher = threading.Thread(target=self._watch, name=f"{name}-idle", daemon=True)
+        self._watcher.start()
+
+    def process_request(self, request, client_address):
+        request.settimeout(self.idle_timeout)
+        with self._conns_lock:
+            self._conns[request] = (client_address, bytearray())
+        if not self._threads:
+            return super().process_request(request, client_address)
+        # most clients connect before they have a call to send, so wait for bytes first
+        if not self._park(request):
+            self._drop(request)
+
+    # Without a worker pool the accepting thread serves the connection until it closes
+    def finish_request(self, request, client_address):
+        is_open = self.serve_ready(request)
+        while is_open and not self._threads:
+            is_open = self.serve_ready(request)
+        if not is_open:
+            with self._conns_lock:
+                self._conns.pop(request, None)
+
+    # Called once a worker is done with a connection: park it for its next call, or close it
+    def shutdown_request(self, request):
+        if not self._threads or not self._park(request):
+            self._drop(request)
+
+    def _drop(self, request):
+        with self._conns_lock:
+            self._conns.pop(request, None)
+        super().shutdown_request(request)
+
+    def _park(self, request) -> bool:
+        with self._conns_lock:
+            if self._closing or request not in self._conns:
+                return False
+            self._parking.append(request)
+        self._wake()
+        return True
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except BlockingIOError:
+            pass  # the watcher has wake-ups pending already
+
+    # Owns the selector: queues connections that became readable, registers
+    # parked ones and closes those idle for too long, or all of them on close
+    def _watch(self):
+        while True:
+            for key, _ in self._selector.select(timeout=1):
+                if key.fileobj is self._wake_r:
+                    try:
+                        self._wake_r.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._selector.unregister(key.fileobj)
+                self._requests.put((key.fileobj, self._conns[key.fileobj][0]))
+            with self._conns_lock:
+                parking, self._parking = self._parking, []
+                closing = self._closing
+            now = time.monotonic()
+            for request in parking:
+                self._selector.register(request, selectors.EVENT_READ, now + self.idle_timeout)
+            for key in list(self._selector.get_map().values()):
+                if key.fileobj is not self._wake_r and (closing or key.data <= now):
+                    self._selector.unregister(key.fileobj)
+                    self._drop(key.fileobj)
+            if closing:
+                return
+
+    # Read what has arrived and answer every complete frame; returns False once
+    # the connection should be closed. Blocks for up to idle_timeout only when
+    # nothing has arrived, which a worker never sees since the selector hands it
+    # readable connections.
+    def serve_ready(self, request) -> bool:
+        buf = self._conns[request][1]
+        try:
+            is_open = self._receive(request, buf)
+            while len(buf) >= FRAME_HEADER.size:
+                (length,) = FRAME_HEADER.unpack_from(buf)
+                if length > MAX_FRAME:
+                    return False
+                end = FRAME_HEADER.size + length
+                if len(buf) < end:
+                    break
+                body = bytes(buf[FRAME_HEADER.size:end])
+                del buf[:end]
+                request.sendall(self.dispatch_frame(body))
+        except OSError:
+            return False
+        return is_open
+
+    # Append everything the socket has buffered, up to one maximum frame; returns
+    # False if the client has closed its side
+    def _receive(self, request, buf: bytearray) -> bool:
+        chunk = request.recv(self.recv_size)
+        if not chunk:
+            return False
+        buf += chunk
+        request.settimeout(0)
+        try:
+            while len(buf) < FRAME_HEADER.size + MAX_FRAME:
+                chunk = request.recv(self.recv_size)
+                if not chunk:
+                    return False
+                buf += chunk
+        except BlockingIOError:
+            pass
+        finally:
+            request.settimeout(self.idle_timeout)
+        return True
+
+    # Close parked connections at once; workers finish the calls they are
+    # serving and close those connections instead of parking them
+    def server_close(self):
+        if self._selector is not None:
+            with self._conns_lock:
+                self._closing = True
+            self._wake()
+            self._watcher.join()
+        super().server_close()
+        if self._selector is not None:
+            self._selector.close()
+            self._wake_r.close()
+            self._wake_w.close()
+
+    # no dispatcher base class to defer to, so functions are instrumented here
+    def register_function(self, function=None, name=None):
+        if function is None:
+            return functools.partial(self.register_function, name=name)
+        if name is None:
+            name = function.__name__
+        self.funcs[name] = rpc_stats.instrument(name, function)
+        return function
+
+    def register_multicall_functions(self):
+        self.funcs["system.multicall"] = rpc_stats.instrument("system.multicall", self.system_multicall)
+
+    # Same contract as XML-RPC multicall: [result] per call, or {faultString} on failure
+    def system_multicall(self, calls: list) -> list:
+        results = []
+        for call in calls:
+            try:
+                results.append([self.funcs[call["methodName"]](*call.get("params", []))])
+            except Exception as e:
+                results.append({"faultCode": 1, "faultString": f"{type(e).__name__}: {e}"})
+        return results
+
+    def dispatch_frame(self, body: bytes) -> bytes:
+        with rpc_stats.request():
+            req_id = None
+            try:
+                req = json.loads(body)
+                req_id = req.get("id") if isinstance(req, dict) else None
+                func = self.funcs.get(req["method"])
+                if func is None:
+                    raise Exception(f'method "{req["method"]}" is not supported')
+                result = func(*req.get("params", []))
+                return encode_frame({"id": req_id, "result": result})
+            except Exception as e:
+                return encode_frame({"id": req_id, "error": f"{type(e).__name__}: {e}"})
+
+
+# Read and list calls that answer with native types on the compact endpoint
+def register_native_functions(server):
+    server.register_function(product_row, "product_read")
+    server.register_function(supplier_row, "supplier_read")
+    server.register_function(category_row, "category_read")
+    server.register_function(image_row, "image_read")
+    server.register_function(categoryProducts_rows, "categoryProducts_read")
+    server.register_function(supplierProducts_rows, "supplierProducts_read")
+    for table, key in (("products", "product_id"), ("suppliers", "supplier_id"),
+                       ("categories", "category_id"), ("images", "image_id")):
+        server.register_function(functools.partial(_page, table, key, convert=_native), f"{table}_page")
+        server.register_function(functools.partial(_list, table, convert=_native), f"{table}_list")
+
+
+def register_functions(server):
     server.register_function(products_read, "products_read")
     server.register_function(suppliers_read, "suppliers_read")
     server.register_function(categories_read, "categories_read")
@@ -420,4 +1641,148 @@ if __name__ == "__main__":
     server.register_function(supplierProducts_create, "supplierProducts_create")
     server.register_function(supplierProducts_read, "supplierProducts_read")
     server.register_function(supplierProducts_delete, "supplierProducts_delete")
-    server.serve_forever()
\ No newline at end of file
+    server.register_function(products_page, "products_page")
+    server.register_function(suppliers_page, "suppliers_page")
+    server.register_function(categories_page, "categories_page")
+    server.register_function(images_page, "images_page")
+    server.register_function(products_list, "products_list")
+    server.register_function(suppliers_list, "suppliers_list")
+    server.register_function(categories_list, "categories_list")
+    server.register_function(images_list, "images_list")
+    server.register_function(products_create_many, "products_create_many")
+    server.register_function(suppliers_create_many, "suppliers_create_many")
+    server.register_function(categories_create_many, "categories_create_many")
+    server.register_function(images_create_many, "images_create_many")
+    server.register_function(categoryProducts_create_many, "categoryProducts_create_many")
+    server.register_function(supplierProducts_create_many, "supplierProducts_create_many")
+    server.register_function(pool_stats, "pool_stats")
+    server.register_function(cache_stats, "cache_stats")
+    server.register_function(system_stats, "system.stats")
+    # lets clients pipeline several calls in one HTTP round trip
+    server.register_multicall_functions()
+
+
+def build_server(mode: str, host: str, port: int, workers: int, backlog: int):
+    if mode == "thread":
+        server = PooledXMLRPCServer((host, port), workers=workers, backlog=backlog, allow_none=True)
+    else:
+        server = PooledXMLRPCServer((host, port), workers=0, backlog=backlog, allow_none=True)
+    register_functions(server)
+    return server
+
+
+# Threads do not survive fork(), so fork mode binds with workers=0 and each child starts its own
+def build_json_server(host: str, port: int, workers: int, backlog: int):
+    server = FramedJSONServer((host, port), workers=workers, backlog=backlog)
+    register_functions(server)
+    register_native_functions(server)
+    return server
+
+
+# Stop every serve_forever() from a signal handler; shutdown() blocks, so it runs on its own thread
+def stop_on_signals(servers: list):
+    def handler(signum, frame):
+        for server in servers:
+            threading.Thread(target=server.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, handler)
+    signal.signal(signal.SIGINT, handler)
+
+
+# Serve the first server on this thread and any others on background threads
+def run_server(servers: list):
+    stop_on_signals(servers)
+    try:
+        get_pool().prewarm()
+    except Exception as e:
+        print(f"Database not reachable yet, connections will be opened on demand: {e}")
+    dumper = StatsDumper(**STATS_CONFIG) if STATS_CONFIG["path"] else None
+    threads = [threading.Thread(target=server.serve_forever, daemon=True) for server in servers[1:]]
+    for t in threads:
+        t.start()
+    try:
+        servers[0].serve_forever()
+    finally:
+        for server in servers[1:]:
+            server.shutdown()
+        for t in threads:
+            t.join()
+        for server in servers:
+            server.server_close()
+        if dumper is not None:
+            dumper.close()
+        get_pool().close()
+
+
+# Pre-fork mode: the parent binds the sockets once and every child accepts on them.
+# Children that die are replaced; SIGTERM/SIGINT stops all of them.
+def serve_forked(host: str, port: int, json_port: int, workers: int, json_workers: int, backlog: int):
+    # each child would hold its own cache and only see its own invalidations
+    cache.maxsize = 0
+    listeners = [build_server("single", host, port, workers, backlog)]
+    if json_port:
+        listeners.append(build_json_server(host, json_port, 0, backlog))
+    # every child wakes on a new connection; only one wins accept(), the rest must not block in it
+    for listener in listeners:
+        listener.socket.setblocking(False)
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                if json_port:
+                    listeners[1].start_workers(json_workers, backlog, "json")
+                run_server(listeners)
+            except Exception as e:
+                print(f"Worker {os.getpid()} failed: {e}")
+                code = 1
+            os._exit(code)
+        children[pid] = True
+
+    def handler(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, handler)
+    signal.signal(signal.SIGINT, handler)
+    for _ in range(workers):
+        spawn()
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.pop(pid, None)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}, restarting")
+            spawn()
+    for listener in listeners:
+        listener.server_close()
+
+
+def serve(mode: str = "thread", host: str = "0.0.0.0", port: int = 8000, json_port: int = 8001,
+          workers: int = 8, json_workers: int = 8, backlog: int = 64):
+    if mode not in ("single", "thread", "fork"):
+        raise ValueError(f"Unknown server mode: {mode}")
+    if mode == "fork":
+        serve_forked(host, port, json_port, workers, json_workers, backlog)
+        return
+    servers = [build_server(mode, host, port, workers, backlog)]
+    if json_port:
+        servers.append(build_json_server(host, json_port, json_workers, backlog))
+    run_server(servers)
+
+
+if __name__ == "__main__":
+    serve(**SERVER_CONFIG)
@@ -0,0 +1,89 @@
+# bench_prepared.py - planning overhead of the hot DB.py statements, with and without PREPARE
+#
+# For each registered statement in DB.STATEMENTS, runs it repeatedly on one
+# connection as plain SQL and then through DB.execute_prepared, and prints the
+# mean latency of each plus the planning time Postgres reports for one call.
+# Needs the same database DB.py talks to, e.g. run it inside the middleware container:
+#   python bench/bench_prepared.py --iterations 5000
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import psycopg2
+import DB
+
+
+# Turn "$1"-style placeholders into psycopg2 "%s" ones for the unprepared run
+def plain_sql(sql: str) -> str:
+    return re.sub(r"\$\d+", "%s", sql)
+
+
+def sample_key(cur, name: str):
+    table, key = {
+        "product_read": ("products", "product_id"),
+        "supplier_read": ("suppliers", "supplier_id"),
+        "category_read": ("categories", "category_id"),
+        "image_read": ("images", "image_id"),
+        "categoryProducts_read": ("category_products", "category_id"),
+        "supplierProducts_read": ("supplier_products", "supplier_id"),
+    }[name]
+    cur.execute(f"SELECT {key} FROM {table} LIMIT 1")
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def planning_ms(cur, sql: str, params: tuple) -> float:
+    cur.execute("EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) " + sql, params)
+    return cur.fetchone()[0][0]["Planning Time"]
+
+
+def timed(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(connection_factory=DB.PreparingConnection, **DB.DB_CONFIG)
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    print(f"{'statement':<24} {'plain us':>10} {'prepared us':>12} {'saved':>7} {'plan ms':>8}")
+    for name, (types, sql) in DB.STATEMENTS.items():
+        key = sample_key(cur, name)
+        if key is None:
+            print(f"{name:<24} (no rows to query, skipped)")
+            continue
+        params = (key,)
+        text = plain_sql(sql)
+
+        def plain():
+            cur.execute(text, params)
+            cur.fetchall()
+
+        def prepared():
+            DB.execute_prepared(cur, name, params)
+            cur.fetchall()
+
+        prepared()  # PREPARE outside the timed loop
+        plain_us = timed(plain, args.iterations)
+        prepared_us = timed(prepared, args.iterations)
+        plan = planning_ms(cur, text, params)
+        saved = (1 - prepared_us / plain_us) * 100
+        print(f"{name:<24} {plain_us:>10.1f} {prepared_us:>12.1f} {saved:>6.1f}% {plan:>8.3f}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench_transport.py - XML-RPC vs the length-prefixed JSON endpoint of DB.py
+#
+# Starts DB.py in thread mode, seeds a category with products and repeats a few
+# read-heavy calls over both transports. Prints bytes on the wire per call
+# (request + response bodies) and server CPU per call taken from /proc.
+# Needs the same database DB.py talks to, e.g. run it inside the middleware container:
+#   python bench/bench_transport.py --calls 2000
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import xmlrpc.client
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_workers import DB_PY, cleanup, seed, wait_for_port
+
+FRAME_HEADER = struct.Struct(">I")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+# user + system CPU seconds the process has used so far
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+class XMLClient:
+    def __init__(self, port: int):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port)
+
+    def call(self, method: str, params: tuple) -> int:
+        body = xmlrpc.client.dumps(params, method, allow_none=True).encode("utf-8")
+        self.conn.request("POST", "/RPC2", body, {"Content-Type": "text/xml"})
+        reply = self.conn.getresponse().read()
+        xmlrpc.client.loads(reply)
+        return len(body) + len(reply)
+
+
+class JSONClient:
+    def __init__(self, port: int):
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.rfile = self.sock.makefile("rb")
+        self.next_id = 0
+
+    def call(self, method: str, params: tuple) -> int:
+        self.next_id += 1
+        body = json.dumps({"id": self.next_id, "method": method, "params": list(params)},
+                          separators=(",", ":")).encode("utf-8")
+        self.sock.sendall(FRAME_HEADER.pack(len(body)) + body)
+        (length,) = FRAME_HEADER.unpack(self.rfile.read(FRAME_HEADER.size))
+        reply = json.loads(self.rfile.read(length))
+        if "error" in reply:
+            raise Exception(reply["error"])
+        return 2 * FRAME_HEADER.size + len(body) + length
+
+
+def measure(client, pid: int, method: str, params: tuple, calls: int):
+    client.call(method, params)  # warm the connection and the statement cache
+    start = cpu_seconds(pid)
+    wire = sum(client.call(method, params) for _ in range(calls))
+    return wire / calls, (cpu_seconds(pid) - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--json-port", type=int, default=8101)
+    args = parser.parse_args()
+
+    env = dict(os.environ, RPC_MODE="thread", RPC_PORT=str(args.port),
+               RPC_JSON_PORT=str(args.json_port), RPC_HOST="127.0.0.1")
+    server = subprocess.Popen([sys.executable, DB_PY], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.port)
+        wait_for_port(args.json_port)
+        url = f"http://127.0.0.1:{args.port}"
+        cid, pids = seed(url, args.products)
+        try:
+            workload = [
+                ("product_read", (pids[0],)),
+                ("categoryProducts_read", (cid,)),
+                ("products_list", (None, None, None, 1000)),
+            ]
+            clients = {"xmlrpc": XMLClient(args.port), "json": JSONClient(args.json_port)}
+            print(f"{'method':<24} {'transport':<8} {'bytes/call':>11} {'cpu us/call':>12}")
+            for method, params in workload:
+                for name, client in clients.items():
+                    wire, cpu = measure(client, server.pid, method, params, args.calls)
+                    print(f"{method:<24} {name:<8} {wire:>11.0f} {cpu:>12.1f}")
+        finally:
+            cleanup(url, pids)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
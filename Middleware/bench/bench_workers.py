@@ -0,0 +1,116 @@
+# bench_workers.py - throughput of DB.py as the number of RPC workers grows
+#
+# Starts DB.py once per worker count, drives it with a mix of reads and writes
+# from several client processes and prints calls per second for each run.
+# Needs the same database DB.py talks to, e.g. run it inside the middleware container:
+#   python bench/bench_workers.py --mode thread --workers 1 2 4 8 16
+
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import xmlrpc.client
+from multiprocessing import Pool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DB_PY = os.path.join(HERE, "..", "DB.py")
+
+
+def wait_for_port(port: int, timeout: float = 15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise Exception(f"DB.py did not start listening on port {port}")
+
+
+# Create a category with some products to read and update during the run
+def seed(url: str, products: int):
+    rpc = xmlrpc.client.ServerProxy(url, allow_none=True)
+    cid = rpc.category_create("bench category", "created by bench_workers.py")
+    pids = []
+    for n in range(products):
+        pid = rpc.product_create(f"bench product {n}", "created by bench_workers.py", n, "9.99")
+        rpc.categoryProducts_create(cid, pid)
+        pids.append(pid)
+    return cid, pids
+
+
+def cleanup(url: str, pids: list):
+    rpc = xmlrpc.client.ServerProxy(url, allow_none=True)
+    # deleting the last product also removes the category through the orphan trigger
+    for pid in pids:
+        rpc.product_delete(pid)
+
+
+def client(args):
+    url, cid, pids, seconds, write_ratio = args
+    rpc = xmlrpc.client.ServerProxy(url, allow_none=True)
+    rng = random.Random()
+    calls = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pid = rng.choice(pids)
+        try:
+            r = rng.random()
+            if r < write_ratio:
+                rpc.product_update(pid, "bench product", "updated by bench_workers.py", rng.randint(0, 1000), "9.99")
+            elif r < write_ratio + (1 - write_ratio) / 2:
+                rpc.product_read(pid)
+            else:
+                rpc.categoryProducts_read(cid)
+            calls += 1
+        except Exception:
+            errors += 1
+    return calls, errors
+
+
+def run(mode: str, workers: int, port: int, clients: int, seconds: float, products: int, write_ratio: float):
+    env = dict(os.environ, RPC_MODE=mode, RPC_WORKERS=str(workers), RPC_PORT=str(port), RPC_JSON_PORT="0", RPC_HOST="127.0.0.1")
+    server = subprocess.Popen([sys.executable, DB_PY], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        url = f"http://127.0.0.1:{port}"
+        cid, pids = seed(url, products)
+        try:
+            with Pool(clients) as pool:
+                results = pool.map(client, [(url, cid, pids, seconds, write_ratio)] * clients)
+        finally:
+            cleanup(url, pids)
+    finally:
+        server.terminate()
+        server.wait()
+    calls = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    return calls / seconds, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["thread", "fork"], default="thread")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    print(f"mode={args.mode} clients={args.clients} seconds={args.seconds} write_ratio={args.write_ratio}")
+    print(f"{'workers':>8} {'calls/s':>10} {'errors':>8} {'speedup':>8}")
+    base = None
+    for workers in args.workers:
+        rate, errors = run(args.mode, workers, args.port, args.clients, args.seconds, args.products, args.write_ratio)
+        base = base or rate
+        print(f"{workers:>8} {rate:>10.1f} {errors:>8} {rate / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
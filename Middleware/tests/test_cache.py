@@ -0,0 +1,69 @@
+# test_cache.py - DB.py read cache keys and invalidation
+#   python -m pytest Middleware/tests
+
+import os
+import sys
+import uuid
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import DB
+
+
+def test_cache_key_canonicalizes_uuids():
+    pid = uuid.uuid4()
+    assert DB.cache_key(str(pid).upper()) == str(pid)
+    assert DB.cache_key("{" + str(pid) + "}") == str(pid)
+    assert DB.cache_key(pid) == str(pid)
+    assert DB.cache_key(("product", str(pid).upper())) == ("product", str(pid))
+
+
+def test_cache_key_orders_unordered_collections():
+    assert DB.cache_key({"name", "price"}) == DB.cache_key({"price", "name"})
+    assert DB.cache_key({"b": 1, "a": 2}) == DB.cache_key({"a": 2, "b": 1})
+    assert DB.cache_key(["name", "price"]) != DB.cache_key(["price", "name"])
+
+
+def test_equivalent_reads_share_an_entry():
+    cache = DB.TTLCache(maxsize=10, ttl=60)
+    pid = str(uuid.uuid4())
+    loads = []
+    load = lambda: loads.append(1) or "row"
+    assert cache.get_or_load(("product", pid), load) == "row"
+    assert cache.get_or_load(("product", pid.upper()), load) == "row"
+    assert len(loads) == 1
+
+
+def test_invalidate_matches_any_spelling():
+    cache = DB.TTLCache(maxsize=10, ttl=60)
+    pid = str(uuid.uuid4())
+    cache.get_or_load(("product", pid), lambda: "old")
+    cache.invalidate("product", pid.upper())
+    assert cache.get_or_load(("product", pid), lambda: "new") == "new"
+
+
+def test_namespace_invalidation_drops_every_key():
+    cache = DB.TTLCache(maxsize=10, ttl=60)
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+    for pid in ids:
+        cache.get_or_load(("supplierProducts", pid), lambda: "old")
+    cache.get_or_load(("product", ids[0]), lambda: "kept")
+    cache.invalidate("supplierProducts")
+    assert all(cache.get_or_load(("supplierProducts", pid), lambda: "new") == "new" for pid in ids)
+    assert cache.get_or_load(("product", ids[0]), lambda: "reloaded") == "kept"
+
+
+def test_load_racing_an_invalidation_is_not_stored():
+    cache = DB.TTLCache(maxsize=10, ttl=60)
+    pid = str(uuid.uuid4())
+
+    def racing_load():
+        cache.invalidate("product", pid)
+        return "stale"
+
+    assert cache.get_or_load(("product", pid), racing_load) == "stale"
+    assert cache.get_or_load(("product", pid), lambda: "fresh") == "fresh"
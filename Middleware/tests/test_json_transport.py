@@ -0,0 +1,129 @@
+# test_json_transport.py - framing and encoding on the compact JSON endpoint
+#   python -m pytest Middleware/tests
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import DB
+
+
+def decode_frame(frame: bytes):
+    (length,) = DB.FRAME_HEADER.unpack(frame[:DB.FRAME_HEADER.size])
+    assert len(frame) == DB.FRAME_HEADER.size + length
+    return json.loads(frame[DB.FRAME_HEADER.size:])
+
+
+def test_prices_keep_every_digit():
+    # NUMERIC(20,6) holds more digits than a double
+    price = Decimal("12345678901234.123457")
+    assert Decimal(repr(float(price))) != price
+    row = decode_frame(DB.encode_frame({"result": ["9f1c7c42-0d6a-4b43-9a53-8e5d0f0c2a11", "name", "desc", 3, price]}))["result"]
+    assert row[4] == "12345678901234.123457"
+    assert Decimal(row[4]) == price
+
+
+def test_trailing_zeros_match_the_xmlrpc_endpoint():
+    price = Decimal("9.990000")
+    assert decode_frame(DB.encode_frame(price)) == str(price) == "9.990000"
+
+
+@pytest.fixture
+def served():
+    server = DB.FramedJSONServer(("127.0.0.1", 0), workers=2)
+    server.register_function(lambda value: value, "transport_echo")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def connect(server) -> socket.socket:
+    return socket.create_connection(server.server_address, timeout=5)
+
+
+def call(sock: socket.socket, value, req_id: int = 1):
+    sock.sendall(DB.encode_frame({"id": req_id, "method": "transport_echo", "params": [value]}))
+    return read_reply(sock)
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        assert chunk, "connection closed mid-reply"
+        data += chunk
+    return data
+
+
+def read_reply(sock: socket.socket):
+    header = recv_exact(sock, DB.FRAME_HEADER.size)
+    (length,) = DB.FRAME_HEADER.unpack(header)
+    return decode_frame(header + recv_exact(sock, length))
+
+
+def test_idle_connections_do_not_hold_workers(served):
+    idle = [connect(served) for _ in range(5)]
+    try:
+        for sock in idle[:3]:
+            assert call(sock, "warm")["result"] == "warm"
+        started = time.monotonic()
+        with connect(served) as sock:
+            assert call(sock, "through")["result"] == "through"
+        assert time.monotonic() - started < 2
+    finally:
+        for sock in idle:
+            sock.close()
+
+
+def test_connection_is_reused_and_frames_may_arrive_in_pieces(served):
+    with connect(served) as sock:
+        frame = DB.encode_frame({"id": 7, "method": "transport_echo", "params": ["split"]})
+        sock.sendall(frame[:3])
+        time.sleep(0.2)
+        sock.sendall(frame[3:] + DB.encode_frame({"id": 8, "method": "transport_echo", "params": ["next"]}))
+        assert read_reply(sock) == {"id": 7, "result": "split"}
+        assert read_reply(sock) == {"id": 8, "result": "next"}
+        assert call(sock, "again", 9) == {"id": 9, "result": "again"}
+
+
+def test_idle_connections_are_closed():
+    server = DB.FramedJSONServer(("127.0.0.1", 0), workers=1)
+    server.idle_timeout = 0.5
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with connect(server) as sock:
+            assert sock.recv(1) == b""
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+
+def test_close_does_not_wait_for_idle_connections():
+    server = DB.FramedJSONServer(("127.0.0.1", 0), workers=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    idle = [connect(server) for _ in range(3)]
+    time.sleep(0.2)
+    started = time.monotonic()
+    server.shutdown()
+    thread.join()
+    server.server_close()
+    assert time.monotonic() - started < 3
+    for sock in idle:
+        assert sock.recv(1) == b""
+        sock.close()
@@ -0,0 +1,55 @@
+# test_rpc_stats.py - per-method statistics on both RPC endpoints
+#   python -m pytest Middleware/tests
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import DB
+
+
+def echo(value):
+    return value
+
+
+def fail():
+    raise ValueError("boom")
+
+
+@pytest.fixture
+def json_server():
+    server = DB.FramedJSONServer(("127.0.0.1", 0), workers=0, bind_and_activate=False)
+    yield server
+    server.server_close()
+
+
+def test_json_endpoint_wraps_registered_functions(json_server):
+    json_server.register_function(echo, "stats_echo")
+    json_server.register_multicall_functions()
+    assert json_server.funcs["stats_echo"] is not echo
+    assert json_server.funcs["system.multicall"] != json_server.system_multicall
+
+
+def test_json_endpoint_calls_are_counted(json_server):
+    json_server.register_function(echo, "stats_counted")
+    json_server.register_function(fail, "stats_failing")
+    json_server.dispatch_frame(b'{"id": 1, "method": "stats_counted", "params": [3]}')
+    json_server.dispatch_frame(b'{"id": 2, "method": "stats_failing", "params": []}')
+    methods = DB.rpc_stats.snapshot()["methods"]
+    assert methods["stats_counted"]["calls"] == 1
+    assert methods["stats_counted"]["errors"] == 0
+    assert methods["stats_failing"]["errors"] == 1
+
+
+def test_xmlrpc_endpoint_wraps_registered_functions():
+    server = DB.PooledXMLRPCServer(("127.0.0.1", 0), workers=0, bind_and_activate=False, logRequests=False)
+    try:
+        server.register_function(echo, "stats_xml_echo")
+        assert server.funcs["stats_xml_echo"] is not echo
+    finally:
+        server.server_close()